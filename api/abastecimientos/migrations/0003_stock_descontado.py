@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('abastecimientos', '0002_initial'),
+    ]
+
+    operations = [
+        # Los abastecimientos existentes no descontaron stock: quedan en False
+        migrations.AddField(
+            model_name='abastecimiento',
+            name='stock_descontado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='abastecimiento',
+            name='stock_descontado',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+    ]
@@ -6,6 +6,9 @@ class Abastecimiento(BaseModel):
     fecha = models.DateField()
     cantidad = models.PositiveIntegerField()
     manicurista = models.ForeignKey(Manicurista, on_delete=models.CASCADE)
+    # Los abastecimientos anteriores al kardex no descontaron Insumo.cantidad:
+    # editarlos o borrarlos no debe devolver ni mover stock
+    stock_descontado = models.BooleanField(default=True, editable=False)
     
     def __str__(self):
         return f"Abastecimiento {self.id} - {self.manicurista} ({self.fecha})"
\ No newline at end of file
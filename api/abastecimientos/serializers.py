@@ -1,5 +1,9 @@
 from rest_framework import serializers
+from django.db import transaction
+from django.utils import timezone
 from .models import Abastecimiento
+from api.insumos.models import MovimientoInventario
+from api.insumos.stock import StockInsuficiente, agrupar, aplicar_movimientos, diferencia
 from api.manicuristas.models import Manicurista
 from api.manicuristas.serializers import ManicuristaSerializer
 from api.insumoshasabastecimientos.models import InsumoHasAbastecimiento
@@ -21,25 +25,83 @@ class AbastecimientoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("La cantidad debe ser mayor que cero")
         return value
     
+    def validate_insumos(self, value):
+        ids = [insumo_data['insumo'].pk for insumo_data in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Un insumo no puede aparecer en más de una línea del abastecimiento.")
+        return value
+    
+    @transaction.atomic
     def create(self, validated_data):
         insumos_data = validated_data.pop('insumos', [])
         abastecimiento = Abastecimiento.objects.create(**validated_data)
         
-        for insumo_data in insumos_data:
-            InsumoHasAbastecimiento.objects.create(abastecimiento=abastecimiento, **insumo_data)
+        InsumoHasAbastecimiento.objects.bulk_create([
+            InsumoHasAbastecimiento(abastecimiento=abastecimiento, **insumo_data)
+            for insumo_data in insumos_data
+        ])
+        
+        # Descontar del stock todo lo entregado a la manicurista en una sola pasada
+        self._mover_stock(abastecimiento, self._lineas(insumos_data), {})
         
         return abastecimiento
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         insumos_data = validated_data.pop('insumos', None)
         instance = super().update(instance, validated_data)
         
         if insumos_data is not None:
-            instance.insumos.all().delete()
+            # Comparar por insumo: solo se tocan las líneas que cambian
+            lineas = list(instance.insumos.select_for_update().order_by('id'))
+            lineas_anteriores = agrupar((linea.insumo_id, linea.cantidad) for linea in lineas)
+            actuales = {}
+            sobrantes = []
+            for linea in lineas:
+                if linea.insumo_id in actuales:
+                    sobrantes.append(linea.pk)
+                else:
+                    actuales[linea.insumo_id] = linea
+            
+            ahora = timezone.now()
+            nuevas, modificadas = [], []
             for insumo_data in insumos_data:
-                InsumoHasAbastecimiento.objects.create(abastecimiento=instance, **insumo_data)
+                linea = actuales.pop(insumo_data['insumo'].pk, None)
+                if linea is None:
+                    nuevas.append(InsumoHasAbastecimiento(abastecimiento=instance, **insumo_data))
+                elif linea.cantidad != insumo_data['cantidad']:
+                    linea.cantidad = insumo_data['cantidad']
+                    linea.updated_at = ahora
+                    modificadas.append(linea)
+            
+            borradas = sobrantes + [linea.pk for linea in actuales.values()]
+            if borradas:
+                InsumoHasAbastecimiento.objects.filter(pk__in=borradas).delete()
+            if modificadas:
+                InsumoHasAbastecimiento.objects.bulk_update(modificadas, ['cantidad', 'updated_at'])
+            InsumoHasAbastecimiento.objects.bulk_create(nuevas)
+            
+            if instance.stock_descontado:
+                self._mover_stock(instance, self._lineas(insumos_data), lineas_anteriores)
         
         return instance
+    
+    def _lineas(self, insumos_data):
+        return agrupar((insumo_data['insumo'].pk, insumo_data['cantidad']) for insumo_data in insumos_data)
+    
+    def _mover_stock(self, abastecimiento, lineas_nuevas, lineas_anteriores):
+        # Lo entregado sale del stock: aplicar solo la diferencia con lo que ya había salido
+        try:
+            aplicar_movimientos(
+                diferencia(
+                    {insumo_id: -cantidad for insumo_id, cantidad in lineas_nuevas.items()},
+                    {insumo_id: -cantidad for insumo_id, cantidad in lineas_anteriores.items()}
+                ),
+                MovimientoInventario.TIPO_ABASTECIMIENTO,
+                abastecimiento.pk
+            )
+        except StockInsuficiente as e:
+            raise serializers.ValidationError({'insumos': str(e)})
 
 
 class AbastecimientoDetailSerializer(serializers.ModelSerializer):
@@ -51,5 +113,5 @@ class AbastecimientoDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'fecha', 'cantidad', 'manicurista', 'insumos']
     
     def get_insumos(self, obj):
-        abastecimiento_insumos = InsumoHasAbastecimiento.objects.filter(abastecimiento=obj)
-        return InsumoHasAbastecimientoDetailSerializer(abastecimiento_insumos, many=True).data
\ No newline at end of file
+        # Usa las líneas precargadas con prefetch_related('insumos__insumo')
+        return InsumoHasAbastecimientoDetailSerializer(obj.insumos.all(), many=True).data
@@ -1,10 +1,13 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Abastecimiento
 from .serializers import AbastecimientoSerializer, AbastecimientoDetailSerializer
+from api.insumos.models import MovimientoInventario
+from api.insumos.stock import agrupar, aplicar_movimientos
 from api.manicuristas.models import Manicurista
 
 
@@ -15,7 +18,8 @@ class AbastecimientoViewSet(viewsets.ModelViewSet):
     Este ViewSet proporciona endpoints para listar, crear, actualizar y eliminar
     registros de abastecimientos de insumos a manicuristas.
     """
-    queryset = Abastecimiento.objects.all()
+    # Manicurista y líneas con su insumo precargados: el listado hace las mismas consultas sin importar su tamaño
+    queryset = Abastecimiento.objects.select_related('manicurista__usuario').prefetch_related('insumos__insumo')
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['fecha', 'manicurista']
     search_fields = ['manicurista__nombre']
@@ -39,7 +43,7 @@ class AbastecimientoViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         
         # Obtenemos el objeto recién creado con el serializer de detalle
-        abastecimiento = Abastecimiento.objects.get(pk=serializer.data['id'])
+        abastecimiento = self.get_queryset().get(pk=serializer.data['id'])
         detail_serializer = AbastecimientoDetailSerializer(abastecimiento)
         
         return Response(detail_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -52,11 +56,22 @@ class AbastecimientoViewSet(viewsets.ModelViewSet):
         self.perform_update(serializer)
         
         # Obtenemos el objeto actualizado con el serializer de detalle
-        abastecimiento = Abastecimiento.objects.get(pk=instance.id)
+        abastecimiento = self.get_queryset().get(pk=instance.id)
         detail_serializer = AbastecimientoDetailSerializer(abastecimiento)
         
         return Response(detail_serializer.data)
     
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Lo entregado vuelve al stock antes de borrar las líneas (solo si se descontó)
+        if instance.stock_descontado:
+            aplicar_movimientos(
+                agrupar(instance.insumos.values_list('insumo_id', 'cantidad')),
+                MovimientoInventario.TIPO_ABASTECIMIENTO,
+                instance.pk
+            )
+        instance.delete()
+    
     @action(detail=False, methods=['get'])
     def por_manicurista(self, request):
         """
@@ -80,7 +95,7 @@ class AbastecimientoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        abastecimientos = Abastecimiento.objects.filter(manicurista=manicurista)
+        abastecimientos = self.get_queryset().filter(manicurista=manicurista)
         serializer = AbastecimientoDetailSerializer(abastecimientos, many=True)
         return Response(serializer.data)
     
@@ -102,7 +117,7 @@ class AbastecimientoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        abastecimientos = Abastecimiento.objects.filter(
+        abastecimientos = self.get_queryset().filter(
             fecha__gte=fecha_inicio,
             fecha__lte=fecha_fin
         )
@@ -0,0 +1,117 @@
+"""
+Inicio de sesión único para usuarios, clientes y manicuristas.
+
+Todos los endpoints de login resuelven el usuario junto con su rol y sus
+perfiles (`usuario.cliente`, `usuario.manicurista`) en una sola consulta y
+verifican `Usuario.password` una sola vez. La contraseña temporal de un
+perfil se copia al usuario al generarla y al cambiarla.
+
+Los perfiles reseteados antes de esa copia, o que no tienen usuario, aún
+inician sesión con su `contraseña_temporal`: si coincide, se copia al
+usuario (que se crea si falta) y el siguiente login ya es el normal.
+"""
+from django.apps import apps
+from django.db import IntegrityError, transaction
+
+from api.usuarios.models import Usuario
+
+from .tokens import tokens_para_usuario
+
+
+CREDENCIALES_INCORRECTAS = 'Credenciales incorrectas'
+CUENTA_INACTIVA = 'Cuenta inactiva. Contacta al administrador'
+CUENTA_SIN_USUARIO = 'No se pudo activar la cuenta. Contacta al administrador'
+
+# Modelo de cada perfil que puede iniciar sesión con su contraseña temporal
+MODELOS_PERFIL = {'cliente': ('clientes', 'Cliente'), 'manicurista': ('manicuristas', 'Manicurista')}
+
+
+class ErrorLogin(Exception):
+    def __init__(self, mensaje):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+
+
+def perfil(usuario, relacion):
+    """Cliente o manicurista del usuario (None si no tiene), sin consultar si vino en select_related"""
+    return getattr(usuario, relacion, None)
+
+
+def _perfil_activo(usuario, relacion):
+    encontrado = perfil(usuario, relacion)
+    if relacion == 'manicurista':
+        return encontrado is not None and encontrado.estado == 'activo'
+    return encontrado is not None and bool(encontrado.estado)
+
+
+def _con_contraseña_de_perfil(contraseña, relacion, usuario, filtro):
+    """
+    Usuario del perfil si `contraseña` es su contraseña temporal, después de
+    copiarla a `Usuario.password` (o de crear el usuario); si no, None.
+    """
+    if usuario is not None:
+        encontrado = perfil(usuario, relacion)
+    else:
+        prefijo = f'{relacion}__'
+        if not all(campo.startswith(prefijo) for campo in filtro):
+            return None
+        encontrado = apps.get_model(*MODELOS_PERFIL[relacion]).objects.filter(
+            usuario__isnull=True, **{campo[len(prefijo):]: valor for campo, valor in filtro.items()}
+        ).first()
+
+    if encontrado is None or not encontrado.contraseña_temporal:
+        # Mismo costo que verificar una contraseña, para no revelar qué perfiles existen
+        Usuario().set_password(contraseña)
+        return None
+    if not encontrado.verificar_contraseña_temporal(contraseña):
+        return None
+
+    if usuario is None:
+        try:
+            with transaction.atomic():
+                usuario_id = encontrado.crear_usuario_relacionado().pk
+        except IntegrityError:
+            # Otro usuario ya tiene el correo o el documento del perfil
+            raise ErrorLogin(CUENTA_SIN_USUARIO)
+        return Usuario.objects.select_related('rol', 'cliente', 'manicurista').get(pk=usuario_id)
+
+    Usuario.objects.filter(pk=usuario.pk).update(password=encontrado.contraseña_temporal)
+    usuario.password = encontrado.contraseña_temporal
+    return usuario
+
+
+def autenticar(contraseña, relacion=None, **filtro):
+    """
+    Buscar el usuario con `filtro` y verificar la contraseña.
+
+    `relacion` ('cliente' o 'manicurista') exige además que ese perfil esté
+    activo, y permite la contraseña temporal del perfil como respaldo.
+    Retorna el usuario (con rol y perfiles ya cargados) o lanza ErrorLogin.
+    """
+    usuario = Usuario.objects.select_related('rol', 'cliente', 'manicurista').filter(**filtro).first()
+    if usuario is None and not relacion:
+        # Calcular un hash igual que con un usuario existente para no revelar cuáles existen
+        Usuario().set_password(contraseña)
+        raise ErrorLogin(CREDENCIALES_INCORRECTAS)
+
+    if usuario is None or not usuario.check_password(contraseña):
+        usuario = _con_contraseña_de_perfil(contraseña, relacion, usuario, filtro) if relacion else None
+        if usuario is None:
+            raise ErrorLogin(CREDENCIALES_INCORRECTAS)
+
+    if not usuario.is_active or (relacion and not _perfil_activo(usuario, relacion)):
+        raise ErrorLogin(CUENTA_INACTIVA)
+    return usuario
+
+
+def datos_sesion(usuario):
+    """Tokens e ids de perfil que reciben todos los endpoints de login"""
+    refresh = tokens_para_usuario(usuario)
+    cliente = perfil(usuario, 'cliente')
+    manicurista = perfil(usuario, 'manicurista')
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+        'cliente_id': cliente.id if cliente else None,
+        'manicurista_id': manicurista.id if manicurista else None,
+    }
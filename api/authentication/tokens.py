@@ -0,0 +1,107 @@
+"""
+Tokens JWT con los datos que necesitan los permisos.
+
+El access token lleva rol_id, rol_version, cliente_id y manicurista_id.
+`JWTRolAuthentication` devuelve un `UsuarioToken` construido con esos
+claims, sin consultar la tabla de usuarios; el Usuario completo se carga
+solo si una vista lo pide (`request.user.usuario` o un atributo que no esté
+en el token).
+
+Un token cuyo rol_version ya no es la versión de permisos vigente del rol
+(leída de la cache de permisos) se rechaza con 401; al renovarlo en
+/api/auth/token/refresh/ los claims se vuelven a leer del Usuario.
+"""
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.roles.permisos import version_permisos
+from api.usuarios.models import Usuario
+
+
+def agregar_claims(token, usuario):
+    """
+    Agregar al token el rol, su versión de permisos y los perfiles del
+    usuario. Con select_related('rol', 'cliente', 'manicurista') no consulta
+    la base de datos.
+    """
+    rol = usuario.rol if usuario.rol_id else None
+    cliente = getattr(usuario, 'cliente', None)
+    manicurista = getattr(usuario, 'manicurista', None)
+    token['rol_id'] = usuario.rol_id
+    token['rol_version'] = rol.version_permisos if rol else None
+    token['cliente_id'] = cliente.id if cliente else None
+    token['manicurista_id'] = manicurista.id if manicurista else None
+    return token
+
+
+def tokens_para_usuario(usuario):
+    """Par refresh/access con los claims del usuario"""
+    return agregar_claims(RefreshToken.for_user(usuario), usuario)
+
+
+class TokenUsuarioSerializer(TokenObtainPairSerializer):
+    """Serializer del login: el par de tokens incluye los claims de permisos"""
+
+    @classmethod
+    def get_token(cls, user):
+        return agregar_claims(super().get_token(user), user)
+
+
+class RefreshTokenUsuario(RefreshToken):
+    """
+    Refresh token que, al leerse para renovar, vuelve a tomar los claims del
+    Usuario: si le cambiaron el rol o los permisos del rol, el access token
+    nuevo lleva los vigentes.
+    """
+
+    def __init__(self, token=None, verify=True):
+        super().__init__(token, verify)
+        if token is not None:
+            usuario = Usuario.objects.select_related('rol', 'cliente', 'manicurista').filter(
+                pk=self.payload.get(api_settings.USER_ID_CLAIM)
+            ).first()
+            if usuario is not None:
+                agregar_claims(self, usuario)
+
+
+class TokenRenovarSerializer(TokenRefreshSerializer):
+    """Serializer de /token/refresh/: renueva con los claims actuales del usuario"""
+    token_class = RefreshTokenUsuario
+
+
+class JWTRolAuthentication(JWTStatelessUserAuthentication):
+    """
+    Autenticación por token sin consultar usuarios, que rechaza los tokens
+    emitidos con una versión de permisos del rol ya superada.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        rol_id = token.get('rol_id')
+        if rol_id is not None and token.get('rol_version') != version_permisos(rol_id):
+            raise InvalidToken('Los permisos del rol cambiaron; renueve el token.')
+        return token
+
+
+class UsuarioToken(TokenUser):
+    """
+    Usuario autenticado a partir del token. Los atributos se leen primero de
+    los claims; lo que no viaja en el token (o un token emitido antes de los
+    claims) se lee del Usuario, que se consulta una sola vez.
+    """
+
+    @cached_property
+    def usuario(self):
+        return Usuario.objects.get(pk=self.id)
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_') or nombre == 'token':
+            raise AttributeError(nombre)
+        if nombre in self.token:
+            return self.token[nombre]
+        return getattr(self.usuario, nombre)
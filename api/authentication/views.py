@@ -9,9 +9,9 @@ from rest_framework import generics, status
 import logging
 
 from api.usuarios.models import Usuario
-from api.manicuristas.models import Manicurista
-from api.clientes.models import Cliente
 from api.roles.models import Rol
+from api.authentication.login import ErrorLogin, autenticar, datos_sesion
+from api.authentication.tokens import tokens_para_usuario
 
 from api.usuarios.serializers import (
     UsuarioSerializer,
@@ -27,52 +27,26 @@ class LoginView(TokenObtainPairView):
     permission_classes = [AllowAny]
 
     def post(self, request, *args, **kwargs):
-        data = request.data.copy()
-        login_input = data.get('correo_electronico')
-
-        if login_input:
-            try:
-                user = Usuario.objects.filter(correo_electronico=login_input).first()
-                if user:
-                    data['username'] = user.correo_electronico
-            except Exception as e:
-                logger.error(f"Error al buscar usuario por correo: {e}")
-                return Response({"error": "Error interno del servidor"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                return Response({"detail": "No active account found with the given credentials"}, status=401)
-
-
-        # Continuar con el login original
-        response = super().post(request, *args, **kwargs)
-
-        if response.status_code == status.HTTP_200_OK:
-            try:
-                user = Usuario.objects.get(correo_electronico=login_input or data.get('username'))
-
-                # Adjuntar objeto `user` serializado
-                usuario_serializado = UsuarioDetailSerializer(user)
-                response.data['user'] = usuario_serializado.data
-
-                # Roles específicos
-                if hasattr(user, 'rol') and user.rol:
-                    if user.rol.nombre.lower() == 'cliente':
-                        try:
-                            cliente = Cliente.objects.get(documento=user.documento)
-                            response.data['cliente_id'] = cliente.id
-                        except Cliente.DoesNotExist:
-                            logger.warning(f"No se encontró cliente para el usuario {user.correo_electronico}")
-                    elif user.rol.nombre.lower() == 'manicurista':
-                        try:
-                            nombre_split = user.nombre.split()
-                            if nombre_split:
-                                manicurista = Manicurista.objects.filter(nombres=nombre_split[0]).first()
-                                if manicurista:
-                                    response.data['manicurista_id'] = manicurista.id
-                        except Exception as e:
-                            logger.warning(f"No se encontró manicurista para el usuario {user.correo_electronico}: {e}")
-            except Exception as e:
-                logger.error(f"Error al obtener info del usuario tras login: {e}")
-
-        return response
+        correo = request.data.get('correo_electronico') or request.data.get('username')
+        contraseña = request.data.get('password')
+        if not correo or not contraseña:
+            return Response(
+                {"detail": "Se requieren correo_electronico y password"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            usuario = autenticar(contraseña, correo_electronico=correo)
+        except ErrorLogin:
+            return Response(
+                {"detail": "No active account found with the given credentials"},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        # Rol y perfiles ya vienen cargados: armar la respuesta no consulta la base de datos
+        respuesta = datos_sesion(usuario)
+        respuesta['user'] = UsuarioDetailSerializer(usuario).data
+        return Response(respuesta)
 
 
 # ✅ REGISTRO de usuario (cliente) + generación de tokens y respuesta esperada por frontend
@@ -115,7 +89,7 @@ class RegistroClienteView(generics.CreateAPIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         # ✅ GENERAR JWT
-        refresh = RefreshToken.for_user(usuario)
+        refresh = tokens_para_usuario(usuario)
         access = str(refresh.access_token)
 
         # ✅ Serializar usuario
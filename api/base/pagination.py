@@ -0,0 +1,44 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class OrdenCursorPagination(CursorPagination):
+    """
+    Paginación por cursor para todos los listados de la API.
+
+    El cursor usa el mismo orden que ya aplica cada vista: primero el
+    order_by del queryset, luego el `Meta.ordering` del modelo y, si el
+    modelo no define ninguno, '-pk'. Siempre se agrega la llave primaria
+    como desempate para que el orden sea estable entre páginas.
+
+    El cliente puede pedir otro tamaño de página con `?page_size=`, hasta el
+    máximo definido en `API_MAX_PAGE_SIZE`. Para desactivar la paginación en
+    una vista basta con declarar `pagination_class = None`.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+
+        # Si la vista permite ordenar con OrderingFilter se respeta ese orden
+        filtros_orden = [
+            backend for backend in getattr(view, 'filter_backends', [])
+            if hasattr(backend, 'get_ordering')
+        ]
+        if filtros_orden:
+            ordering = filtros_orden[0]().get_ordering(request, queryset, view)
+
+        ordering = (
+            ordering
+            or getattr(view, 'cursor_ordering', None)
+            or [campo for campo in queryset.query.order_by if isinstance(campo, str)]
+            or [campo for campo in queryset.model._meta.ordering if isinstance(campo, str)]
+            or ['-pk']
+        )
+
+        ordering = tuple(ordering)
+        if not any(campo.lstrip('-') in ('pk', 'id') for campo in ordering):
+            desempate = '-pk' if ordering[0].startswith('-') else 'pk'
+            ordering += (desempate,)
+        return ordering
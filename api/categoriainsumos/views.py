@@ -13,6 +13,7 @@ class CategoriaInsumoViewSet(viewsets.ModelViewSet):
   """
   queryset = CategoriaInsumo.objects.all()
   serializer_class = CategoriaInsumoSerializer
+  pagination_class = None  # Catálogo pequeño: se lista completo
   
   def get_queryset(self):
       """
@@ -0,0 +1,529 @@
+"""
+Motor de disponibilidad de manicuristas.
+
+La agenda de cada manicurista en un día se representa con una AgendaDia:
+una lista ordenada de bloques ocupados [inicio, fin) expresados en minutos
+desde la medianoche. Los bloques que se solapan se fusionan, de modo que
+las consultas "¿está libre [inicio, inicio + duración)?" y "¿qué motivo
+ocupa este slot?" se resuelven con búsqueda binaria.
+
+Todas las vistas y serializers que necesitan saber si una manicurista está
+libre deben cargar sus agendas con `cargar_agendas`, que trae las citas y
+las novedades de un rango de fechas en dos consultas. Las lecturas que
+toleran servir la agenda desde cache usan `obtener_agendas`; la cache se
+invalida con `invalidar_agenda` (o `invalidar_agendas` para un rango) desde
+las señales de Cita y Novedad. La invalidación se hace al confirmar la
+transacción: antes, otra petición podría recalcular la agenda con los datos
+sin confirmar y dejarla cacheada con la generación nueva.
+"""
+import logging
+import time as reloj
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+# Horario de atención (10:00 AM - 8:00 PM) con citas cada 30 minutos
+HORA_INICIO = time(10, 0)
+HORA_FIN = time(20, 0)
+INTERVALO_MINUTOS = 30
+
+# Estados de cita que ocupan tiempo en la agenda
+ESTADOS_CITA_ACTIVOS = ('pendiente', 'en_proceso')
+
+TIPO_CITA = 'cita'
+TIPO_NOVEDAD = 'novedad'
+TIPO_HORARIO = 'horario'
+
+
+def minutos(hora):
+    """Convertir un objeto time a minutos desde la medianoche"""
+    return hora.hour * 60 + hora.minute
+
+
+def formatear_minutos(total):
+    """Convertir minutos desde la medianoche a 'HH:MM'"""
+    return f'{total // 60:02d}:{total % 60:02d}'
+
+
+def parsear_hora(hora):
+    """Aceptar time, 'HH:MM' o 'HH:MM:SS' y devolver un objeto time"""
+    if isinstance(hora, time):
+        return hora
+    formato = '%H:%M:%S' if str(hora).count(':') == 2 else '%H:%M'
+    return datetime.strptime(str(hora), formato).time()
+
+
+def parsear_fecha(fecha):
+    """Aceptar date o 'YYYY-MM-DD' y devolver un objeto date"""
+    if isinstance(fecha, str):
+        return datetime.strptime(fecha, '%Y-%m-%d').date()
+    return fecha
+
+
+def duracion_cita(duracion_total, duracion_estimada=None):
+    """Duración efectiva de una cita en minutos"""
+    return duracion_total or duracion_estimada or INTERVALO_MINUTOS
+
+
+class Ocupacion:
+    """Intervalo ocupado de la agenda con su origen y motivo"""
+    __slots__ = ('inicio', 'fin', 'tipo', 'motivo')
+
+    def __init__(self, inicio, fin, tipo, motivo):
+        self.inicio = inicio
+        self.fin = fin
+        self.tipo = tipo
+        self.motivo = motivo
+
+    def to_dict(self):
+        return {
+            'inicio': self.inicio,
+            'fin': self.fin,
+            'tipo': self.tipo,
+            'motivo': self.motivo,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['inicio'], data['fin'], data['tipo'], data['motivo'])
+
+
+class AgendaDia:
+    """Bloques ocupados de una manicurista en un día"""
+
+    def __init__(self, inicio_jornada=HORA_INICIO, fin_jornada=HORA_FIN, intervalo=INTERVALO_MINUTOS):
+        self.inicio_jornada = minutos(inicio_jornada)
+        self.fin_jornada = minutos(fin_jornada)
+        self.intervalo = intervalo
+        self._ocupaciones = []
+        self._inicios = []
+        self._fines = []
+        self._grupos = []
+        self._pendiente_fusion = False
+
+    # ===== CONSTRUCCIÓN =====
+
+    def agregar(self, inicio, fin, tipo, motivo=''):
+        """Registrar un intervalo ocupado [inicio, fin) en minutos"""
+        if fin <= inicio:
+            return
+        self._ocupaciones.append(Ocupacion(inicio, fin, tipo, motivo))
+        self._pendiente_fusion = True
+
+    def _fusionar(self):
+        """Ordenar y fusionar los intervalos que se solapan"""
+        self._ocupaciones.sort(key=lambda o: (o.inicio, o.fin))
+        self._inicios, self._fines, self._grupos = [], [], []
+
+        for ocupacion in self._ocupaciones:
+            if self._fines and ocupacion.inicio < self._fines[-1]:
+                self._fines[-1] = max(self._fines[-1], ocupacion.fin)
+                self._grupos[-1].append(ocupacion)
+            else:
+                self._inicios.append(ocupacion.inicio)
+                self._fines.append(ocupacion.fin)
+                self._grupos.append([ocupacion])
+
+        self._pendiente_fusion = False
+
+    def _primer_bloque(self, inicio, fin):
+        """Índice del primer bloque fusionado que se solapa con [inicio, fin), o None"""
+        if self._pendiente_fusion:
+            self._fusionar()
+
+        i = bisect_right(self._inicios, inicio) - 1
+        if i >= 0 and self._fines[i] > inicio:
+            return i
+        i += 1
+        if i < len(self._inicios) and self._inicios[i] < fin:
+            return i
+        return None
+
+    # ===== CONSULTAS =====
+
+    def esta_libre(self, inicio, duracion=None):
+        """¿Está libre [inicio, inicio + duración) dentro del horario de atención?"""
+        fin = inicio + (duracion or self.intervalo)
+        if inicio < self.inicio_jornada or fin > self.fin_jornada:
+            return False
+        return self._primer_bloque(inicio, fin) is None
+
+    def ocupaciones_en(self, inicio, fin):
+        """Ocupaciones originales que se solapan con [inicio, fin)"""
+        i = self._primer_bloque(inicio, fin)
+        if i is None:
+            return []
+
+        resultado = []
+        while i < len(self._inicios) and self._inicios[i] < fin:
+            resultado.extend(o for o in self._grupos[i] if o.inicio < fin and o.fin > inicio)
+            i += 1
+        return resultado
+
+    def motivo_en(self, inicio, duracion=None):
+        """Motivo de la primera ocupación que impide usar [inicio, inicio + duración)"""
+        fin = inicio + (duracion or self.intervalo)
+        if inicio < self.inicio_jornada or fin > self.fin_jornada:
+            return Ocupacion(
+                inicio, fin, TIPO_HORARIO,
+                f'Fuera del horario de atención ({formatear_minutos(self.inicio_jornada)} - '
+                f'{formatear_minutos(self.fin_jornada)}).'
+            )
+        ocupaciones = self.ocupaciones_en(inicio, fin)
+        return ocupaciones[0] if ocupaciones else None
+
+    def slots(self):
+        """Inicio (en minutos) de todos los slots del horario de atención"""
+        return list(range(self.inicio_jornada, self.fin_jornada, self.intervalo))
+
+    def slots_libres(self, duracion=None):
+        """Slots en los que cabe una cita de la duración indicada"""
+        return [s for s in self.slots() if self.esta_libre(s, duracion)]
+
+    def bitmap(self, duracion=None):
+        """Cadena con un carácter por slot: '1' disponible, '0' ocupado"""
+        return ''.join('1' if self.esta_libre(s, duracion) else '0' for s in self.slots())
+
+    # ===== SERIALIZACIÓN (para cache) =====
+
+    def to_list(self):
+        return [o.to_dict() for o in self._ocupaciones]
+
+    @classmethod
+    def from_list(cls, ocupaciones):
+        agenda = cls()
+        agenda._ocupaciones = [Ocupacion.from_dict(o) for o in ocupaciones]
+        agenda._pendiente_fusion = True
+        return agenda
+
+
+def _agregar_novedad(agenda, estado, tipo_ausencia, hora_inicio_ausencia, hora_fin_ausencia,
+                     hora_entrada, observaciones):
+    """Traducir una novedad a intervalos ocupados de la agenda"""
+    detalle = observaciones or 'Sin motivo'
+
+    if estado == 'ausente':
+        if tipo_ausencia == 'completa':
+            agenda.agregar(
+                agenda.inicio_jornada, agenda.fin_jornada, TIPO_NOVEDAD,
+                f'Ausencia completa: {detalle}'
+            )
+        elif tipo_ausencia == 'por_horas' and hora_inicio_ausencia and hora_fin_ausencia:
+            agenda.agregar(
+                minutos(hora_inicio_ausencia), minutos(hora_fin_ausencia), TIPO_NOVEDAD,
+                f'Ausencia de {hora_inicio_ausencia.strftime("%H:%M")} a '
+                f'{hora_fin_ausencia.strftime("%H:%M")}: {detalle}'
+            )
+
+    elif estado == 'tardanza' and hora_entrada:
+        agenda.agregar(
+            agenda.inicio_jornada, minutos(hora_entrada), TIPO_NOVEDAD,
+            f'Tardanza: llega a las {hora_entrada.strftime("%H:%M")}'
+        )
+
+
+def cargar_agendas(manicurista_ids, fecha_desde, fecha_hasta=None, excluir_cita_id=None):
+    """
+    Construir las agendas de varias manicuristas en un rango de fechas.
+
+    Hace exactamente dos consultas (citas y novedades) y devuelve un
+    diccionario {(manicurista_id, fecha): AgendaDia} con una entrada por
+    cada combinación, aunque el día esté libre.
+    """
+    from api.citas.models import Cita
+    from api.novedades.models import Novedad
+
+    fecha_hasta = fecha_hasta or fecha_desde
+    manicurista_ids = list(manicurista_ids)
+    dias = (fecha_hasta - fecha_desde).days + 1
+    fechas = [fecha_desde + timedelta(days=i) for i in range(dias)]
+    agendas = {(m, f): AgendaDia() for m in manicurista_ids for f in fechas}
+
+    if not manicurista_ids:
+        return agendas
+
+    citas = Cita.objects.filter(
+        manicurista_id__in=manicurista_ids,
+        fecha_cita__range=(fecha_desde, fecha_hasta),
+        estado__in=ESTADOS_CITA_ACTIVOS
+    )
+    if excluir_cita_id:
+        citas = citas.exclude(id=excluir_cita_id)
+
+    for manicurista_id, fecha, hora, duracion_total, duracion_estimada, cliente_nombre in citas.values_list(
+        'manicurista_id', 'fecha_cita', 'hora_cita', 'duracion_total', 'duracion_estimada', 'cliente__nombre'
+    ):
+        inicio = minutos(hora)
+        fin = inicio + duracion_cita(duracion_total, duracion_estimada)
+        agendas[(manicurista_id, fecha)].agregar(
+            inicio, fin, TIPO_CITA,
+            f'Cita agendada con {cliente_nombre} ({formatear_minutos(inicio)} - {formatear_minutos(fin)})'
+        )
+
+    # Una novedad puede cubrir varios días: se traen las que se cruzan con el rango
+    novedades = Novedad.objects.filter(
+        manicurista_id__in=manicurista_ids,
+        fecha__lte=fecha_hasta,
+        fecha_fin__gte=fecha_desde,
+        estado__in=['ausente', 'tardanza']
+    ).values_list(
+        'manicurista_id', 'fecha', 'fecha_fin', 'estado', 'tipo_ausencia',
+        'hora_inicio_ausencia', 'hora_fin_ausencia', 'hora_entrada', 'observaciones'
+    )
+
+    for manicurista_id, inicio, fin, *datos in novedades:
+        dia = max(inicio, fecha_desde)
+        while dia <= min(fin, fecha_hasta):
+            _agregar_novedad(agendas[(manicurista_id, dia)], *datos)
+            dia += timedelta(days=1)
+
+    return agendas
+
+
+def cargar_agenda(manicurista_id, fecha, excluir_cita_id=None):
+    """Agenda de una sola manicurista en un día"""
+    fecha = parsear_fecha(fecha)
+    return cargar_agendas([int(manicurista_id)], fecha, excluir_cita_id=excluir_cita_id)[(int(manicurista_id), fecha)]
+
+
+def buscar_proximos_libres(manicurista_ids, duracion, desde, minuto_minimo=None, max_dias=60, cargar=None):
+    """
+    Generador de huecos libres (manicurista_id, fecha, minuto) en orden
+    cronológico. Recorre los días uno a uno y solo carga la agenda del día
+    que está revisando, así quien consume el generador puede cortar apenas
+    tenga los resultados que necesita.
+
+    `minuto_minimo` descarta los slots anteriores a esa hora en el primer día.
+    """
+    cargar = cargar or cargar_agendas
+    manicurista_ids = sorted(manicurista_ids)
+
+    for i in range(max_dias):
+        fecha = desde + timedelta(days=i)
+        agendas = cargar(manicurista_ids, fecha)
+
+        libres = []
+        for manicurista_id in manicurista_ids:
+            agenda = agendas[(manicurista_id, fecha)]
+            for slot in agenda.slots_libres(duracion):
+                if i == 0 and minuto_minimo is not None and slot < minuto_minimo:
+                    continue
+                libres.append((slot, manicurista_id))
+
+        for slot, manicurista_id in sorted(libres):
+            yield manicurista_id, fecha, slot
+
+
+# ===== CACHE DE AGENDAS =====
+#
+# Cada agenda se guarda bajo una clave que incluye la "generación" de ese
+# manicurista-día. Invalidar consiste en incrementar la generación, así las
+# lecturas concurrentes que aún calculan con datos viejos escriben en una
+# clave que ya nadie va a leer.
+#
+# Si el backend no responde, las agendas se calculan desde la base de datos
+# sin cache durante SEGUNDOS_SIN_BACKEND y las invalidaciones se pierden.
+# Por eso, al volver a usar el backend, el proceso que vio la caída
+# incrementa la época: una generación global que también forma parte de la
+# clave, así ninguna agenda cacheada antes de la caída se vuelve a servir.
+
+VERSION_CACHE = 1
+PREFIJO_CACHE = f'disponibilidad:v{VERSION_CACHE}'
+CLAVE_HITS = f'{PREFIJO_CACHE}:stats:hits'
+CLAVE_MISSES = f'{PREFIJO_CACHE}:stats:misses'
+CLAVE_EPOCA = f'{PREFIJO_CACHE}:epoca'
+
+SEGUNDOS_SIN_BACKEND = 30
+_backend_caido_hasta = 0
+_descartar_al_volver = False
+
+
+class CacheNoDisponible(Exception):
+    """El backend de cache no responde"""
+
+
+def _cache():
+    return caches['default']
+
+
+def _incrementar(clave, delta=1, cache=None):
+    """
+    incr que crea la clave si no existe. Sin `cache` pasa por `_ejecutar`;
+    `_ejecutar` mismo lo usa con el backend directo para la época.
+    """
+    if cache is None:
+        operar = _ejecutar
+    else:
+        def operar(operacion, *args):
+            return getattr(cache, operacion)(*args)
+    try:
+        return operar('incr', clave, delta)
+    except ValueError:
+        if operar('add', clave, delta, None):
+            return delta
+        return operar('incr', clave, delta)
+
+
+def _ejecutar(operacion, *args, **kwargs):
+    """Ejecutar una operación sobre la cache configurada; CacheNoDisponible si no responde"""
+    global _backend_caido_hasta, _descartar_al_volver
+
+    if reloj.monotonic() < _backend_caido_hasta:
+        raise CacheNoDisponible()
+
+    cache = _cache()
+    try:
+        if _descartar_al_volver:
+            # Durante la caída se pudieron perder invalidaciones
+            _incrementar(CLAVE_EPOCA, cache=cache)
+            _descartar_al_volver = False
+        return getattr(cache, operacion)(*args, **kwargs)
+    except ValueError:
+        # incr sobre una clave inexistente: lo maneja quien llama
+        raise
+    except Exception as e:
+        logger.warning("Cache de disponibilidad no disponible, se consulta la base de datos: %s", e)
+        _backend_caido_hasta = reloj.monotonic() + SEGUNDOS_SIN_BACKEND
+        _descartar_al_volver = True
+        raise CacheNoDisponible() from e
+
+
+def _timeout():
+    return getattr(settings, 'CACHE_TTL', 60 * 15)
+
+
+def _clave_generacion(manicurista_id, fecha):
+    return f'{PREFIJO_CACHE}:gen:{manicurista_id}:{fecha.isoformat()}'
+
+
+def _clave_agenda(manicurista_id, fecha, epoca, generacion):
+    return f'{PREFIJO_CACHE}:agenda:{epoca}:{manicurista_id}:{fecha.isoformat()}:{generacion}'
+
+
+def _generaciones(claves):
+    """Época y generación actual de cada manicurista-día (inicializando las que falten)"""
+    claves_gen = {clave: _clave_generacion(*clave) for clave in claves}
+    actuales = _ejecutar('get_many', list(claves_gen.values()) + [CLAVE_EPOCA])
+
+    generaciones = {}
+    for clave, clave_gen in claves_gen.items():
+        if clave_gen not in actuales:
+            # Una generación nueva nunca coincide con entradas previas a un desalojo
+            _ejecutar('add', clave_gen, int(reloj.time() * 1000), None)
+            actuales[clave_gen] = _ejecutar('get', clave_gen)
+        generaciones[clave] = actuales[clave_gen]
+    return actuales.get(CLAVE_EPOCA, 0), generaciones
+
+
+def _invalidar(manicurista_id, fechas):
+    for fecha in fechas:
+        try:
+            _incrementar(_clave_generacion(manicurista_id, fecha))
+        except CacheNoDisponible:
+            # La época se incrementa cuando el backend vuelva
+            return
+
+
+def invalidar_agenda(manicurista_id, fecha):
+    """Descartar la agenda cacheada de una manicurista en un día, al confirmar la transacción"""
+    invalidar_agendas(manicurista_id, fecha)
+
+
+def invalidar_agendas(manicurista_id, fecha_desde, fecha_hasta=None):
+    """
+    Descartar la agenda cacheada de una manicurista en un rango de días
+    (inclusive), al confirmar la transacción en curso (o ya, si no hay).
+    """
+    if manicurista_id is None or fecha_desde is None:
+        return
+    fecha_desde = parsear_fecha(fecha_desde)
+    fecha_hasta = parsear_fecha(fecha_hasta) if fecha_hasta else fecha_desde
+    fechas = [fecha_desde + timedelta(days=i) for i in range((fecha_hasta - fecha_desde).days + 1)]
+    transaction.on_commit(lambda: _invalidar(manicurista_id, fechas))
+
+
+def obtener_agendas(manicurista_ids, fecha_desde, fecha_hasta=None):
+    """
+    Igual que `cargar_agendas`, pero leyendo de cache los manicurista-día ya
+    calculados y consultando la base de datos solo para los que faltan. Si la
+    cache no responde, todo se consulta en la base de datos.
+    """
+    fecha_hasta = fecha_hasta or fecha_desde
+    manicurista_ids = list(manicurista_ids)
+    dias = (fecha_hasta - fecha_desde).days + 1
+    claves = [(m, fecha_desde + timedelta(days=i)) for m in manicurista_ids for i in range(dias)]
+    if not claves:
+        return {}
+
+    try:
+        epoca, generaciones = _generaciones(claves)
+        claves_cache = {clave: _clave_agenda(*clave, epoca, generaciones[clave]) for clave in claves}
+        cacheadas = _ejecutar('get_many', list(claves_cache.values()))
+    except CacheNoDisponible:
+        return cargar_agendas(manicurista_ids, fecha_desde, fecha_hasta)
+
+    agendas = {}
+    faltantes = []
+    for clave, clave_cache in claves_cache.items():
+        if clave_cache in cacheadas:
+            agendas[clave] = AgendaDia.from_list(cacheadas[clave_cache])
+        else:
+            faltantes.append(clave)
+
+    try:
+        if agendas:
+            _incrementar(CLAVE_HITS, len(agendas))
+        if faltantes:
+            _incrementar(CLAVE_MISSES, len(faltantes))
+    except CacheNoDisponible:
+        pass
+
+    if faltantes:
+        ids_faltantes = sorted({m for m, _ in faltantes})
+        desde = min(f for _, f in faltantes)
+        hasta = max(f for _, f in faltantes)
+        calculadas = cargar_agendas(ids_faltantes, desde, hasta)
+
+        nuevas = {}
+        for clave in faltantes:
+            agendas[clave] = calculadas[clave]
+            nuevas[claves_cache[clave]] = calculadas[clave].to_list()
+        try:
+            _ejecutar('set_many', nuevas, _timeout())
+        except CacheNoDisponible:
+            pass
+
+    return agendas
+
+
+def obtener_agenda(manicurista_id, fecha):
+    """Agenda cacheada de una sola manicurista en un día"""
+    fecha = parsear_fecha(fecha)
+    return obtener_agendas([int(manicurista_id)], fecha)[(int(manicurista_id), fecha)]
+
+
+def estadisticas_cache():
+    """Contadores de aciertos y fallos de la cache de disponibilidad"""
+    try:
+        contadores = _ejecutar('get_many', [CLAVE_HITS, CLAVE_MISSES])
+        disponible = True
+    except CacheNoDisponible:
+        contadores, disponible = {}, False
+    hits = contadores.get(CLAVE_HITS) or 0
+    misses = contadores.get(CLAVE_MISSES) or 0
+    total = hits + misses
+    return {
+        'disponible': disponible,
+        'hits': hits,
+        'misses': misses,
+        'ratio_aciertos': round(hits / total, 4) if total else None,
+        'backend': _cache().__class__.__name__,
+        'ttl_segundos': _timeout(),
+    }
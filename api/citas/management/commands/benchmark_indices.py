@@ -0,0 +1,187 @@
+"""
+Benchmark de los índices compuestos de Cita, VentaServicio y Novedad.
+
+Para cada consulta caliente muestra el plan (EXPLAIN) y el tiempo medio
+con el índice creado y, con --confirmar, también con el índice eliminado
+temporalmente. Sembrar datos y eliminar índices modifica la base de datos:
+úselo solo sobre una base de datos de pruebas o una copia.
+
+Uso:
+
+    python manage.py benchmark_indices --seed 1000000 --confirmar
+    python manage.py benchmark_indices --confirmar   # sin sembrar, con y sin índices
+    python manage.py benchmark_indices               # solo lectura: planes y tiempos con índices
+"""
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.citas.models import Cita
+from api.clientes.busqueda import normalizar_texto
+from api.clientes.models import Cliente
+from api.manicuristas.models import Manicurista
+from api.novedades.models import Novedad
+from api.servicios.models import Servicio
+from api.ventaservicios.models import VentaServicio
+
+
+PREFIJO = 'BENCH'
+MANICURISTAS = 50
+CLIENTES = 2000
+HORAS = [datetime.combine(date.today(), datetime.min.time()).replace(hour=10) + timedelta(minutes=30 * i)
+         for i in range(20)]
+
+
+class Command(BaseCommand):
+    help = 'Compara planes y tiempos de las consultas calientes con y sin los índices compuestos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Cantidad de citas y de ventas a sembrar antes de medir (ej. 1000000)')
+        parser.add_argument('--batch', type=int, default=5000, help='Tamaño de lote para bulk_create')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Ejecuciones por consulta')
+        parser.add_argument('--confirmar', action='store_true',
+                            help='Confirmar que esta base de datos es de pruebas: permite sembrar datos '
+                                 'y eliminar índices temporalmente')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            if not options['confirmar']:
+                raise CommandError('Sembrar datos escribe en la base de datos; use --confirmar')
+            self._sembrar(options['seed'], options['batch'])
+
+        manicurista = Manicurista.objects.order_by('id').first()
+        cliente = Cliente.objects.order_by('id').first()
+        if not manicurista or not cliente:
+            raise CommandError('No hay datos para medir; use --seed')
+
+        cita = Cita.objects.filter(cliente=cliente).order_by('fecha_cita').first()
+        fecha = cita.fecha_cita if cita else date.today()
+        hora = cita.hora_cita if cita else HORAS[0].time()
+        inicio = timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+        fin = inicio + timedelta(days=15)
+
+        consultas = [
+            (Cita, 'cita_manic_fecha_estado_idx', 'Agenda de una manicurista en un día',
+             lambda: Cita.objects.filter(
+                 manicurista=manicurista, fecha_cita=fecha, estado__in=['pendiente', 'en_proceso'])),
+            (Cita, 'cita_cliente_fecha_hora_idx', 'Citas de un cliente en fecha y hora',
+             lambda: Cita.objects.filter(
+                 cliente=cliente, fecha_cita=fecha, hora_cita=hora, estado__in=['pendiente', 'en_proceso'])),
+            (VentaServicio, 'venta_manic_fecha_estado_idx', 'Ventas pagadas de una manicurista en una quincena',
+             lambda: VentaServicio.objects.filter(
+                 manicurista=manicurista, fecha_venta__gte=inicio, fecha_venta__lt=fin, estado='pagada')),
+            (VentaServicio, 'venta_estado_fecha_idx', 'Ventas pagadas en una quincena',
+             lambda: VentaServicio.objects.filter(
+                 estado='pagada', fecha_venta__gte=inicio, fecha_venta__lt=fin)),
+            (Novedad, 'novedad_manic_fecha_estado_idx', 'Novedades activas de una manicurista en un día',
+             lambda: Novedad.objects.filter(
+                 manicurista=manicurista, fecha__lte=fecha, fecha_fin__gte=fecha, estado__in=['ausente', 'tardanza'])),
+        ]
+
+        if not options['confirmar']:
+            self.stdout.write(self.style.WARNING(
+                'Sin --confirmar solo se mide con los índices; la comparación sin índice los elimina temporalmente'
+            ))
+
+        for modelo, nombre_indice, descripcion, consulta in consultas:
+            indice = next(i for i in modelo._meta.indexes if i.name == nombre_indice)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {descripcion} ({nombre_indice}) ==='))
+
+            self._medir('CON ÍNDICE', consulta, options['repeticiones'])
+            if not options['confirmar']:
+                continue
+
+            with connection.schema_editor() as editor:
+                editor.remove_index(modelo, indice)
+            try:
+                self._medir('SIN ÍNDICE', consulta, options['repeticiones'])
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.add_index(modelo, indice)
+
+    def _medir(self, etiqueta, consulta, repeticiones):
+        """Mostrar el plan y el tiempo medio de la consulta"""
+        self.stdout.write(self.style.SUCCESS(f'-- {etiqueta}'))
+        self.stdout.write(consulta().explain())
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            list(consulta().values_list('pk', flat=True)[:500])
+        promedio = (time.perf_counter() - inicio) / repeticiones * 1000
+        self.stdout.write(f'Tiempo medio: {promedio:.2f} ms')
+
+    def _sembrar(self, cantidad, batch):
+        """Crear manicuristas, clientes, citas, ventas y novedades de prueba"""
+        self.stdout.write(f'Sembrando {cantidad} citas y {cantidad} ventas...')
+
+        with transaction.atomic():
+            servicio, _ = Servicio.objects.get_or_create(
+                nombre=f'{PREFIJO} Servicio',
+                defaults={'precio': Decimal('30000'), 'descripcion': 'Benchmark', 'duracion': 30}
+            )
+            Manicurista.objects.bulk_create([
+                Manicurista(nombre=f'{PREFIJO} Manicurista {i}', correo=f'bench.m{i}@example.com')
+                for i in range(MANICURISTAS)
+            ], ignore_conflicts=True)
+            Cliente.objects.bulk_create([
+                Cliente(
+                    tipo_documento='CC', documento=f'{PREFIJO}{i}', nombre=f'{PREFIJO} Cliente {i}',
+                    busqueda=normalizar_texto(f'{PREFIJO} Cliente {i}'),
+                    celular='+573000000000', correo_electronico=f'bench.c{i}@example.com', direccion='N/A'
+                )
+                for i in range(CLIENTES)
+            ], ignore_conflicts=True)
+
+        manicuristas = list(Manicurista.objects.filter(nombre__startswith=PREFIJO).values_list('id', flat=True))
+        clientes = list(Cliente.objects.filter(documento__startswith=PREFIJO).values_list('id', flat=True))
+        estados_cita = ['pendiente', 'en_proceso', 'finalizada', 'cancelada']
+        estados_venta = ['pendiente', 'pagada', 'cancelada']
+        hoy = date.today()
+
+        # Cada manicurista atiende 20 citas por día: se recorren los días hacia atrás
+        slots_por_dia = len(manicuristas) * len(HORAS)
+        citas, ventas = [], []
+        for n in range(cantidad):
+            dia = hoy - timedelta(days=n // slots_por_dia)
+            resto = n % slots_por_dia
+            manicurista_id = manicuristas[resto // len(HORAS)]
+            hora = HORAS[resto % len(HORAS)].time()
+            cliente_id = random.choice(clientes)
+
+            citas.append(Cita(
+                cliente_id=cliente_id, manicurista_id=manicurista_id, servicio=servicio,
+                fecha_cita=dia, hora_cita=hora, estado=random.choice(estados_cita),
+                precio_servicio=servicio.precio, precio_total=servicio.precio,
+                duracion_total=servicio.duracion, duracion_estimada=servicio.duracion
+            ))
+            ventas.append(VentaServicio(
+                cliente_id=cliente_id, manicurista_id=manicurista_id, servicio=servicio,
+                precio_unitario=servicio.precio, total=servicio.precio,
+                estado=random.choice(estados_venta),
+                fecha_venta=timezone.make_aware(datetime.combine(dia, hora))
+            ))
+
+            if len(citas) >= batch:
+                Cita.objects.bulk_create(citas, ignore_conflicts=True)
+                VentaServicio.objects.bulk_create(ventas)
+                citas, ventas = [], []
+                self.stdout.write(f'  {n + 1} filas')
+
+        Cita.objects.bulk_create(citas, ignore_conflicts=True)
+        VentaServicio.objects.bulk_create(ventas)
+
+        # Una novedad cada diez días por manicurista
+        dias = cantidad // slots_por_dia + 1
+        Novedad.objects.bulk_create([
+            Novedad(manicurista_id=m, fecha=hoy - timedelta(days=d), fecha_fin=hoy - timedelta(days=d),
+                    estado='tardanza', hora_entrada=HORAS[2].time())
+            for m in manicuristas for d in range(0, dias, 10)
+        ], ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS('Datos de prueba creados'))
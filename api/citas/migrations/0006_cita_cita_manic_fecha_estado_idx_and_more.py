@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0005_cita_motivo_cancelacion_cita_novedad_relacionada_and_more'),
+        ('clientes', '0004_remove_cliente_password_cliente_usuario_and_more'),
+        ('manicuristas', '0003_manicurista_especialidad'),
+        ('novedades', '0004_alter_novedad_options_and_more'),
+        ('servicios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['manicurista', 'fecha_cita', 'estado'], name='cita_manic_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['cliente', 'fecha_cita', 'hora_cita', 'estado'], name='cita_cliente_fecha_hora_idx'),
+        ),
+    ]
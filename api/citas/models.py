@@ -126,6 +126,12 @@ class Cita(BaseModel):
         verbose_name_plural = "Citas"
         ordering = ['-fecha_cita', '-hora_cita']
         unique_together = ['manicurista', 'fecha_cita', 'hora_cita']
+        indexes = [
+            # Agenda de la manicurista (disponibilidad, citas del día)
+            models.Index(fields=['manicurista', 'fecha_cita', 'estado'], name='cita_manic_fecha_estado_idx'),
+            # Citas del cliente en una fecha/hora
+            models.Index(fields=['cliente', 'fecha_cita', 'hora_cita', 'estado'], name='cita_cliente_fecha_hora_idx'),
+        ]
 
     def __str__(self):
         return f"Cita {self.cliente.nombre} - {self.fecha_cita} {self.hora_cita}"
@@ -213,3 +219,58 @@ class Cita(BaseModel):
     def get_servicios_info(self):
         """Obtener información de todos los servicios"""
         return self.servicios.all()
+
+
+# ===== SEÑALES PARA INVALIDAR LA CACHE DE DISPONIBILIDAD =====
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from api.citas.availability import invalidar_agenda, invalidar_agendas
+
+
+@receiver(pre_save, sender=Cita)
+def recordar_agenda_anterior_cita(sender, instance, **kwargs):
+    """
+    Guardar manicurista y fecha originales para invalidar también el día
+    anterior, y el estado original para el libro de comisiones
+    """
+    instance._agenda_anterior = None
+    instance._estado_anterior = None
+    if instance.pk:
+        anterior = sender.objects.filter(pk=instance.pk).values_list(
+            'manicurista_id', 'fecha_cita', 'estado'
+        ).first()
+        if anterior:
+            instance._agenda_anterior = anterior[:2]
+            instance._estado_anterior = anterior[2]
+
+
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def invalidar_disponibilidad_cita(sender, instance, **kwargs):
+    """Invalidar la agenda del día de la cita (y la del día anterior si se movió)"""
+    invalidar_agenda(instance.manicurista_id, instance.fecha_cita)
+
+    anterior = getattr(instance, '_agenda_anterior', None)
+    if anterior and anterior != (instance.manicurista_id, instance.fecha_cita):
+        invalidar_agenda(*anterior)
+
+
+@receiver(pre_save, sender=Novedad)
+def recordar_agenda_anterior_novedad(sender, instance, **kwargs):
+    """Guardar manicurista y rango originales para invalidar también los días anteriores"""
+    instance._agenda_anterior = None
+    if instance.pk:
+        instance._agenda_anterior = sender.objects.filter(pk=instance.pk).values_list(
+            'manicurista_id', 'fecha', 'fecha_fin'
+        ).first()
+
+
+@receiver(post_save, sender=Novedad)
+@receiver(post_delete, sender=Novedad)
+def invalidar_disponibilidad_novedad(sender, instance, **kwargs):
+    """Invalidar la agenda de los días de la novedad (y los anteriores si se movió)"""
+    invalidar_agendas(instance.manicurista_id, instance.fecha, instance.fecha_fin)
+
+    anterior = getattr(instance, '_agenda_anterior', None)
+    if anterior and anterior != (instance.manicurista_id, instance.fecha, instance.fecha_fin):
+        invalidar_agendas(*anterior)
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.utils import timezone
 from datetime import datetime, time
 from .models import Cita
+from .availability import cargar_agenda, duracion_cita, minutos
 from api.clientes.models import Cliente
 from api.servicios.models import Servicio
 from api.manicuristas.models import Manicurista
@@ -10,6 +11,18 @@ from api.servicios.serializers import ServicioSerializer
 from api.manicuristas.serializers import ManicuristaSerializer
 
 
+def validar_disponibilidad_manicurista(manicurista, fecha_cita, hora_cita, duracion, instance=None):
+    """Lanzar ValidationError si [hora_cita, hora_cita + duración) se cruza con la agenda"""
+    agenda = cargar_agenda(
+        manicurista.id, fecha_cita, excluir_cita_id=instance.id if instance else None
+    )
+    ocupacion = agenda.motivo_en(minutos(hora_cita), duracion)
+    if ocupacion:
+        raise serializers.ValidationError({
+            'hora_cita': f'La manicurista no está disponible en ese horario. {ocupacion.motivo}'
+        })
+
+
 class CitaSerializer(serializers.ModelSerializer):
     # Campos de solo lectura para mostrar información completa
     cliente_info = ClienteSerializer(source='cliente', read_only=True)
@@ -85,23 +98,19 @@ class CitaSerializer(serializers.ModelSerializer):
         hora_cita = data.get('hora_cita')
         manicurista = data.get('manicurista')
 
-        # Verificar disponibilidad de la manicurista en esa fecha y hora
+        # Verificar disponibilidad de la manicurista durante toda la duración de la cita
         if fecha_cita and hora_cita and manicurista:
-            # Excluir la cita actual si estamos editando
-            queryset = Cita.objects.filter(
-                manicurista=manicurista,
-                fecha_cita=fecha_cita,
-                hora_cita=hora_cita,
-                estado__in=['pendiente', 'en_proceso']
-            )
-            
-            if self.instance:
-                queryset = queryset.exclude(id=self.instance.id)
-            
-            if queryset.exists():
-                raise serializers.ValidationError({
-                    'hora_cita': 'La manicurista ya tiene una cita programada en esta fecha y hora'
-                })
+            servicios = data.get('servicios')
+            if servicios:
+                duracion = sum(servicio.duracion for servicio in servicios)
+            elif data.get('servicio'):
+                duracion = data['servicio'].duracion
+            elif self.instance:
+                duracion = duracion_cita(self.instance.duracion_total, self.instance.duracion_estimada)
+            else:
+                duracion = None
+
+            validar_disponibilidad_manicurista(manicurista, fecha_cita, hora_cita, duracion, self.instance)
 
         return data
 
@@ -128,6 +137,26 @@ class CitaCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Debe seleccionar al menos un servicio")
         return value
 
+    def validate(self, data):
+        """Verificar que la manicurista esté libre durante la duración total de los servicios"""
+        instance = self.instance
+        manicurista = data.get('manicurista', instance.manicurista if instance else None)
+        fecha_cita = data.get('fecha_cita', instance.fecha_cita if instance else None)
+        hora_cita = data.get('hora_cita', instance.hora_cita if instance else None)
+
+        if manicurista and fecha_cita and hora_cita:
+            servicios = data.get('servicios')
+            if servicios:
+                duracion = sum(servicio.duracion for servicio in servicios)
+            elif instance:
+                duracion = duracion_cita(instance.duracion_total, instance.duracion_estimada)
+            else:
+                duracion = data['servicio'].duracion if data.get('servicio') else None
+
+            validar_disponibilidad_manicurista(manicurista, fecha_cita, hora_cita, duracion, instance)
+
+        return data
+
     def create(self, validated_data):
         """Crear cita con múltiples servicios"""
         servicios_data = validated_data.pop('servicios', [])
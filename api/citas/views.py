@@ -4,13 +4,20 @@ from rest_framework.decorators import action
 from django.db.models import Q, Count, Sum, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta, time
+from itertools import islice
 from .models import Cita
+from .availability import (
+    HORA_INICIO, HORA_FIN, INTERVALO_MINUTOS, TIPO_CITA, TIPO_NOVEDAD,
+    obtener_agenda, obtener_agendas, estadisticas_cache, buscar_proximos_libres,
+    minutos, formatear_minutos, parsear_hora
+)
 from .serializers import (
     CitaSerializer,
     CitaCreateSerializer,
     CitaUpdateEstadoSerializer,
     BuscarClienteSerializer
 )
+from api.clientes import busqueda
 from api.clientes.models import Cliente
 from api.clientes.serializers import ClienteSerializer
 from api.servicios.models import Servicio
@@ -24,9 +31,9 @@ class CitaViewSet(viewsets.ModelViewSet):
     serializer_class = CitaSerializer
 
     # CONFIGURACIÓN DE HORARIOS DE CITAS - UNIFICADO 10:00 AM - 8:00 PM
-    HORA_INICIO_CITAS = time(10, 0)  # 10:00 AM
-    HORA_FIN_CITAS = time(20, 0)     # 8:00 PM
-    INTERVALO_MINUTOS = 30           # Citas cada 30 minutos
+    HORA_INICIO_CITAS = HORA_INICIO          # 10:00 AM
+    HORA_FIN_CITAS = HORA_FIN                # 8:00 PM
+    INTERVALO_MINUTOS = INTERVALO_MINUTOS    # Citas cada 30 minutos
 
     def get_serializer_class(self):
         """Retorna el serializer apropiado según la acción"""
@@ -85,10 +92,8 @@ class CitaViewSet(viewsets.ModelViewSet):
         hora_cita = request.data.get('hora_cita')
 
         if manicurista_id and fecha_cita and hora_cita:
-            # Verificar disponibilidad de manicurista
-            disponibilidad_manicurista = self._verificar_disponibilidad_manicurista(
-                manicurista_id, fecha_cita, hora_cita
-            )
+            # Manicurista activa y horario de atención; la agenda la valida el serializer
+            disponibilidad_manicurista = self._verificar_disponibilidad_manicurista(manicurista_id, hora_cita)
             if not disponibilidad_manicurista['disponible']:
                 return Response(
                     {'error': disponibilidad_manicurista['razon']},
@@ -150,10 +155,8 @@ class CitaViewSet(viewsets.ModelViewSet):
         )
 
         if cambios_criticos:
-            # Verificar disponibilidad de manicurista (excluyendo la cita actual)
-            disponibilidad_manicurista = self._verificar_disponibilidad_manicurista(
-                manicurista_id, fecha_cita, hora_cita, excluir_cita_id=instance.id
-            )
+            # Manicurista activa y horario de atención; la agenda la valida el serializer
+            disponibilidad_manicurista = self._verificar_disponibilidad_manicurista(manicurista_id, hora_cita)
             if not disponibilidad_manicurista['disponible']:
                 return Response(
                     {'error': disponibilidad_manicurista['razon']},
@@ -189,14 +192,14 @@ class CitaViewSet(viewsets.ModelViewSet):
         response_serializer = CitaSerializer(cita)
         return Response(response_serializer.data)
 
-    def _verificar_disponibilidad_manicurista(self, manicurista_id, fecha, hora, excluir_cita_id=None):
-        """Verificar si la manicurista está disponible en la fecha y hora especificada"""
+    def _verificar_disponibilidad_manicurista(self, manicurista_id, hora):
+        """
+        Verificar que la manicurista esté activa y que la hora esté dentro del
+        horario de atención. Las citas y novedades que se cruzan con la duración
+        de la cita las valida CitaCreateSerializer con la agenda.
+        """
         try:
-            # Convertir strings a objetos apropiados
-            if isinstance(fecha, str):
-                fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
-            if isinstance(hora, str):
-                hora = datetime.strptime(hora, '%H:%M').time()
+            hora = parsear_hora(hora)
 
             # 1. Verificar que la manicurista existe y está activa
             try:
@@ -219,60 +222,6 @@ class CitaViewSet(viewsets.ModelViewSet):
                     'razon': f'Horario fuera del rango de atención (10:00 AM - 8:00 PM)'
                 }
 
-            # 3. Verificar novedades (ausencias y tardanzas)
-            try:
-                from api.novedades.models import Novedad
-
-                novedad = Novedad.objects.filter(
-                    manicurista_id=manicurista_id,
-                    fecha=fecha
-                ).first()
-
-                if novedad:
-                    if novedad.estado == 'ausente':
-                        if novedad.tipo_ausencia == 'completa':
-                            return {
-                                'disponible': False,
-                                'razon': f'{manicurista.nombres} tiene ausencia completa este día'
-                            }
-                        elif novedad.tipo_ausencia == 'por_horas':
-                            # Verificar si la hora está en el rango de ausencia
-                            if (novedad.hora_inicio_ausencia and novedad.hora_fin_ausencia and
-                                novedad.hora_inicio_ausencia <= hora < novedad.hora_fin_ausencia):
-                                return {
-                                    'disponible': False,
-                                    'razon': f'{manicurista.nombres} tiene ausencia de {novedad.hora_inicio_ausencia.strftime("%H:%M")} a {novedad.hora_fin_ausencia.strftime("%H:%M")}'
-                                }
-
-                    elif novedad.estado == 'tardanza':
-                        # Si hay tardanza y la cita es antes de la hora de llegada
-                        if novedad.hora_entrada and hora < novedad.hora_entrada:
-                            return {
-                                'disponible': False,
-                                'razon': f'{manicurista.nombres} llegará tarde (a las {novedad.hora_entrada.strftime("%H:%M")})'
-                            }
-
-            except ImportError:
-                # Si no existe el módulo de novedades, continuar sin verificar
-                pass
-
-            # 4. Verificar citas existentes
-            queryset = Cita.objects.filter(
-                manicurista_id=manicurista_id,
-                fecha_cita=fecha,
-                hora_cita=hora,
-                estado__in=['pendiente', 'en_proceso']
-            )
-
-            if excluir_cita_id:
-                queryset = queryset.exclude(id=excluir_cita_id)
-
-            if queryset.exists():
-                return {
-                    'disponible': False,
-                    'razon': f'{manicurista.nombres} ya tiene una cita programada a esta hora'
-                }
-
             return {
                 'disponible': True,
                 'razon': 'Horario disponible'
@@ -337,18 +286,6 @@ class CitaViewSet(viewsets.ModelViewSet):
                 'razon': 'Error al verificar disponibilidad del cliente'
             }
 
-    def _generar_horarios_disponibles(self, fecha):
-        """Generar lista de horarios disponibles para el día (10:00 AM - 8:00 PM cada 30 min)"""
-        horarios = []
-        hora_actual = datetime.combine(fecha, self.HORA_INICIO_CITAS)
-        hora_fin = datetime.combine(fecha, self.HORA_FIN_CITAS)
-
-        while hora_actual < hora_fin:
-            horarios.append(hora_actual.time().strftime('%H:%M'))
-            hora_actual += timedelta(minutes=self.INTERVALO_MINUTOS)
-
-        return horarios
-
     @action(detail=False, methods=['post'])
     def buscar_clientes(self, request):
         """Buscar clientes por nombre o documento"""
@@ -357,10 +294,7 @@ class CitaViewSet(viewsets.ModelViewSet):
 
         query = serializer.validated_data['query']
 
-        # Buscar por nombre o documento
-        clientes = Cliente.objects.filter(
-            Q(nombre__icontains=query) | Q(documento__icontains=query)
-        ).order_by('nombre')[:10]  # Limitar a 10 resultados
+        clientes = busqueda.buscar_clientes(query)
 
         serializer = ClienteSerializer(clientes, many=True)
         return Response(serializer.data)
@@ -461,43 +395,75 @@ class CitaViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
-        """Obtener estadísticas de citas"""
-        hoy = timezone.now().date()
+        """
+        Obtener estadísticas de citas
+        URL: /api/citas/estadisticas/?desde=2024-01-01&hasta=2024-01-31
+
+        El periodo (desde/hasta) es opcional; por defecto va desde el inicio
+        del mes actual. Todos los contadores salen de una sola consulta con
+        agregación condicional y el ranking de manicuristas de otra agrupada.
+        """
+        hoy = timezone.localdate()
         inicio_mes = hoy.replace(day=1)
 
-        # Estadísticas generales
-        total_citas = self.get_queryset().count()
-        citas_hoy = self.get_queryset().filter(fecha_cita=hoy).count()
-        citas_pendientes = self.get_queryset().filter(estado='pendiente').count()
-        citas_mes = self.get_queryset().filter(fecha_cita__gte=inicio_mes).count()
-
-        # Estadísticas por estado
-        por_estado = self.get_queryset().values('estado').annotate(
-            count=Count('id')
-        ).order_by('estado')
-
-        # Ingresos del mes (solo citas finalizadas) - USAR PRECIO TOTAL
-        ingresos_mes = self.get_queryset().filter(
-            fecha_cita__gte=inicio_mes,
-            estado='finalizada'
-        ).aggregate(total=Sum('precio_total'))['total'] or 0
-
-        # Manicuristas más ocupadas
-        manicuristas_top = self.get_queryset().filter(
-            fecha_cita__gte=inicio_mes
-        ).values(
+        try:
+            desde = request.query_params.get('desde')
+            hasta = request.query_params.get('hasta')
+            desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else inicio_mes
+            hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filtro_mes = Q(fecha_cita__gte=inicio_mes)
+        filtro_periodo = Q(fecha_cita__gte=desde)
+        if hasta:
+            filtro_periodo &= Q(fecha_cita__lte=hasta)
+
+        estados = [estado for estado, _ in Cita.ESTADO_CHOICES]
+        agregados = {
+            'total_citas': Count('id'),
+            'citas_hoy': Count('id', filter=Q(fecha_cita=hoy)),
+            'citas_pendientes': Count('id', filter=Q(estado='pendiente')),
+            'citas_mes': Count('id', filter=filtro_mes),
+            'ingresos_mes': Sum('precio_total', filter=filtro_mes & Q(estado='finalizada')),
+            'citas_periodo': Count('id', filter=filtro_periodo),
+            'ingresos_periodo': Sum('precio_total', filter=filtro_periodo & Q(estado='finalizada')),
+        }
+        for estado in estados:
+            agregados[f'estado_{estado}'] = Count('id', filter=Q(estado=estado))
+
+        # Estadísticas generales, por estado e ingresos en una sola consulta
+        resultado = self.get_queryset().order_by().aggregate(**agregados)
+
+        por_estado = [
+            {'estado': estado, 'count': resultado[f'estado_{estado}']}
+            for estado in sorted(estados)
+            if resultado[f'estado_{estado}']
+        ]
+
+        # Manicuristas más ocupadas en el periodo
+        manicuristas_top = self.get_queryset().filter(filtro_periodo).values(
             'manicurista__nombre'
         ).annotate(
             total_citas=Count('id')
         ).order_by('-total_citas')[:5]
 
         return Response({
-            'total_citas': total_citas,
-            'citas_hoy': citas_hoy,
-            'citas_pendientes': citas_pendientes,
-            'citas_mes': citas_mes,
-            'por_estado': list(por_estado),
-            'ingresos_mes': float(ingresos_mes),
+            'total_citas': resultado['total_citas'],
+            'citas_hoy': resultado['citas_hoy'],
+            'citas_pendientes': resultado['citas_pendientes'],
+            'citas_mes': resultado['citas_mes'],
+            'por_estado': por_estado,
+            'ingresos_mes': float(resultado['ingresos_mes'] or 0),
+            'periodo': {
+                'desde': desde.isoformat(),
+                'hasta': hasta.isoformat() if hasta else None,
+                'citas': resultado['citas_periodo'],
+                'ingresos': float(resultado['ingresos_periodo'] or 0),
+            },
             'manicuristas_top': list(manicuristas_top)
         })
 
@@ -525,65 +491,47 @@ class CitaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Generar todos los horarios posibles (10:00 AM - 8:00 PM)
-        todos_los_horarios = self._generar_horarios_disponibles(fecha_obj)
-
-        # Obtener horarios ocupados por citas
-        citas_ocupadas = Cita.objects.filter(
-            manicurista_id=manicurista_id,
-            fecha_cita=fecha_obj,
-            estado__in=['pendiente', 'en_proceso']
-        ).values_list('hora_cita', flat=True)
+        try:
+            duracion = int(request.query_params.get('duracion') or self.INTERVALO_MINUTOS)
+        except ValueError:
+            duracion = None
+        if duracion is None or duracion < self.INTERVALO_MINUTOS:
+            return Response(
+                {'error': f'El parámetro duracion debe ser un número de minutos (mínimo {self.INTERVALO_MINUTOS})'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        horarios_ocupados_citas = [hora.strftime('%H:%M') for hora in citas_ocupadas]
+        agenda = obtener_agenda(manicurista_id, fecha_obj)
 
-        # Verificar novedades (ausencias y tardanzas)
+        horarios_disponibles = []
+        horarios_ocupados_citas = []
         horarios_ocupados_novedades = []
-        razon_no_disponible = None
 
-        try:
-            from api.novedades.models import Novedad
-
-            novedad = Novedad.objects.filter(
-                manicurista_id=manicurista_id,
-                fecha=fecha_obj
-            ).first()
-
-            if novedad:
-                if novedad.estado == 'ausente':
-                    if novedad.tipo_ausencia == 'completa':
-                        # Toda la jornada no disponible
-                        horarios_ocupados_novedades = todos_los_horarios.copy()
-                        razon_no_disponible = f"Ausencia completa (10:00 - 20:00)"
-
-                    elif novedad.tipo_ausencia == 'por_horas' and novedad.hora_inicio_ausencia and novedad.hora_fin_ausencia:
-                        # Marcar horarios específicos como no disponibles
-                        for horario_str in todos_los_horarios:
-                            horario_time = datetime.strptime(horario_str, '%H:%M').time()
-                            if novedad.hora_inicio_ausencia <= horario_time < novedad.hora_fin_ausencia:
-                                horarios_ocupados_novedades.append(horario_str)
-
-                elif novedad.estado == 'tardanza' and novedad.hora_entrada:
-                    # Marcar horarios antes de la llegada como no disponibles
-                    for horario_str in todos_los_horarios:
-                        horario_time = datetime.strptime(horario_str, '%H:%M').time()
-                        if horario_time < novedad.hora_entrada:
-                            horarios_ocupados_novedades.append(horario_str)
+        # Un horario está disponible si cabe una cita de la duración pedida sin solaparse
+        for slot in agenda.slots():
+            horario = formatear_minutos(slot)
+            if agenda.esta_libre(slot, duracion):
+                horarios_disponibles.append(horario)
+                continue
 
-        except ImportError:
-            # Si no existe el módulo de novedades, continuar sin verificar
-            pass
+            tipos = {o.tipo for o in agenda.ocupaciones_en(slot, slot + duracion)}
+            if TIPO_CITA in tipos:
+                horarios_ocupados_citas.append(horario)
+            if TIPO_NOVEDAD in tipos:
+                horarios_ocupados_novedades.append(horario)
 
-        # Combinar todos los horarios ocupados
-        todos_ocupados = set(horarios_ocupados_citas + horarios_ocupados_novedades)
+        # Si una novedad cubre toda la jornada, informar el motivo
+        razon_no_disponible = next((
+            o.motivo for o in agenda.ocupaciones_en(agenda.inicio_jornada, agenda.fin_jornada)
+            if o.tipo == TIPO_NOVEDAD and o.inicio <= agenda.inicio_jornada and o.fin >= agenda.fin_jornada
+        ), None)
 
-        # Calcular horarios disponibles
-        horarios_disponibles = [h for h in todos_los_horarios if h not in todos_ocupados]
+        todos_ocupados = sorted(set(horarios_ocupados_citas + horarios_ocupados_novedades))
 
         # Formato esperado por el frontend
         return Response({
             'horarios_disponibles': horarios_disponibles,
-            'horarios_ocupados': list(todos_ocupados),
+            'horarios_ocupados': todos_ocupados,
             'horarios_ocupados_citas': horarios_ocupados_citas,
             'horarios_ocupados_novedades': horarios_ocupados_novedades,
             'total_disponibles': len(horarios_disponibles),
@@ -596,6 +544,200 @@ class CitaViewSet(viewsets.ModelViewSet):
             'razon_no_disponible': razon_no_disponible
         })
 
+    # Máximo de días que se pueden pedir en una sola consulta de la grilla
+    MAX_DIAS_GRID = 31
+
+    @action(detail=False, methods=['get'], url_path='disponibilidad-grid')
+    def disponibilidad_grid(self, request):
+        """
+        Disponibilidad de varias manicuristas en un rango de fechas en una sola petición
+        URL: /api/citas/disponibilidad-grid/?fecha_desde=2024-01-15&fecha_hasta=2024-01-21&manicuristas=1,2,3
+
+        Cada día se devuelve como un bitmap de slots ('1' disponible, '0' ocupado),
+        en el mismo orden que la lista 'slots' de la respuesta.
+        """
+        fecha_desde = request.query_params.get('fecha_desde')
+        fecha_hasta = request.query_params.get('fecha_hasta') or fecha_desde
+        manicuristas_param = request.query_params.get('manicuristas')
+
+        if not fecha_desde:
+            return Response(
+                {'error': 'Se requiere el parámetro fecha_desde'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
+            fecha_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if fecha_hasta < fecha_desde:
+            return Response(
+                {'error': 'fecha_hasta no puede ser anterior a fecha_desde'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dias = (fecha_hasta - fecha_desde).days + 1
+        if dias > self.MAX_DIAS_GRID:
+            return Response(
+                {'error': f'El rango máximo permitido es de {self.MAX_DIAS_GRID} días'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if manicuristas_param:
+            try:
+                manicurista_ids = sorted({int(m) for m in manicuristas_param.split(',') if m.strip()})
+            except ValueError:
+                return Response(
+                    {'error': 'El parámetro manicuristas debe ser una lista de IDs separados por coma'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            manicurista_ids = list(
+                Manicurista.objects.filter(estado='activo', disponible=True)
+                .order_by('id').values_list('id', flat=True)
+            )
+
+        fechas = [fecha_desde + timedelta(days=i) for i in range(dias)]
+
+        # Agendas desde cache; lo que falte se carga con dos consultas para todo el rango
+        agendas = obtener_agendas(manicurista_ids, fecha_desde, fecha_hasta)
+
+        grid = {
+            str(manicurista_id): {
+                fecha.isoformat(): agendas[(manicurista_id, fecha)].bitmap()
+                for fecha in fechas
+            }
+            for manicurista_id in manicurista_ids
+        }
+        slots = [formatear_minutos(slot) for slot in range(
+            minutos(self.HORA_INICIO_CITAS), minutos(self.HORA_FIN_CITAS), self.INTERVALO_MINUTOS
+        )]
+
+        return Response({
+            'fecha_desde': fecha_desde.isoformat(),
+            'fecha_hasta': fecha_hasta.isoformat(),
+            'slots': slots,
+            'horario_trabajo': {
+                'inicio': self.HORA_INICIO_CITAS.strftime('%H:%M'),
+                'fin': self.HORA_FIN_CITAS.strftime('%H:%M'),
+                'intervalo_minutos': self.INTERVALO_MINUTOS
+            },
+            'manicuristas': grid
+        })
+
+    # Límites de la búsqueda de próximos horarios libres
+    MAX_RESULTADOS_PROXIMOS = 50
+    MAX_DIAS_PROXIMOS = 60
+
+    @action(detail=False, methods=['get'], url_path='proximos-disponibles')
+    def proximos_disponibles(self, request):
+        """
+        Próximos horarios libres para un conjunto de servicios entre todas las manicuristas activas
+        URL: /api/citas/proximos-disponibles/?servicios=1,4&n=10&desde=2024-01-15
+
+        Recorre los días en orden desde 'desde' (hoy por defecto) y se detiene
+        en cuanto encuentra los N primeros huecos en los que cabe la duración
+        total de los servicios.
+        """
+        servicios_param = request.query_params.get('servicios')
+        if not servicios_param:
+            return Response(
+                {'error': 'Se requiere el parámetro servicios'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            servicios_ids = [int(s) for s in servicios_param.split(',') if s.strip()]
+            n = min(int(request.query_params.get('n', 10)), self.MAX_RESULTADOS_PROXIMOS)
+        except ValueError:
+            return Response(
+                {'error': 'servicios debe ser una lista de IDs separados por coma y n un número'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if n < 1:
+            return Response(
+                {'error': 'n debe ser mayor que cero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ahora = timezone.localtime()
+        desde = request.query_params.get('desde')
+        if desde:
+            try:
+                desde = datetime.strptime(desde, '%Y-%m-%d').date()
+            except ValueError:
+                return Response(
+                    {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            desde = ahora.date()
+
+        if desde < ahora.date():
+            return Response(
+                {'error': 'La fecha desde no puede ser en el pasado'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Duración total de los servicios (un servicio puede repetirse)
+        duraciones = dict(
+            Servicio.objects.filter(id__in=servicios_ids, estado='activo').values_list('id', 'duracion')
+        )
+        faltantes = sorted(set(servicios_ids) - set(duraciones))
+        if faltantes:
+            return Response(
+                {'error': f'Servicios no encontrados o inactivos: {faltantes}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        duracion = sum(duraciones[sid] for sid in servicios_ids)
+
+        manicuristas = dict(
+            Manicurista.objects.filter(estado='activo', disponible=True).values_list('id', 'nombre')
+        )
+
+        # Hoy solo cuentan los horarios que aún no han empezado
+        minuto_minimo = minutos(ahora.time()) + 1 if desde == ahora.date() else None
+
+        huecos = islice(
+            buscar_proximos_libres(
+                manicuristas.keys(), duracion, desde,
+                minuto_minimo=minuto_minimo,
+                max_dias=self.MAX_DIAS_PROXIMOS,
+                cargar=obtener_agendas
+            ),
+            n
+        )
+
+        resultados = [
+            {
+                'manicurista_id': manicurista_id,
+                'manicurista_nombre': manicuristas[manicurista_id],
+                'fecha': fecha.isoformat(),
+                'hora': formatear_minutos(slot),
+                'hora_fin': formatear_minutos(slot + duracion),
+            }
+            for manicurista_id, fecha, slot in huecos
+        ]
+
+        return Response({
+            'servicios': servicios_ids,
+            'duracion_total': duracion,
+            'desde': desde.isoformat(),
+            'total': len(resultados),
+            'resultados': resultados
+        })
+
+    @action(detail=False, methods=['get'], url_path='disponibilidad-cache')
+    def disponibilidad_cache(self, request):
+        """Aciertos y fallos de la cache de disponibilidad (monitoreo)"""
+        return Response(estadisticas_cache())
+
     # ===== MANTENER ENDPOINT ORIGINAL PARA COMPATIBILIDAD =====
     @action(detail=False, methods=['get'])
     def disponibilidad_manicurista(self, request):
@@ -0,0 +1,84 @@
+"""
+Búsqueda de clientes por nombre o documento.
+
+`Cliente.busqueda` guarda el nombre en minúsculas y sin tildes ("María
+Pérez" -> "maria perez") y `TerminoBusquedaCliente` cada palabra del nombre;
+ambos se actualizan al guardar el cliente y tienen índice, así las
+búsquedas por prefijo no recorren la tabla.
+
+Los resultados se ordenan por relevancia:
+
+1. documento exacto
+2. documento que empieza por el texto
+3. nombre que empieza por el texto
+4. cada palabra del texto es prefijo de alguna palabra del nombre
+5. el texto aparece dentro del nombre o del documento
+
+Cada nivel solo consulta lo que falta para completar el límite, y el último
+(que sí recorre la tabla) solo se usa si los anteriores no alcanzan.
+"""
+import unicodedata
+
+from django.db.models import Q
+
+
+LIMITE_RESULTADOS = 10
+LIMITE_MAXIMO = 50
+# Por debajo de este largo una búsqueda por subcadena devuelve casi toda la tabla
+LARGO_MINIMO_SUBCADENA = 3
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes y con un solo espacio entre palabras"""
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return ' '.join(sin_tildes.lower().split())
+
+
+def extraer_terminos(texto_normalizado, largo_maximo=50):
+    """Palabras distintas del texto, para el índice de términos"""
+    return sorted({palabra[:largo_maximo] for palabra in texto_normalizado.split()})
+
+
+def buscar_clientes(texto, limite=LIMITE_RESULTADOS, queryset=None):
+    """Clientes que coinciden con `texto`, del más al menos relevante, hasta `limite`"""
+    from .models import Cliente
+
+    queryset = Cliente.objects.all() if queryset is None else queryset
+    documento = (texto or '').strip()
+    normalizado = normalizar_texto(texto)
+    if not normalizado:
+        return []
+
+    ids = []
+
+    def agregar(coincidencias):
+        faltan = limite - len(ids)
+        if faltan > 0:
+            ids.extend(coincidencias.exclude(pk__in=ids).values_list('pk', flat=True)[:faltan])
+
+    agregar(queryset.filter(documento=documento))
+    agregar(queryset.filter(documento__startswith=documento).order_by('documento'))
+    agregar(queryset.filter(busqueda__startswith=normalizado).order_by('busqueda', 'pk'))
+
+    por_palabras = queryset
+    for palabra in normalizado.split():
+        por_palabras = por_palabras.filter(terminos__termino__startswith=palabra)
+    agregar(por_palabras.distinct().order_by('busqueda', 'pk'))
+
+    if len(normalizado) >= LARGO_MINIMO_SUBCADENA:
+        agregar(queryset.filter(
+            Q(busqueda__contains=normalizado) | Q(documento__contains=documento)
+        ).order_by('busqueda', 'pk'))
+
+    encontrados = queryset.in_bulk(ids)
+    return [encontrados[pk] for pk in ids]
+
+
+def limite_solicitado(valor, por_defecto=LIMITE_RESULTADOS):
+    """Límite pedido por query param, acotado a LIMITE_MAXIMO"""
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    return max(1, min(limite, LIMITE_MAXIMO))
@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-18 01:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.clientes.busqueda import extraer_terminos, normalizar_texto
+
+
+def llenar_busqueda(apps, schema_editor):
+    """Normalizar el nombre y crear los términos de los clientes existentes"""
+    Cliente = apps.get_model('clientes', 'Cliente')
+    TerminoBusquedaCliente = apps.get_model('clientes', 'TerminoBusquedaCliente')
+
+    lote = []
+    for cliente in Cliente.objects.only('id', 'nombre').iterator(chunk_size=2000):
+        cliente.busqueda = normalizar_texto(cliente.nombre)
+        lote.append(cliente)
+        if len(lote) == 2000:
+            _guardar_lote(Cliente, TerminoBusquedaCliente, lote)
+            lote = []
+    _guardar_lote(Cliente, TerminoBusquedaCliente, lote)
+
+
+def _guardar_lote(Cliente, TerminoBusquedaCliente, clientes):
+    Cliente.objects.bulk_update(clientes, ['busqueda'])
+    TerminoBusquedaCliente.objects.bulk_create([
+        TerminoBusquedaCliente(cliente_id=cliente.id, termino=termino)
+        for cliente in clientes
+        for termino in extraer_terminos(cliente.busqueda)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_remove_cliente_password_cliente_usuario_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='busqueda',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='TerminoBusquedaCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(db_index=True, max_length=50)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='clientes.cliente')),
+            ],
+            options={
+                'verbose_name': 'Término de búsqueda de cliente',
+                'verbose_name_plural': 'Términos de búsqueda de clientes',
+                'unique_together': {('cliente', 'termino')},
+            },
+        ),
+        migrations.RunPython(llenar_busqueda, migrations.RunPython.noop),
+    ]
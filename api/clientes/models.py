@@ -4,6 +4,7 @@ from django.contrib.auth.hashers import make_password
 from api.base.base import BaseModel
 from api.usuarios.models import Usuario
 from api.roles.models import Rol
+from .busqueda import extraer_terminos, normalizar_texto
 import secrets
 import string
 
@@ -43,6 +44,25 @@ class Cliente(BaseModel):
     
     # Relación con Usuario
     usuario = models.OneToOneField(Usuario, on_delete=models.CASCADE, null=True, blank=True, related_name='cliente')
+
+    # Nombre en minúsculas y sin tildes para la búsqueda (ver api/clientes/busqueda.py)
+    busqueda = models.CharField(max_length=100, editable=False, default='', db_index=True)
+
+    def save(self, *args, **kwargs):
+        busqueda = normalizar_texto(self.nombre)
+        cambio_nombre = self._state.adding or busqueda != self.busqueda
+        self.busqueda = busqueda
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nombre' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'busqueda'}
+        super().save(*args, **kwargs)
+
+        if cambio_nombre:
+            self.terminos.all().delete()
+            TerminoBusquedaCliente.objects.bulk_create([
+                TerminoBusquedaCliente(cliente=self, termino=termino) for termino in extraer_terminos(busqueda)
+            ])
     
     def generar_contraseña_temporal(self):
         """Genera una contraseña temporal aleatoria de 8 caracteres"""
@@ -50,6 +70,9 @@ class Cliente(BaseModel):
         contraseña = ''.join(secrets.choice(caracteres) for i in range(8))
         self.contraseña_temporal = make_password(contraseña)
         self.debe_cambiar_contraseña = True
+        # El login verifica la contraseña del usuario: mantenerla igual a la temporal
+        if self.usuario_id:
+            Usuario.objects.filter(pk=self.usuario_id).update(password=self.contraseña_temporal)
         return contraseña  # Retorna la contraseña sin encriptar para enviarla por correo
     
     def verificar_contraseña_temporal(self, contraseña):
@@ -111,3 +134,17 @@ class Cliente(BaseModel):
     
     def __str__(self):
         return f"{self.nombre} ({self.documento})"
+
+
+class TerminoBusquedaCliente(models.Model):
+    """Una palabra del nombre normalizado de un cliente, para buscar por prefijo"""
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='terminos')
+    termino = models.CharField(max_length=50, db_index=True)
+
+    class Meta:
+        unique_together = ('cliente', 'termino')
+        verbose_name = "Término de búsqueda de cliente"
+        verbose_name_plural = "Términos de búsqueda de clientes"
+
+    def __str__(self):
+        return self.termino
@@ -8,11 +8,11 @@ Usuario = get_user_model()
 
 class ClienteSerializer(serializers.ModelSerializer):
     contraseña_generada = serializers.CharField(read_only=True)  # Para mostrar la contraseña generada en la respuesta
-    usuario_id = serializers.IntegerField(read_only=True, source='usuario.id')  # Para mostrar el ID del usuario creado
+    usuario_id = serializers.IntegerField(read_only=True)  # Para mostrar el ID del usuario creado
     
     class Meta:
         model = Cliente
-        fields = '__all__'
+        exclude = ['busqueda']  # Columna interna de la búsqueda
         extra_kwargs = {
             'contraseña_temporal': {'write_only': True},  # No mostrar la contraseña encriptada
             'usuario': {'read_only': True},  # El usuario se crea automáticamente
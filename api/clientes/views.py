@@ -4,8 +4,9 @@ from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.core.mail import send_mail
-from django.conf import settings
+from api.authentication.login import ErrorLogin, autenticar, datos_sesion
+from api.utils.email_utils import encolar_correo
+from .busqueda import buscar_clientes, limite_solicitado
 from .models import Cliente
 from .serializers import (
     ClienteSerializer, 
@@ -165,13 +166,11 @@ class ClienteViewSet(viewsets.ModelViewSet):
         ¡Gracias y bienvenido!
         """
         
-        send_mail(
+        encolar_correo(
+            [cliente.correo_electronico],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [cliente.correo_electronico],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
     
     @action(detail=False, methods=['post'])
@@ -181,38 +180,23 @@ class ClienteViewSet(viewsets.ModelViewSet):
         """
         serializer = LoginClienteSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        
-        documento = serializer.validated_data['documento']
-        contraseña = serializer.validated_data['contraseña']
-        
+
         try:
-            cliente = Cliente.objects.get(documento=documento)
-            
-            if not cliente.verificar_contraseña_temporal(contraseña):
-                return Response(
-                    {'error': 'Credenciales incorrectas'}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-            
-            if not cliente.estado:
-                return Response(
-                    {'error': 'Cuenta inactiva. Contacta al administrador'}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-            
-            response_data = {
-                'mensaje': 'Login exitoso',
-                'cliente': ClienteSerializer(cliente).data,
-                'debe_cambiar_contraseña': cliente.debe_cambiar_contraseña
-            }
-            
-            return Response(response_data)
-            
-        except Cliente.DoesNotExist:
-            return Response(
-                {'error': 'Credenciales incorrectas'}, 
-                status=status.HTTP_401_UNAUTHORIZED
+            usuario = autenticar(
+                serializer.validated_data['contraseña'],
+                relacion='cliente',
+                cliente__documento=serializer.validated_data['documento']
             )
+        except ErrorLogin as e:
+            return Response({'error': e.mensaje}, status=status.HTTP_401_UNAUTHORIZED)
+
+        cliente = usuario.cliente
+        return Response({
+            'mensaje': 'Login exitoso',
+            'cliente': ClienteSerializer(cliente).data,
+            'debe_cambiar_contraseña': cliente.debe_cambiar_contraseña,
+            **datos_sesion(usuario)
+        })
     
     @action(detail=True, methods=['post'])
     def cambiar_password(self, request, pk=None):
@@ -304,13 +288,11 @@ class ClienteViewSet(viewsets.ModelViewSet):
         ¡Tu cuenta está segura!
         """
         
-        send_mail(
+        encolar_correo(
+            [cliente.correo_electronico],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [cliente.correo_electronico],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
     
     @action(detail=True, methods=['post'])
@@ -394,13 +376,11 @@ class ClienteViewSet(viewsets.ModelViewSet):
         IMPORTANTE: Debes cambiar esta contraseña temporal inmediatamente por seguridad.
         """
         
-        send_mail(
+        encolar_correo(
+            [cliente.correo_electronico],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [cliente.correo_electronico],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
     
     @transaction.atomic
@@ -486,6 +466,8 @@ class ClienteViewSet(viewsets.ModelViewSet):
     def search(self, request):
         """
         Endpoint para buscar clientes por nombre o documento.
+        Ignora mayúsculas y tildes; retorna hasta `limite` resultados (10 por defecto)
+        ordenados por relevancia.
         """
         query = request.query_params.get('q', '')
         if not query:
@@ -494,12 +476,9 @@ class ClienteViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        clientes = self.get_queryset().filter(
-            nombre__icontains=query
-        ) | self.get_queryset().filter(
-            documento__icontains=query
+        clientes = buscar_clientes(
+            query, limite=limite_solicitado(request.query_params.get('limite')), queryset=self.get_queryset()
         )
-        
         serializer = self.get_serializer(clientes, many=True)
         return Response(serializer.data)
     
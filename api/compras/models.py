@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Sum
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from api.base.base import BaseModel
@@ -47,10 +49,12 @@ class Compra(BaseModel):
         return f"Compra #{self.id} - {proveedor_nombre} - {self.fecha.strftime('%d/%m/%Y')}"
     
     def calcular_total(self):
-        """Calcula el total de la compra basado en los detalles"""
-        total = sum(detalle.subtotal for detalle in self.detalles.all())
+        """Calcula el total de la compra con una suma en la base de datos y lo guarda"""
+        total = self.detalles.aggregate(
+            total=Sum(F('cantidad') * F('precio_unitario'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+        )['total'] or Decimal('0.00')
+        Compra.objects.filter(pk=self.pk).update(total=total, updated_at=timezone.now())
         self.total = total
-        self.save()
         return total
 
 
@@ -96,5 +100,10 @@ class DetalleCompra(BaseModel):
         if self.cantidad < 1:
             raise ValueError("La cantidad debe ser mayor a 0")
         super().save(*args, **kwargs)
-        # Recalcular el total de la compra
+        # Recalcular el total de la compra (una suma y un update, sin recorrer los detalles)
         self.compra.calcular_total()
+    
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        self.compra.calcular_total()
+        return resultado
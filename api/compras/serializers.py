@@ -4,7 +4,8 @@ from django.db import transaction
 # from django.utils import timezone  # Eliminar esta importación
 from .models import Compra, DetalleCompra
 from api.comprahasinsumos.models import CompraHasInsumo
-from api.insumos.models import Insumo
+from api.insumos.models import Insumo, MovimientoInventario
+from api.insumos.stock import StockInsuficiente, agrupar, aplicar_movimientos, diferencia
 from api.proveedores.models import Proveedor
 
 
@@ -91,10 +92,13 @@ class CompraCreateSerializer(serializers.ModelSerializer):
             if not isinstance(precio, (int, float, Decimal)) or precio <= 0:
                 raise serializers.ValidationError(f"El detalle {i+1}: El precio unitario debe ser mayor a 0")
             
-            # Validar que el insumo existe
-            try:
-                Insumo.objects.get(id=detalle['insumo_id'])
-            except Insumo.DoesNotExist:
+        # Validar que los insumos existen (una sola consulta)
+        ids = {detalle['insumo_id'] for detalle in value}
+        if len(ids) != len(value):
+            raise serializers.ValidationError("Un insumo no puede aparecer en más de un detalle de la compra.")
+        existentes = set(Insumo.objects.filter(id__in=ids).values_list('id', flat=True))
+        for detalle in value:
+            if detalle['insumo_id'] not in existentes:
                 raise serializers.ValidationError(f"El insumo con ID {detalle['insumo_id']} no existe.")
         
         return value
@@ -105,43 +109,11 @@ class CompraCreateSerializer(serializers.ModelSerializer):
         validated_data.pop('motivo_anulacion', None) # Asegurarse de que motivo_anulacion no se guarde en la creación si no es relevante
         compra = Compra.objects.create(**validated_data)
         
-        # Lista para almacenar los movimientos de stock
-        movimientos_stock = []
+        DetalleCompra.objects.bulk_create(self._detalles(compra, detalles_data))
         
-        for detalle_data in detalles_data:
-            insumo_id = detalle_data.get('insumo_id')
-            cantidad = detalle_data.get('cantidad')
-            precio_unitario = detalle_data.get('precio_unitario')
-            
-            try:
-                insumo = Insumo.objects.get(id=insumo_id)
-                
-                # Crear en DetalleCompra
-                DetalleCompra.objects.create(
-                    compra=compra,
-                    insumo=insumo,
-                    cantidad=cantidad,
-                    precio_unitario=precio_unitario
-                )
-                
-                # Actualizar stock si la compra está finalizada
-                if compra.estado == 'finalizada':
-                    stock_anterior = insumo.cantidad
-                    insumo.cantidad += cantidad
-                    insumo.save()
-                    
-                    movimientos_stock.append({
-                        'insumo': insumo.nombre,
-                        'cantidad_agregada': cantidad,
-                        'stock_anterior': stock_anterior,
-                        'stock_nuevo': insumo.cantidad
-                    })
-                    
-                    print(f"Stock actualizado: {insumo.nombre} - Cantidad agregada: {cantidad} - Nuevo stock: {insumo.cantidad}")
-                
-            except Insumo.DoesNotExist:
-                # Si llegamos aquí, la validación falló
-                pass
+        # Sumar al stock todas las líneas en una sola pasada si la compra está finalizada
+        if compra.estado == 'finalizada':
+            aplicar_movimientos(self._lineas(detalles_data), MovimientoInventario.TIPO_COMPRA, compra.pk)
         
         # Calcular total
         compra.calcular_total()
@@ -150,8 +122,10 @@ class CompraCreateSerializer(serializers.ModelSerializer):
     
     @transaction.atomic
     def update(self, instance, validated_data):
-        detalles_data = validated_data.pop('detalles', [])
-        estado_anterior = instance.estado
+        detalles_data = validated_data.pop('detalles', None)
+        # Leer el estado con la compra bloqueada para no aplicar dos veces su efecto en el stock
+        estado_anterior = Compra.objects.select_for_update().values_list('estado', flat=True).get(pk=instance.pk)
+        lineas_anteriores = agrupar(instance.detalles.values_list('insumo_id', 'cantidad'))
         
         # Actualizar campos de la compra
         for attr, value in validated_data.items():
@@ -160,61 +134,49 @@ class CompraCreateSerializer(serializers.ModelSerializer):
         # Si el estado cambia a 'anulada', guardar motivo
         if instance.estado == 'anulada' and estado_anterior != 'anulada':
             instance.motivo_anulacion = validated_data.get('motivo_anulacion', instance.motivo_anulacion)
-            # instance.fecha_anulacion = timezone.now() # Eliminar esta línea
         elif instance.estado != 'anulada' and estado_anterior == 'anulada':
             # Si se revierte de anulada a otro estado, limpiar motivo
             instance.motivo_anulacion = None
-            # instance.fecha_anulacion = None # Eliminar esta línea
         
         instance.save()
         
-        # Si se está cambiando de finalizada a anulada, revertir stock
-        if estado_anterior == 'finalizada' and instance.estado == 'anulada':
-            # La reversión del stock ahora se maneja en el ViewSet
-            pass
-        
-        # Eliminar detalles existentes
-        instance.detalles.all().delete()
+        # Sin detalles en la petición (PATCH) se conservan los existentes
+        lineas_nuevas = lineas_anteriores
+        if detalles_data is not None:
+            instance.detalles.all().delete()
+            DetalleCompra.objects.bulk_create(self._detalles(instance, detalles_data))
+            lineas_nuevas = self._lineas(detalles_data)
         
-        # Lista para almacenar los movimientos de stock
-        movimientos_stock = []
-        
-        for detalle_data in detalles_data:
-            insumo_id = detalle_data.get('insumo_id')
-            cantidad = detalle_data.get('cantidad')
-            precio_unitario = detalle_data.get('precio_unitario')
-            
-            try:
-                insumo = Insumo.objects.get(id=insumo_id)
-                
-                # Crear en DetalleCompra
-                DetalleCompra.objects.create(
-                    compra=instance,
-                    insumo=insumo,
-                    cantidad=cantidad,
-                    precio_unitario=precio_unitario
-                )
-                
-                # Actualizar stock si la compra está finalizada
-                if instance.estado == 'finalizada' and estado_anterior != 'finalizada':
-                    stock_anterior = insumo.cantidad
-                    insumo.cantidad += cantidad
-                    insumo.save()
-                    
-                    movimientos_stock.append({
-                        'insumo': insumo.nombre,
-                        'cantidad_agregada': cantidad,
-                        'stock_anterior': stock_anterior,
-                        'stock_nuevo': insumo.cantidad
-                    })
-                    
-                    print(f"Stock actualizado: {insumo.nombre} - Cantidad agregada: {cantidad} - Nuevo stock: {insumo.cantidad}")
-                
-            except Insumo.DoesNotExist:
-                # Si llegamos aquí, la validación falló
-                pass
+        # Solo una compra finalizada suma al stock: aplicar la diferencia entre
+        # lo que sumaba antes y lo que debe sumar ahora
+        try:
+            aplicar_movimientos(
+                diferencia(
+                    lineas_nuevas if instance.estado == 'finalizada' else {},
+                    lineas_anteriores if estado_anterior == 'finalizada' else {}
+                ),
+                MovimientoInventario.TIPO_ANULACION_COMPRA if instance.estado == 'anulada' else MovimientoInventario.TIPO_COMPRA,
+                instance.pk
+            )
+        except StockInsuficiente as e:
+            raise serializers.ValidationError({'detalles': str(e)})
         
         # Calcular total
         instance.calcular_total()
         
         return instance
+    
+    def _detalles(self, compra, detalles_data):
+        # bulk_create no llama a DetalleCompra.save(): el total se calcula una sola vez al final
+        return [
+            DetalleCompra(
+                compra=compra,
+                insumo_id=detalle_data['insumo_id'],
+                cantidad=detalle_data['cantidad'],
+                precio_unitario=detalle_data['precio_unitario']
+            )
+            for detalle_data in detalles_data
+        ]
+    
+    def _lineas(self, detalles_data):
+        return agrupar((detalle['insumo_id'], detalle['cantidad']) for detalle in detalles_data)
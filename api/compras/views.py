@@ -1,8 +1,11 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.db import transaction
 from django.db.models import F, Sum
 # from django.utils import timezone # Eliminar esta importación
+from api.insumos.models import MovimientoInventario
+from api.insumos.stock import StockInsuficiente, agrupar, aplicar_movimientos
 from .models import Compra
 from .serializers import CompraSerializer, CompraCreateSerializer
 
@@ -41,23 +44,30 @@ class CompraViewSet(viewsets.ModelViewSet):
         if len(motivo_anulacion) < 10:
             return Response({"error": "El motivo de anulación debe tener al menos 10 caracteres."}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Revertir stock de insumos
-        for detalle in compra.detalles.all():
-            insumo = detalle.insumo
-            if insumo.cantidad >= detalle.cantidad:
-                insumo.cantidad -= detalle.cantidad
-                insumo.save()
-            else:
-                # Esto no debería pasar si el stock se manejó correctamente al finalizar la compra
-                # Pero es una salvaguarda
-                return Response(
-                    {"error": f"No se pudo revertir el stock del insumo {insumo.nombre}. Cantidad insuficiente."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        compra.estado = 'anulada'
-        compra.motivo_anulacion = motivo_anulacion # Guardar el motivo
-        compra.save()
+        with transaction.atomic():
+            # Bloquear la compra: dos anulaciones simultáneas no deben revertir el stock dos veces
+            estado = Compra.objects.select_for_update().values_list('estado', flat=True).get(pk=compra.pk)
+            if estado == 'anulada':
+                return Response({"error": "La compra ya está anulada."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Solo una compra finalizada sumó al stock: restar todas sus líneas en una pasada
+            if estado == 'finalizada':
+                try:
+                    aplicar_movimientos(
+                        agrupar(compra.detalles.values_list('insumo_id', 'cantidad'), signo=-1),
+                        MovimientoInventario.TIPO_ANULACION_COMPRA,
+                        compra.pk
+                    )
+                except StockInsuficiente as e:
+                    nombres = ', '.join(nombre for nombre, _, _ in e.faltantes)
+                    return Response(
+                        {"error": f"No se pudo revertir el stock del insumo {nombres}. Cantidad insuficiente."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            
+            compra.estado = 'anulada'
+            compra.motivo_anulacion = motivo_anulacion # Guardar el motivo
+            compra.save()
         
         serializer = CompraSerializer(compra)
         return Response(serializer.data, status=status.HTTP_200_OK)
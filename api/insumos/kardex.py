@@ -0,0 +1,78 @@
+"""
+Consultas históricas sobre el kardex (MovimientoInventario).
+
+Cada movimiento guarda el stock resultante, así:
+
+- el stock de un insumo al cierre de un día es el `stock_resultante` de su
+  último movimiento hasta ese día (una lectura por el índice insumo/fecha);
+- el kardex y el consumo de un período son un recorrido del índice acotado
+  por las dos fechas.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Insumo, MovimientoInventario
+
+
+def fin_del_dia(fecha):
+    """Primer instante del día siguiente (límite exclusivo) en la zona horaria local"""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _ultimo_stock(limite):
+    """Subconsulta: stock resultante del último movimiento del insumo antes de `limite`"""
+    return Subquery(
+        MovimientoInventario.objects.filter(insumo=OuterRef('pk'), fecha__lt=limite)
+        .order_by('-fecha', '-id')
+        .values('stock_resultante')[:1],
+        output_field=IntegerField()
+    )
+
+
+def stock_a_fecha(fecha, insumos=None):
+    """Insumos anotados con `stock_a_fecha`: su stock al cierre del día `fecha`"""
+    insumos = Insumo.objects.all() if insumos is None else insumos
+    return insumos.annotate(stock_a_fecha=Coalesce(_ultimo_stock(fin_del_dia(fecha)), Value(0)))
+
+
+def stock_al_inicio(insumo_id, fecha):
+    """Stock del insumo antes del primer movimiento del día `fecha`"""
+    stock = MovimientoInventario.objects.filter(
+        insumo_id=insumo_id, fecha__lt=inicio_del_dia(fecha)
+    ).order_by('-fecha', '-id').values_list('stock_resultante', flat=True).first()
+    return stock or 0
+
+
+def kardex(insumo_id, desde, hasta):
+    """Saldo inicial, movimientos, entradas, salidas y saldo final del insumo entre dos fechas"""
+    movimientos = MovimientoInventario.objects.filter(
+        insumo_id=insumo_id, fecha__gte=inicio_del_dia(desde), fecha__lt=fin_del_dia(hasta)
+    ).order_by('fecha', 'id')
+    totales = movimientos.aggregate(
+        entradas=Coalesce(Sum('cantidad', filter=Q(cantidad__gt=0)), 0),
+        salidas=Coalesce(Sum('cantidad', filter=Q(cantidad__lt=0)), 0),
+    )
+    stock_inicial = stock_al_inicio(insumo_id, desde)
+    return {
+        'stock_inicial': stock_inicial,
+        'entradas': totales['entradas'],
+        'salidas': -totales['salidas'],
+        'stock_final': stock_inicial + totales['entradas'] + totales['salidas'],
+        'movimientos': movimientos,
+    }
+
+
+def consumo_por_insumo(desde, hasta, tipos=(MovimientoInventario.TIPO_ABASTECIMIENTO,)):
+    """{insumo_id: unidades que salieron} entre dos fechas, en una consulta agrupada"""
+    return dict(
+        MovimientoInventario.objects.filter(
+            tipo__in=tipos, fecha__gte=inicio_del_dia(desde), fecha__lt=fin_del_dia(hasta)
+        ).order_by().values('insumo_id').annotate(total=-Sum('cantidad')).values_list('insumo_id', 'total')
+    )
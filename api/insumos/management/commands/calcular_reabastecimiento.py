@@ -0,0 +1,29 @@
+"""
+Recalcular puntos de reorden y días de cobertura (ReabastecimientoInsumo).
+
+Pensado para ejecutarse cada noche, por ejemplo desde cron:
+
+    python manage.py calcular_reabastecimiento
+    python manage.py calcular_reabastecimiento --dias 60
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.insumos.reabastecimiento import DIAS_CONSUMO, calcular_reabastecimiento
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el consumo, el punto de reorden y los días de cobertura de los insumos activos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_CONSUMO,
+                            help=f'Días de historial de abastecimientos para el consumo (por defecto {DIAS_CONSUMO})')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError('--dias debe ser mayor que cero')
+
+        filas = calcular_reabastecimiento(options['dias'])
+        por_pedir = sum(1 for fila in filas if fila.requiere_reorden)
+        self.stdout.write(self.style.SUCCESS(
+            f'Reabastecimiento calculado: {len(filas)} insumos, {por_pedir} por pedir'
+        ))
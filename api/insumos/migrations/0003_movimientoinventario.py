@@ -0,0 +1,47 @@
+# Generated by Django 5.2 on 2026-10-18 02:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def abrir_kardex(apps, schema_editor):
+    """El stock actual de cada insumo es su saldo inicial en el kardex"""
+    Insumo = apps.get_model('insumos', 'Insumo')
+    MovimientoInventario = apps.get_model('insumos', 'MovimientoInventario')
+    ahora = django.utils.timezone.now()
+    MovimientoInventario.objects.bulk_create([
+        MovimientoInventario(
+            insumo_id=insumo_id, tipo='saldo_inicial', cantidad=cantidad, stock_resultante=cantidad, fecha=ahora
+        )
+        for insumo_id, cantidad in Insumo.objects.filter(cantidad__gt=0).values_list('id', 'cantidad')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insumos', '0002_remove_insumo_cantidad_minima'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('saldo_inicial', 'Saldo inicial'), ('compra', 'Compra'), ('anulacion_compra', 'Anulación de compra'), ('abastecimiento', 'Abastecimiento a manicurista'), ('ajuste', 'Ajuste manual')], max_length=20)),
+                ('documento_id', models.PositiveIntegerField(blank=True, help_text='Compra o abastecimiento que originó el movimiento', null=True)),
+                ('cantidad', models.IntegerField(help_text='Positiva en entradas, negativa en salidas')),
+                ('stock_resultante', models.PositiveIntegerField()),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('insumo', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='insumos.insumo')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de inventario',
+                'verbose_name_plural': 'Movimientos de inventario',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['insumo', 'fecha', 'id'], name='movinv_insumo_fecha_idx'), models.Index(fields=['tipo', 'documento_id'], name='movinv_documento_idx')],
+            },
+        ),
+        migrations.RunPython(abrir_kardex, migrations.RunPython.noop),
+    ]
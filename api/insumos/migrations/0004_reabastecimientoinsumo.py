@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 02:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insumos', '0003_movimientoinventario'),
+        ('proveedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReabastecimientoInsumo',
+            fields=[
+                ('insumo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reabastecimiento', serialize=False, to='insumos.insumo')),
+                ('stock', models.PositiveIntegerField(help_text='Stock al momento del cálculo')),
+                ('consumo_diario', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('desviacion_diaria', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('tiempo_entrega_dias', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('stock_seguridad', models.PositiveIntegerField()),
+                ('punto_reorden', models.PositiveIntegerField()),
+                ('dias_cobertura', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True)),
+                ('cantidad_sugerida', models.PositiveIntegerField(default=0)),
+                ('requiere_reorden', models.BooleanField(default=False)),
+                ('calculado_en', models.DateTimeField()),
+                ('proveedor', models.ForeignKey(blank=True, help_text='Último proveedor que vendió el insumo', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='proveedores.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Reabastecimiento de insumo',
+                'verbose_name_plural': 'Reabastecimiento de insumos',
+                'ordering': ['dias_cobertura'],
+                'indexes': [models.Index(fields=['requiere_reorden', 'dias_cobertura'], name='reabast_reorden_idx')],
+            },
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from api.base.base import BaseModel
 from api.categoriainsumos.models import CategoriaInsumo
+from api.proveedores.models import Proveedor
 
 
 class Insumo(BaseModel):
@@ -33,3 +35,112 @@ class Insumo(BaseModel):
     
     def __str__(self):
         return self.nombre
+
+
+class MovimientoInventario(models.Model):
+    """
+    Kardex de insumos (solo se agregan filas).
+
+    Cada cambio de `Insumo.cantidad` hecho con api/insumos/stock.py deja un
+    movimiento con la cantidad (negativa en salidas) y el stock resultante,
+    así el stock a una fecha es el `stock_resultante` del último movimiento
+    anterior y el consumo de un período una suma sobre un rango de fechas.
+    """
+    TIPO_SALDO_INICIAL = 'saldo_inicial'
+    TIPO_COMPRA = 'compra'
+    TIPO_ANULACION_COMPRA = 'anulacion_compra'
+    TIPO_ABASTECIMIENTO = 'abastecimiento'
+    TIPO_AJUSTE = 'ajuste'
+    TIPO_CHOICES = [
+        (TIPO_SALDO_INICIAL, 'Saldo inicial'),
+        (TIPO_COMPRA, 'Compra'),
+        (TIPO_ANULACION_COMPRA, 'Anulación de compra'),
+        (TIPO_ABASTECIMIENTO, 'Abastecimiento a manicurista'),
+        (TIPO_AJUSTE, 'Ajuste manual'),
+    ]
+
+    # PROTECT: un insumo con movimientos no se borra, así no se pierde su kardex
+    insumo = models.ForeignKey(Insumo, on_delete=models.PROTECT, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    # Sin llave foránea para que el kardex conserve la historia aunque se borre el documento
+    documento_id = models.PositiveIntegerField(null=True, blank=True, help_text="Compra o abastecimiento que originó el movimiento")
+    cantidad = models.IntegerField(help_text="Positiva en entradas, negativa en salidas")
+    stock_resultante = models.PositiveIntegerField()
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Movimiento de inventario"
+        verbose_name_plural = "Movimientos de inventario"
+        ordering = ['-fecha', '-id']
+        indexes = [
+            # Stock a una fecha (último movimiento anterior) y kardex de un rango
+            models.Index(fields=['insumo', 'fecha', 'id'], name='movinv_insumo_fecha_idx'),
+            models.Index(fields=['tipo', 'documento_id'], name='movinv_documento_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.insumo_id}: {self.cantidad:+d} -> {self.stock_resultante}"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError('Los movimientos de inventario no se modifican; registre un ajuste')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Los movimientos de inventario no se eliminan; registre un ajuste')
+
+
+class ReabastecimientoInsumo(models.Model):
+    """
+    Punto de reorden y días de cobertura de cada insumo activo.
+
+    Es una tabla calculada: `python manage.py calcular_reabastecimiento`
+    (programado cada noche) la reemplaza completa a partir del consumo y
+    de los tiempos de entrega (ver api/insumos/reabastecimiento.py), y
+    /api/insumos/reabastecer/ solo la lee.
+    """
+    insumo = models.OneToOneField(
+        Insumo, on_delete=models.CASCADE, primary_key=True, related_name='reabastecimiento'
+    )
+    proveedor = models.ForeignKey(
+        Proveedor, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Último proveedor que vendió el insumo"
+    )
+    stock = models.PositiveIntegerField(help_text="Stock al momento del cálculo")
+    consumo_diario = models.DecimalField(max_digits=10, decimal_places=3)
+    desviacion_diaria = models.DecimalField(max_digits=10, decimal_places=3)
+    tiempo_entrega_dias = models.DecimalField(max_digits=6, decimal_places=2)
+    stock_seguridad = models.PositiveIntegerField()
+    punto_reorden = models.PositiveIntegerField()
+    # Vacío si el insumo no tuvo consumo en el período analizado
+    dias_cobertura = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True)
+    cantidad_sugerida = models.PositiveIntegerField(default=0)
+    requiere_reorden = models.BooleanField(default=False)
+    calculado_en = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Reabastecimiento de insumo"
+        verbose_name_plural = "Reabastecimiento de insumos"
+        ordering = ['dias_cobertura']
+        indexes = [
+            models.Index(fields=['requiere_reorden', 'dias_cobertura'], name='reabast_reorden_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.insumo_id}: punto de reorden {self.punto_reorden}, cobertura {self.dias_cobertura} días"
+
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender=Insumo)
+def registrar_saldo_inicial(sender, instance, created, **kwargs):
+    """Un insumo creado con stock abre su kardex con ese saldo"""
+    if created and instance.cantidad:
+        MovimientoInventario.objects.create(
+            insumo=instance,
+            tipo=MovimientoInventario.TIPO_SALDO_INICIAL,
+            cantidad=instance.cantidad,
+            stock_resultante=instance.cantidad,
+        )
@@ -0,0 +1,154 @@
+"""
+Reabastecimiento de insumos: cuándo y cuánto pedir.
+
+Para cada insumo activo se estima
+
+- el consumo diario: lo entregado a manicuristas (InsumoHasAbastecimiento)
+  en los últimos `dias` días, dividido por `dias`, y su desviación día a día;
+- el tiempo de entrega de su último proveedor: el promedio de días entre la
+  fecha de cada compra finalizada del proveedor y su entrada al stock (el
+  primer movimiento de compra en el kardex). Solo cuentan las compras que
+  pasaron de pendiente a finalizada: las que se registran ya finalizadas
+  entran al stock en el mismo momento y no dicen nada del proveedor. Sin
+  historial se usa TIEMPO_ENTREGA_POR_DEFECTO.
+
+y con eso
+
+    stock de seguridad = Z_SERVICIO * desviación * raíz(tiempo de entrega)
+    punto de reorden   = consumo diario * tiempo de entrega + stock de seguridad
+    días de cobertura  = stock / consumo diario
+    cantidad sugerida  = punto de reorden + DIAS_PEDIDO de consumo - stock
+
+Son tres consultas agrupadas para todos los insumos y el resto se calcula en
+memoria. El resultado reemplaza la tabla ReabastecimientoInsumo:
+
+    python manage.py calcular_reabastecimiento --dias 90
+
+(programado cada noche); /api/insumos/reabastecer/ solo lee esa tabla.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from api.compras.models import Compra, DetalleCompra
+from api.insumoshasabastecimientos.models import InsumoHasAbastecimiento
+
+from .kardex import inicio_del_dia
+from .models import Insumo, MovimientoInventario, ReabastecimientoInsumo
+
+
+DIAS_CONSUMO = 90
+DIAS_HISTORIAL_COMPRAS = 365
+TIEMPO_ENTREGA_POR_DEFECTO = 7
+TIEMPO_ENTREGA_MINIMO = 1
+DIAS_PEDIDO = 14
+Z_SERVICIO = 1.65  # ~95% de los ciclos sin quedarse sin stock
+# Una compra que entra al stock antes de esto se registró ya finalizada
+ESPERA_MINIMA_ENTREGA = timedelta(hours=1)
+
+
+def consumo_diario(desde, hasta):
+    """
+    {insumo_id: (promedio, desviación)} de las unidades entregadas por día
+    entre dos fechas; los días sin entregas cuentan como cero.
+    """
+    dias = (hasta - desde).days + 1
+    sumas = defaultdict(lambda: [0, 0])
+    por_dia = (
+        InsumoHasAbastecimiento.objects
+        .filter(abastecimiento__fecha__gte=desde, abastecimiento__fecha__lte=hasta)
+        .order_by()
+        .values('insumo_id', 'abastecimiento__fecha')
+        .annotate(total=Sum('cantidad'))
+        .values_list('insumo_id', 'total')
+    )
+    for insumo_id, total in por_dia:
+        sumas[insumo_id][0] += total
+        sumas[insumo_id][1] += total * total
+
+    consumo = {}
+    for insumo_id, (total, cuadrados) in sumas.items():
+        promedio = total / dias
+        consumo[insumo_id] = (promedio, math.sqrt(max(cuadrados / dias - promedio * promedio, 0)))
+    return consumo
+
+
+def tiempos_entrega(desde):
+    """
+    {proveedor_id: días promedio entre la compra y su entrada al stock} desde
+    una fecha, sin las compras registradas ya finalizadas.
+    """
+    entrada = MovimientoInventario.objects.filter(
+        tipo=MovimientoInventario.TIPO_COMPRA, documento_id=OuterRef('pk')
+    ).order_by('fecha').values('fecha')[:1]
+    compras = (
+        Compra.objects.filter(estado='finalizada', fecha__gte=inicio_del_dia(desde))
+        .order_by()
+        .annotate(entrada=Subquery(entrada))
+        .values_list('proveedor_id', 'fecha', 'entrada')
+    )
+
+    dias = defaultdict(list)
+    for proveedor_id, fecha, entrada in compras:
+        if entrada is not None and entrada - fecha >= ESPERA_MINIMA_ENTREGA:
+            dias[proveedor_id].append((entrada - fecha).total_seconds() / 86400)
+    return {proveedor_id: sum(valores) / len(valores) for proveedor_id, valores in dias.items()}
+
+
+def calcular(insumo_id, stock, consumo, desviacion, tiempo_entrega, ahora, proveedor_id=None):
+    """Fila de ReabastecimientoInsumo (sin guardar) para un insumo"""
+    tiempo_entrega = max(tiempo_entrega, TIEMPO_ENTREGA_MINIMO)
+    stock_seguridad = math.ceil(Z_SERVICIO * desviacion * math.sqrt(tiempo_entrega))
+    punto_reorden = math.ceil(consumo * tiempo_entrega) + stock_seguridad
+    requiere_reorden = consumo > 0 and stock <= punto_reorden
+    sugerida = math.ceil(punto_reorden + consumo * DIAS_PEDIDO - stock) if requiere_reorden else 0
+
+    return ReabastecimientoInsumo(
+        insumo_id=insumo_id,
+        proveedor_id=proveedor_id,
+        stock=stock,
+        consumo_diario=Decimal(f'{consumo:.3f}'),
+        desviacion_diaria=Decimal(f'{desviacion:.3f}'),
+        tiempo_entrega_dias=Decimal(f'{tiempo_entrega:.2f}'),
+        stock_seguridad=stock_seguridad,
+        punto_reorden=punto_reorden,
+        dias_cobertura=Decimal(f'{stock / consumo:.1f}') if consumo > 0 else None,
+        cantidad_sugerida=max(sugerida, 0),
+        requiere_reorden=requiere_reorden,
+        calculado_en=ahora,
+    )
+
+
+def calcular_reabastecimiento(dias=DIAS_CONSUMO, hoy=None):
+    """Recalcular ReabastecimientoInsumo para todos los insumos activos; retorna las filas creadas"""
+    hoy = hoy or timezone.localdate()
+    ahora = timezone.now()
+    consumo = consumo_diario(hoy - timedelta(days=dias - 1), hoy)
+    entregas = tiempos_entrega(hoy - timedelta(days=DIAS_HISTORIAL_COMPRAS))
+
+    ultimo_proveedor = DetalleCompra.objects.filter(
+        insumo=OuterRef('pk'), compra__estado='finalizada'
+    ).order_by('-compra__fecha', '-compra_id').values('compra__proveedor_id')[:1]
+    insumos = (
+        Insumo.objects.filter(estado='activo')
+        .annotate(ultimo_proveedor=Subquery(ultimo_proveedor))
+        .values_list('id', 'cantidad', 'ultimo_proveedor')
+    )
+
+    filas = []
+    for insumo_id, stock, proveedor_id in insumos:
+        promedio, desviacion = consumo.get(insumo_id, (0, 0))
+        filas.append(calcular(
+            insumo_id, stock, promedio, desviacion,
+            entregas.get(proveedor_id, TIEMPO_ENTREGA_POR_DEFECTO), ahora, proveedor_id
+        ))
+
+    with transaction.atomic():
+        ReabastecimientoInsumo.objects.all().delete()
+        ReabastecimientoInsumo.objects.bulk_create(filas)
+    return filas
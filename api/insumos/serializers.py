@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Insumo
+from .models import Insumo, MovimientoInventario, ReabastecimientoInsumo
 from api.categoriainsumos.serializers import CategoriaInsumoSerializer
 class InsumoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,3 +29,26 @@ class InsumoDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Insumo
         fields = ['id', 'nombre', 'cantidad', 'estado', 'categoria_insumo']
+
+
+class MovimientoInventarioSerializer(serializers.ModelSerializer):
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+
+    class Meta:
+        model = MovimientoInventario
+        fields = ['id', 'fecha', 'tipo', 'tipo_display', 'documento_id', 'cantidad', 'stock_resultante']
+
+
+class ReabastecimientoInsumoSerializer(serializers.ModelSerializer):
+    insumo_id = serializers.IntegerField(read_only=True)
+    insumo_nombre = serializers.CharField(source='insumo.nombre', read_only=True)
+    stock_actual = serializers.IntegerField(source='insumo.cantidad', read_only=True)
+    proveedor_nombre = serializers.CharField(source='proveedor.nombre_empresa', read_only=True, default=None)
+
+    class Meta:
+        model = ReabastecimientoInsumo
+        fields = [
+            'insumo_id', 'insumo_nombre', 'proveedor', 'proveedor_nombre', 'stock', 'stock_actual',
+            'consumo_diario', 'desviacion_diaria', 'tiempo_entrega_dias', 'stock_seguridad',
+            'punto_reorden', 'dias_cobertura', 'cantidad_sugerida', 'requiere_reorden', 'calculado_en'
+        ]
@@ -0,0 +1,101 @@
+"""
+Movimientos de stock de insumos.
+
+Compras, anulaciones, abastecimientos y ajustes manuales cambian `Insumo.cantidad` a través
+de `aplicar_movimientos`, que recibe los cambios de todo un documento como
+{insumo_id: delta} y los aplica en una sola pasada:
+
+- bloquea las filas con select_for_update en orden de id, el mismo orden en
+  todas las transacciones, así dos documentos con insumos en común esperan
+  uno al otro en vez de bloquearse mutuamente;
+- verifica que ningún stock quede negativo con las cantidades ya bloqueadas;
+- escribe todas las cantidades con un único bulk_update.
+
+Como las cantidades se leen con la fila bloqueada, dos peticiones
+simultáneas no se pisan. Cada cambio queda además en el kardex
+(MovimientoInventario) con el stock resultante.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Insumo, MovimientoInventario
+
+
+class StockInsuficiente(Exception):
+    """Algún insumo quedaría con stock negativo"""
+
+    def __init__(self, faltantes):
+        # [(nombre, disponible, requerido), ...]
+        self.faltantes = faltantes
+        detalle = ', '.join(f"{nombre} (disponible {disponible}, requerido {requerido})"
+                            for nombre, disponible, requerido in faltantes)
+        super().__init__(f"Stock insuficiente: {detalle}")
+
+
+def agrupar(lineas, signo=1):
+    """Sumar las cantidades de [(insumo_id, cantidad), ...] por insumo"""
+    deltas = defaultdict(int)
+    for insumo_id, cantidad in lineas:
+        deltas[int(insumo_id)] += signo * cantidad
+    return dict(deltas)
+
+
+def diferencia(nuevas, anteriores):
+    """Deltas para pasar del efecto `anteriores` al efecto `nuevas` ({insumo_id: cantidad})"""
+    deltas = dict(nuevas)
+    for insumo_id, cantidad in anteriores.items():
+        deltas[insumo_id] = deltas.get(insumo_id, 0) - cantidad
+    return deltas
+
+
+def aplicar_movimientos(deltas, tipo, documento_id=None):
+    """
+    Aplicar {insumo_id: delta} dentro de la transacción y registrarlo en el
+    kardex con el `tipo` de MovimientoInventario y el documento de origen.
+
+    Retorna {insumo_id: (stock_anterior, stock_nuevo)}. Lanza
+    StockInsuficiente (sin escribir nada) si algún insumo quedaría negativo.
+    """
+    deltas = {insumo_id: delta for insumo_id, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+
+    with transaction.atomic():
+        insumos = list(
+            Insumo.objects.select_for_update()
+            .filter(pk__in=deltas)
+            .order_by('pk')
+            .only('id', 'nombre', 'cantidad')
+        )
+
+        faltantes = [
+            (insumo.nombre, insumo.cantidad, -deltas[insumo.pk])
+            for insumo in insumos
+            if insumo.cantidad + deltas[insumo.pk] < 0
+        ]
+        if faltantes:
+            raise StockInsuficiente(faltantes)
+
+        ahora = timezone.now()
+        cambios = {}
+        for insumo in insumos:
+            anterior = insumo.cantidad
+            insumo.cantidad = anterior + deltas[insumo.pk]
+            insumo.updated_at = ahora
+            cambios[insumo.pk] = (anterior, insumo.cantidad)
+
+        Insumo.objects.bulk_update(insumos, ['cantidad', 'updated_at'])
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                insumo_id=insumo.pk,
+                tipo=tipo,
+                documento_id=documento_id,
+                cantidad=deltas[insumo.pk],
+                stock_resultante=insumo.cantidad,
+                fecha=ahora,
+            )
+            for insumo in insumos
+        ])
+    return cambios
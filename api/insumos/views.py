@@ -1,9 +1,15 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import F, Sum
-from .models import Insumo
-from .serializers import InsumoSerializer, InsumoDetailSerializer
+from datetime import datetime, timedelta
+from django.utils import timezone
+from django.db.models import F, ProtectedError, Sum
+from .models import Insumo, MovimientoInventario, ReabastecimientoInsumo
+from .stock import StockInsuficiente, aplicar_movimientos
+from .serializers import (
+    InsumoSerializer, InsumoDetailSerializer, MovimientoInventarioSerializer, ReabastecimientoInsumoSerializer
+)
+from . import kardex as historial
 # Importar los modelos de detalle de Compra y Abastecimiento con sus rutas correctas
 from api.compras.models import DetalleCompra # Correcto: DetalleCompra
 from api.insumoshasabastecimientos.models import InsumoHasAbastecimiento # Correcto: InsumoHasAbastecimiento
@@ -141,22 +147,96 @@ class InsumoViewSet(viewsets.ModelViewSet):
         
         try:
             cantidad = int(request.data.get('cantidad', 0))
-            if cantidad < 0 and abs(cantidad) > insumo.cantidad:
-                return Response(
-                    {"error": "No se puede reducir más de lo que hay en stock"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            insumo.cantidad += cantidad
-            insumo.save()
-            
-            serializer = InsumoDetailSerializer(insumo)
-            return Response(serializer.data)
-        except ValueError:
+        except (TypeError, ValueError):
             return Response(
                 {"error": "La cantidad debe ser un número entero"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        # El stock se lee y se escribe con la fila bloqueada: ajustes simultáneos no se pierden
+        try:
+            cambios = aplicar_movimientos({insumo.pk: cantidad}, MovimientoInventario.TIPO_AJUSTE)
+        except StockInsuficiente:
+            return Response(
+                {"error": "No se puede reducir más de lo que hay en stock"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if cambios:
+            insumo.cantidad = cambios[insumo.pk][1]
+        serializer = InsumoDetailSerializer(insumo)
+        return Response(serializer.data)
+
+    def _fecha(self, request, nombre, por_defecto):
+        valor = request.query_params.get(nombre)
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else por_defecto
+
+    @action(detail=True, methods=['get'])
+    def kardex(self, request, pk=None):
+        """
+        Movimientos del insumo en un período con saldo inicial y final.
+        Endpoint: /api/insumos/<pk>/kardex/?desde=2024-01-01&hasta=2024-01-31
+        Sin fechas se usan los últimos 30 días.
+        """
+        insumo = self.get_object()
+        hoy = timezone.localdate()
+        try:
+            desde = self._fecha(request, 'desde', hoy - timedelta(days=30))
+            hasta = self._fecha(request, 'hasta', hoy)
+        except ValueError:
+            return Response({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        if desde > hasta:
+            return Response({"error": "La fecha desde no puede ser posterior a hasta"}, status=status.HTTP_400_BAD_REQUEST)
+
+        resumen = historial.kardex(insumo.pk, desde, hasta)
+        return Response({
+            'insumo': {'id': insumo.id, 'nombre': insumo.nombre, 'cantidad': insumo.cantidad},
+            'periodo': {'desde': desde.isoformat(), 'hasta': hasta.isoformat()},
+            'stock_inicial': resumen['stock_inicial'],
+            'entradas': resumen['entradas'],
+            'salidas': resumen['salidas'],
+            'stock_final': resumen['stock_final'],
+            'movimientos': MovimientoInventarioSerializer(resumen['movimientos'], many=True).data,
+        })
+
+    @action(detail=False, methods=['get'], url_path='stock-a-fecha')
+    def stock_a_fecha(self, request):
+        """
+        Stock de cada insumo al cierre de un día, desde el kardex.
+        Endpoint: /api/insumos/stock-a-fecha/?fecha=2024-01-31&desde=2024-01-01
+        Con `desde` incluye el consumo (abastecimientos) entre desde y fecha.
+        Acepta los mismos filtros que el listado (estado, categoria, nombre).
+        """
+        try:
+            fecha = self._fecha(request, 'fecha', timezone.localdate())
+            desde = self._fecha(request, 'desde', None)
+        except ValueError:
+            return Response({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        insumos = historial.stock_a_fecha(fecha, self.get_queryset()).values('id', 'nombre', 'stock_a_fecha')
+        consumo = historial.consumo_por_insumo(desde, fecha) if desde else None
+
+        resultado = []
+        for insumo in insumos:
+            fila = {'id': insumo['id'], 'nombre': insumo['nombre'], 'stock': insumo['stock_a_fecha']}
+            if consumo is not None:
+                fila['consumo'] = consumo.get(insumo['id'], 0)
+            resultado.append(fila)
+        return Response({'fecha': fecha.isoformat(), 'desde': desde.isoformat() if desde else None, 'insumos': resultado})
+
+    @action(detail=False, methods=['get'])
+    def reabastecer(self, request):
+        """
+        Insumos que llegaron a su punto de reorden, los de menos días de cobertura primero.
+        Endpoint: /api/insumos/reabastecer/  (?todos=true incluye los que aún no hay que pedir)
+        Lee la tabla que calcula cada noche `python manage.py calcular_reabastecimiento`.
+        """
+        filas = ReabastecimientoInsumo.objects.select_related('insumo', 'proveedor')
+        if request.query_params.get('todos', '').lower() not in ('true', '1'):
+            filas = filas.filter(requiere_reorden=True)
+        filas = filas.order_by(F('dias_cobertura').asc(nulls_last=True), 'insumo_id')
+        serializer = ReabastecimientoInsumoSerializer(filas, many=True)
+        return Response(serializer.data)
 
     @action(detail=True, methods=['get'])
     def check_associations(self, request, pk=None):
@@ -221,4 +301,14 @@ class InsumoViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
-        return super().destroy(request, pk)
+        try:
+            return super().destroy(request, pk)
+        except ProtectedError:
+            # MovimientoInventario protege el kardex del insumo
+            return Response(
+                {
+                    "error": f"No se puede eliminar el insumo '{insumo.nombre}' porque tiene movimientos de inventario. "
+                             "Puede desactivarlo para que no se siga usando."
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
@@ -9,10 +9,12 @@ from .serializers import (
 )
 
 
-class InsumoHasAbastecimientoViewSet(viewsets.ModelViewSet):
+class InsumoHasAbastecimientoViewSet(viewsets.ReadOnlyModelViewSet):
     """
-    ViewSet para el modelo InsumoHasAbastecimiento.
-    Proporciona operaciones CRUD completas y algunos endpoints adicionales.
+    ViewSet de solo lectura para el modelo InsumoHasAbastecimiento.
+
+    Las líneas se crean, editan y borran con /api/abastecimientos/, que
+    mueve el stock y deja el kardex; escribirlas aquí lo descuadraría.
     """
     queryset = InsumoHasAbastecimiento.objects.all()
     
@@ -0,0 +1,243 @@
+"""
+Libro de comisiones causadas (MovimientoComision).
+
+Cada cita y cada venta tiene una comisión esperada según su estado actual:
+
+- cita finalizada: el 50% de `precio_servicio` (la misma regla de Liquidacion)
+- venta pagada: su `comision_manicurista`
+- en cualquier otro estado (o eliminada): 0
+
+`sincronizar` compara esa comisión esperada con lo ya registrado para el
+origen y escribe solo la diferencia (causación, ajuste o reverso), así se
+puede llamar varias veces sin duplicar. El saldo se lleva por manicurista y
+origen, y lo causado en un período sale de dos lecturas de saldo.
+
+La causación lleva la fecha de la cita (`fecha_cita`) o de la venta (día
+local de `fecha_venta`), también cuando se carga la historia con
+`conciliar --corregir`; ajustes y reversos llevan el día en que se registran
+para no cambiar períodos ya liquidados.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from api.manicuristas.models import Manicurista
+from api.ventaservicios.rollup import fecha_local
+from .models import MovimientoComision
+from .periodo import PORCENTAJE_CITAS
+
+
+CERO = Decimal('0.00')
+ORIGENES = [origen for origen, _ in MovimientoComision.ORIGEN_CHOICES]
+
+
+def comision_cita(precio_servicio):
+    return ((precio_servicio or CERO) * PORCENTAJE_CITAS).quantize(Decimal('0.01'))
+
+
+def _ultimo_saldo(manicurista_id, origen, **filtros):
+    saldo = MovimientoComision.objects.filter(
+        manicurista_id=manicurista_id, origen=origen, **filtros
+    ).order_by('-fecha', '-id').values_list('saldo', flat=True).first()
+    return saldo if saldo is not None else CERO
+
+
+def _bloquear(manicurista_id):
+    # Bloquear la manicurista serializa los movimientos que calculan su saldo
+    Manicurista.objects.select_for_update().filter(pk=manicurista_id).values_list('pk').first()
+
+
+def _registrar(manicurista_id, origen, origen_id, tipo, valor, base, fecha=None):
+    """
+    Agregar un movimiento con el saldo acumulado de la manicurista para el origen.
+
+    Un movimiento con fecha anterior a otros ya registrados (la causación de
+    una cita de días atrás) toma el saldo a su fecha y suma su valor al saldo
+    de los posteriores, así `saldo(hasta=...)` sigue siendo una lectura.
+    """
+    fecha = fecha or timezone.localdate()
+    _bloquear(manicurista_id)
+    saldo = _ultimo_saldo(manicurista_id, origen, fecha__lte=fecha) + valor
+    MovimientoComision.objects.filter(
+        manicurista_id=manicurista_id, origen=origen, fecha__gt=fecha
+    ).update(saldo=F('saldo') + valor)
+    return MovimientoComision.objects.create(
+        manicurista_id=manicurista_id,
+        origen=origen,
+        origen_id=origen_id,
+        tipo=tipo,
+        fecha=fecha,
+        base=base,
+        valor=valor,
+        saldo=saldo,
+    )
+
+
+def _tipo(registrado, esperado):
+    if not registrado:
+        return 'causacion'
+    return 'reverso' if not esperado else 'ajuste'
+
+
+def _fecha_movimiento(tipo, fecha_origen):
+    """Fecha de la cita o venta para la causación; el día de hoy para ajustes y reversos"""
+    hoy = timezone.localdate()
+    if tipo == 'causacion' and fecha_origen:
+        return fecha_origen
+    return max(hoy, fecha_origen) if fecha_origen else hoy
+
+
+def sincronizar(origen, origen_id, manicurista_id, esperado, base=CERO, fecha=None):
+    """
+    Dejar el neto registrado de un origen igual a la comisión esperada.
+
+    `fecha` es el día de la cita o venta. Si cambió de manicurista, se
+    reversa lo registrado a la anterior. Retorna la lista de movimientos
+    creados.
+    """
+    esperado = (esperado or CERO).quantize(Decimal('0.01'))
+    movimientos = []
+
+    with transaction.atomic():
+        # Primero el bloqueo y después la lectura del neto (también con
+        # bloqueo, que lee lo último confirmado): dos guardados simultáneos
+        # del mismo origen no ven ambos neto 0 ni causan dos veces
+        if manicurista_id:
+            _bloquear(manicurista_id)
+        netos = defaultdict(lambda: CERO)
+        for otra_id, valor in MovimientoComision.objects.select_for_update().filter(
+            origen=origen, origen_id=origen_id
+        ).values_list('manicurista_id', 'valor'):
+            netos[otra_id] += valor
+
+        for otra_id, neto in netos.items():
+            if otra_id != manicurista_id and neto:
+                movimientos.append(_registrar(
+                    otra_id, origen, origen_id, 'reverso', -neto, base, _fecha_movimiento('reverso', fecha)
+                ))
+
+        neto = netos.get(manicurista_id) or CERO
+        diferencia = esperado - neto
+        if diferencia and manicurista_id:
+            tipo = _tipo(neto, esperado)
+            movimientos.append(_registrar(
+                manicurista_id, origen, origen_id, tipo, diferencia, base, _fecha_movimiento(tipo, fecha)
+            ))
+
+    return movimientos
+
+
+def sincronizar_cita(cita, eliminada=False):
+    finalizada = cita.estado == 'finalizada' and not eliminada
+    return sincronizar(
+        MovimientoComision.ORIGEN_CITA, cita.pk, cita.manicurista_id,
+        comision_cita(cita.precio_servicio) if finalizada else CERO,
+        base=cita.precio_servicio or CERO,
+        fecha=cita.fecha_cita
+    )
+
+
+def sincronizar_venta(venta, eliminada=False):
+    pagada = venta.estado == 'pagada' and not eliminada
+    return sincronizar(
+        MovimientoComision.ORIGEN_VENTA, venta.pk, venta.manicurista_id,
+        venta.comision_manicurista if pagada else CERO,
+        base=venta.total or CERO,
+        fecha=fecha_local(venta.fecha_venta) if venta.fecha_venta else None
+    )
+
+
+def saldo(manicurista_id, origen, hasta=None):
+    """Comisión acumulada de la manicurista para el origen (hasta una fecha, inclusive)"""
+    if hasta is None:
+        return _ultimo_saldo(manicurista_id, origen)
+    return _ultimo_saldo(manicurista_id, origen, fecha__lte=hasta)
+
+
+def causado(manicurista_id, desde, hasta):
+    """
+    Comisión causada en el período por origen, más el valor sugerido para la
+    liquidación (ventas si las hay; si no, citas, como en calcular_periodo).
+    Son dos lecturas de saldo por origen, sin importar cuántos movimientos haya.
+    """
+    resumen = {
+        origen: saldo(manicurista_id, origen, hasta) - saldo(manicurista_id, origen, desde - timedelta(days=1))
+        for origen in ORIGENES
+    }
+    ventas = resumen[MovimientoComision.ORIGEN_VENTA]
+    resumen['valor_sugerido'] = ventas if ventas > 0 else resumen[MovimientoComision.ORIGEN_CITA]
+    return resumen
+
+
+def quincena(fecha=None):
+    """Primer y último día de la quincena de la fecha (1-15 o 16-fin de mes)"""
+    fecha = fecha or timezone.localdate()
+    if fecha.day <= 15:
+        return fecha.replace(day=1), fecha.replace(day=15)
+    siguiente_mes = (fecha.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return fecha.replace(day=16), siguiente_mes - timedelta(days=1)
+
+
+def conciliar(corregir=False):
+    """
+    Comparar el libro con las citas y ventas actuales.
+
+    Retorna (diferencias, saldos_inconsistentes):
+    - diferencias: [(origen, origen_id, manicurista_id, esperado, registrado)]
+    - saldos_inconsistentes: [(manicurista_id, origen, saldo, suma_movimientos)]
+
+    Con `corregir=True` registra los ajustes para que el neto coincida.
+    """
+    from api.citas.models import Cita
+    from api.ventaservicios.models import VentaServicio
+
+    # (comisión esperada, base, fecha de la cita o venta) por origen y manicurista
+    esperados = {}
+    for cita_id, manicurista_id, precio, fecha in Cita.objects.filter(
+        estado='finalizada'
+    ).values_list('id', 'manicurista_id', 'precio_servicio', 'fecha_cita').iterator():
+        esperados[(MovimientoComision.ORIGEN_CITA, cita_id, manicurista_id)] = (comision_cita(precio), precio, fecha)
+    for venta_id, manicurista_id, comision, total, fecha_venta in VentaServicio.objects.filter(
+        estado='pagada'
+    ).values_list('id', 'manicurista_id', 'comision_manicurista', 'total', 'fecha_venta').iterator():
+        esperados[(MovimientoComision.ORIGEN_VENTA, venta_id, manicurista_id)] = (
+            (comision or CERO).quantize(Decimal('0.01')), total, fecha_local(fecha_venta) if fecha_venta else None
+        )
+
+    registrados = defaultdict(lambda: CERO)
+    for origen, origen_id, manicurista_id, neto in MovimientoComision.objects.order_by().values(
+        'origen', 'origen_id', 'manicurista_id'
+    ).annotate(neto=Sum('valor')).values_list('origen', 'origen_id', 'manicurista_id', 'neto').iterator():
+        registrados[(origen, origen_id, manicurista_id)] = neto
+
+    diferencias = []
+    for clave in set(esperados) | set(registrados):
+        esperado = esperados.get(clave, (CERO, CERO, None))[0]
+        registrado = registrados.get(clave, CERO)
+        if esperado != registrado:
+            diferencias.append((*clave, esperado, registrado))
+    diferencias.sort()
+
+    if corregir:
+        for origen, origen_id, manicurista_id, esperado, registrado in diferencias:
+            _, base, fecha = esperados.get((origen, origen_id, manicurista_id), (CERO, CERO, None))
+            tipo = _tipo(registrado, esperado)
+            with transaction.atomic():
+                _registrar(
+                    manicurista_id, origen, origen_id, tipo, esperado - registrado, base or CERO,
+                    _fecha_movimiento(tipo, fecha)
+                )
+
+    # El último saldo de cada manicurista y origen debe ser la suma de sus movimientos
+    saldos_inconsistentes = []
+    sumas = MovimientoComision.objects.order_by().values('manicurista_id', 'origen').annotate(total=Sum('valor'))
+    for fila in sumas:
+        ultimo = _ultimo_saldo(fila['manicurista_id'], fila['origen'])
+        if ultimo != fila['total']:
+            saldos_inconsistentes.append((fila['manicurista_id'], fila['origen'], ultimo, fila['total']))
+
+    return diferencias, saldos_inconsistentes
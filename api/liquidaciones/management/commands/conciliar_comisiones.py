@@ -0,0 +1,43 @@
+"""
+Verificar el libro de comisiones contra las citas finalizadas y las ventas pagadas.
+
+Uso:
+
+    python manage.py conciliar_comisiones
+    python manage.py conciliar_comisiones --corregir    # registra los ajustes faltantes
+
+La primera vez, `--corregir` también sirve para cargar el libro con el histórico.
+"""
+from django.core.management.base import BaseCommand
+
+from api.liquidaciones.comisiones import conciliar
+
+
+class Command(BaseCommand):
+    help = 'Compara el libro de comisiones con citas y ventas y reporta (o corrige) las diferencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true',
+                            help='Registrar ajustes para que el libro coincida con citas y ventas')
+
+    def handle(self, *args, **options):
+        diferencias, saldos = conciliar(corregir=options['corregir'])
+
+        for origen, origen_id, manicurista_id, esperado, registrado in diferencias:
+            self.stdout.write(
+                f'  {origen} #{origen_id} (manicurista {manicurista_id}): '
+                f'esperado {esperado}, registrado {registrado}'
+            )
+        for manicurista_id, origen, saldo, suma in saldos:
+            self.stdout.write(self.style.ERROR(
+                f'  Saldo inconsistente manicurista {manicurista_id} ({origen}): saldo {saldo}, suma {suma}'
+            ))
+
+        if not diferencias and not saldos:
+            self.stdout.write(self.style.SUCCESS('El libro de comisiones coincide con citas y ventas'))
+        elif options['corregir']:
+            self.stdout.write(self.style.SUCCESS(f'Diferencias corregidas: {len(diferencias)}'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Diferencias: {len(diferencias)}; use --corregir para registrar los ajustes'
+            ))
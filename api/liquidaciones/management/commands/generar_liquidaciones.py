@@ -0,0 +1,42 @@
+"""
+Generar las liquidaciones de todas las manicuristas para un período.
+
+Uso:
+
+    python manage.py generar_liquidaciones --desde 2024-01-01 --hasta 2024-01-15
+    python manage.py generar_liquidaciones --desde 2024-01-01 --hasta 2024-01-15 --manicurista 3 --manicurista 7
+"""
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from api.liquidaciones.periodo import generar_liquidaciones
+
+
+class Command(BaseCommand):
+    help = 'Crea las liquidaciones de un período para todas las manicuristas activas (o las indicadas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', required=True, help='Fecha inicial del período (YYYY-MM-DD)')
+        parser.add_argument('--hasta', required=True, help='Fecha final del período (YYYY-MM-DD)')
+        parser.add_argument('--manicurista', type=int, action='append', dest='manicuristas',
+                            help='ID de manicurista a liquidar (se puede repetir)')
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+        try:
+            liquidaciones, omitidas = generar_liquidaciones(desde, hasta, options['manicuristas'])
+        except (ValueError, ValidationError) as e:
+            raise CommandError(str(e))
+
+        for liquidacion in liquidaciones:
+            self.stdout.write(f"  {liquidacion.resumen['manicurista_nombre']}: {liquidacion.valor}")
+        if omitidas:
+            self.stdout.write(f'Omitidas (ya tenían liquidación): {omitidas}')
+        self.stdout.write(self.style.SUCCESS(f'Liquidaciones creadas: {len(liquidaciones)}'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 01:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('liquidaciones', '0004_alter_liquidacion_options_and_more'),
+        ('manicuristas', '0003_manicurista_especialidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoComision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origen', models.CharField(choices=[('cita', 'Cita finalizada'), ('venta', 'Venta pagada')], max_length=10)),
+                ('origen_id', models.PositiveIntegerField()),
+                ('tipo', models.CharField(choices=[('causacion', 'Causación'), ('reverso', 'Reverso'), ('ajuste', 'Ajuste')], max_length=10)),
+                ('fecha', models.DateField(default=django.utils.timezone.localdate, help_text='Fecha de causación del movimiento')),
+                ('base', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Precio de la cita o total de la venta', max_digits=12)),
+                ('valor', models.DecimalField(decimal_places=2, help_text='Comisión (negativa en reversos)', max_digits=12)),
+                ('saldo', models.DecimalField(decimal_places=2, help_text='Acumulado de la manicurista para el origen', max_digits=14)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('manicurista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_comision', to='manicuristas.manicurista')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de comisión',
+                'verbose_name_plural': 'Movimientos de comisión',
+                'db_table': 'movimientos_comision',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['manicurista', 'origen', 'fecha'], name='movcomision_manic_origen_idx'), models.Index(fields=['origen', 'origen_id'], name='movcomision_origen_idx')],
+            },
+        ),
+    ]
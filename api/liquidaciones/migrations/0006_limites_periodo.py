@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 02:19
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fijar_limites(apps, schema_editor):
+    """Calcular inicio_periodo / fin_periodo de las liquidaciones existentes"""
+    from api.ventaservicios.rollup import inicio_dia
+
+    Liquidacion = apps.get_model('liquidaciones', 'Liquidacion')
+    liquidaciones = list(Liquidacion.objects.only('id', 'fecha_inicio', 'fecha_final'))
+    for liquidacion in liquidaciones:
+        liquidacion.inicio_periodo = inicio_dia(liquidacion.fecha_inicio)
+        liquidacion.fin_periodo = inicio_dia(liquidacion.fecha_final + timedelta(days=1))
+    Liquidacion.objects.bulk_update(liquidaciones, ['inicio_periodo', 'fin_periodo'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('liquidaciones', '0005_movimientocomision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liquidacion',
+            name='fin_periodo',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Medianoche del día siguiente a fecha_final (límite exclusivo)', null=True),
+        ),
+        migrations.AddField(
+            model_name='liquidacion',
+            name='inicio_periodo',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fijar_limites, migrations.RunPython.noop),
+    ]
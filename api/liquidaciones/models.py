@@ -1,7 +1,9 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
-from django.db.models import Sum
+from datetime import timedelta
+from django.db.models import Sum, Count
+from django.utils import timezone
 
 
 class Liquidacion(models.Model):
@@ -18,6 +20,13 @@ class Liquidacion(models.Model):
     )
     fecha_inicio = models.DateField()
     fecha_final = models.DateField()
+    # Límites del período como datetimes locales (aware) para filtrar
+    # VentaServicio.fecha_venta por rango en anotar_totales; se fijan en save()
+    inicio_periodo = models.DateTimeField(null=True, blank=True, editable=False)
+    fin_periodo = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Medianoche del día siguiente a fecha_final (límite exclusivo)"
+    )
     valor = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -55,18 +64,28 @@ class Liquidacion(models.Model):
         """Calcula el total a pagar (valor + bonificación)"""
         return self.valor + self.bonificacion
 
+    def _resumen_citas(self):
+        """
+        Total y cantidad de citas finalizadas del período. Usa las anotaciones
+        de `anotar_totales` si el queryset las trae; si no, una sola consulta
+        que se guarda en la instancia para las demás propiedades
+        """
+        if hasattr(self, 'citas_total') and not hasattr(self, '_citas_periodo'):
+            self._citas_periodo = {'total': self.citas_total, 'cantidad': self.citas_cantidad}
+        if not hasattr(self, '_citas_periodo'):
+            from api.citas.models import Cita
+
+            self._citas_periodo = Cita.objects.filter(
+                manicurista_id=self.manicurista_id,
+                fecha_cita__range=(self.fecha_inicio, self.fecha_final),
+                estado='finalizada'
+            ).aggregate(total=Sum('precio_servicio'), cantidad=Count('id'))
+        return self._citas_periodo
+
     @property
     def total_servicios_completados(self):
         """Calcula el total de servicios completados en el período"""
-        from api.citas.models import Cita
-        
-        total = Cita.objects.filter(
-            manicurista=self.manicurista,
-            fecha_cita__range=(self.fecha_inicio, self.fecha_final),
-            estado='finalizada'
-        ).aggregate(total=Sum('precio_servicio'))['total']
-        
-        return total or Decimal('0.00')
+        return self._resumen_citas()['total'] or Decimal('0.00')
 
     @property
     def citascompletadas(self):
@@ -76,13 +95,7 @@ class Liquidacion(models.Model):
     @property
     def cantidad_servicios_completados(self):
         """Cuenta la cantidad de servicios completados"""
-        from api.citas.models import Cita
-        
-        return Cita.objects.filter(
-            manicurista=self.manicurista,
-            fecha_cita__range=(self.fecha_inicio, self.fecha_final),
-            estado='finalizada'
-        ).count()
+        return self._resumen_citas()['cantidad']
 
     def calcular_citas_completadas(self):
         """Método para recalcular las citas completadas"""
@@ -90,6 +103,8 @@ class Liquidacion(models.Model):
 
     def recalcular_citas_completadas(self):
         """Método para recalcular y actualizar las citas completadas"""
+        self.__dict__.pop('_citas_periodo', None)
+        self.__dict__.pop('citas_total', None)
         nuevo_valor = self.calcular_citas_completadas()
         # Aquí podrías actualizar algún campo si fuera necesario
         return nuevo_valor
@@ -106,6 +121,115 @@ class Liquidacion(models.Model):
         if self.bonificacion < 0:
             raise ValidationError('La bonificación no puede ser negativa')
 
+    def fijar_limites_periodo(self):
+        """Calcular inicio_periodo / fin_periodo a partir de las fechas del período"""
+        from api.ventaservicios.rollup import inicio_dia
+
+        if self.fecha_inicio and self.fecha_final:
+            self.inicio_periodo = inicio_dia(self.fecha_inicio)
+            self.fin_periodo = inicio_dia(self.fecha_final + timedelta(days=1))
+
     def save(self, *args, **kwargs):
+        self.fijar_limites_periodo()
         self.full_clean()
         super().save(*args, **kwargs)
+
+
+class MovimientoComision(models.Model):
+    """
+    Libro de comisiones causadas por manicurista (solo se agregan filas).
+
+    Cada cita finalizada y cada venta pagada causan una comisión; si dejan de
+    estarlo (cancelación, cambio de estado) se registra el reverso. `saldo` es
+    el acumulado de la manicurista para ese origen después del movimiento, así
+    lo causado a una fecha o en un período se lee de una o dos filas.
+
+    Los movimientos se escriben desde api/liquidaciones/comisiones.py y se
+    verifican contra citas y ventas con `python manage.py conciliar_comisiones`.
+    """
+    ORIGEN_CITA = 'cita'
+    ORIGEN_VENTA = 'venta'
+    ORIGEN_CHOICES = [
+        (ORIGEN_CITA, 'Cita finalizada'),
+        (ORIGEN_VENTA, 'Venta pagada'),
+    ]
+
+    TIPO_CHOICES = [
+        ('causacion', 'Causación'),
+        ('reverso', 'Reverso'),
+        ('ajuste', 'Ajuste'),
+    ]
+
+    manicurista = models.ForeignKey(
+        'manicuristas.Manicurista',
+        on_delete=models.CASCADE,
+        related_name='movimientos_comision'
+    )
+    origen = models.CharField(max_length=10, choices=ORIGEN_CHOICES)
+    # Sin llave foránea para que el libro conserve la historia aunque se borre la cita o la venta
+    origen_id = models.PositiveIntegerField()
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    fecha = models.DateField(default=timezone.localdate, help_text="Fecha de causación del movimiento")
+    base = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text="Precio de la cita o total de la venta"
+    )
+    valor = models.DecimalField(max_digits=12, decimal_places=2, help_text="Comisión (negativa en reversos)")
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, help_text="Acumulado de la manicurista para el origen")
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'movimientos_comision'
+        verbose_name = 'Movimiento de comisión'
+        verbose_name_plural = 'Movimientos de comisión'
+        ordering = ['-id']
+        indexes = [
+            # Saldo a una fecha: último movimiento de la manicurista y el origen
+            models.Index(fields=['manicurista', 'origen', 'fecha'], name='movcomision_manic_origen_idx'),
+            # Neto de una cita o venta
+            models.Index(fields=['origen', 'origen_id'], name='movcomision_origen_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.origen} #{self.origen_id}: {self.valor}"
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError('Los movimientos de comisión no se modifican; registre un ajuste')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Los movimientos de comisión no se eliminan; registre un reverso')
+
+
+# ===== SEÑALES PARA EL LIBRO DE COMISIONES =====
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from api.citas.models import Cita
+from api.ventaservicios.models import VentaServicio
+
+
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def registrar_comision_cita(sender, instance, **kwargs):
+    """Causar o reversar la comisión cuando la cita entra o sale de 'finalizada'"""
+    from .comisiones import sincronizar_cita
+
+    eliminada = kwargs.get('signal') is post_delete
+    anterior = getattr(instance, '_estado_anterior', None)
+    if eliminada or 'finalizada' in (anterior, instance.estado):
+        sincronizar_cita(instance, eliminada=eliminada)
+
+
+@receiver(post_save, sender=VentaServicio)
+@receiver(post_delete, sender=VentaServicio)
+def registrar_comision_venta(sender, instance, **kwargs):
+    """Causar, ajustar o reversar la comisión cuando la venta entra, sigue o sale de 'pagada'"""
+    from .comisiones import sincronizar_venta
+
+    eliminada = kwargs.get('signal') is post_delete
+    anterior = getattr(instance, '_estado_anterior', None)
+    if eliminada or 'pagada' in (anterior, instance.estado):
+        sincronizar_venta(instance, eliminada=eliminada)
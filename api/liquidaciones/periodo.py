@@ -0,0 +1,188 @@
+"""
+Cálculo de liquidaciones de todas las manicuristas de un período.
+
+Los totales de ventas pagadas y de citas finalizadas se obtienen con una
+consulta agrupada por manicurista cada una, así cerrar un período cuesta lo
+mismo con 5 o con 5.000 citas. Lo usan el endpoint
+`/api/liquidaciones/generar-periodo/` y el comando
+`python manage.py generar_liquidaciones`.
+
+`anotar_totales` agrega esos mismos totales a un queryset de liquidaciones
+para que los listados no consulten por fila.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from api.citas.models import Cita
+from api.manicuristas.models import Manicurista
+from api.ventaservicios.models import VentaServicio
+from api.ventaservicios.rollup import inicio_dia
+from .models import Liquidacion
+
+
+# Porcentaje de las citas finalizadas que se liquida cuando no hay ventas
+PORCENTAJE_CITAS = Decimal('0.5')
+
+
+def _subconsulta(queryset, agregado, output_field):
+    """Agregado correlacionado de un queryset filtrado por OuterRef, con 0 si no hay filas"""
+    subconsulta = queryset.order_by().values('manicurista_id').annotate(valor=agregado).values('valor')
+    return Coalesce(Subquery(subconsulta, output_field=output_field), Value(0), output_field=output_field)
+
+
+def anotar_totales(queryset):
+    """
+    Anotar en un queryset de Liquidacion los totales que muestran los serializers.
+
+    - ventas_total / ventas_cantidad: ventas pagadas del período
+    - citas_total / citas_cantidad: citas finalizadas del período
+
+    Son subconsultas correlacionadas, así un listado completo sigue siendo una
+    sola consulta. Las ventas se filtran por rango sobre fecha_venta con los
+    límites guardados en la liquidación (inicio_periodo / fin_periodo), igual
+    que calcular_periodo, para que use venta_manic_fecha_estado_idx. Las propiedades del modelo y los serializers usan estos
+    valores cuando existen.
+    """
+    ventas = VentaServicio.objects.filter(
+        manicurista_id=OuterRef('manicurista_id'),
+        fecha_venta__gte=OuterRef('inicio_periodo'),
+        fecha_venta__lt=OuterRef('fin_periodo'),
+        estado='pagada'
+    )
+    citas = Cita.objects.filter(
+        manicurista_id=OuterRef('manicurista_id'),
+        fecha_cita__gte=OuterRef('fecha_inicio'),
+        fecha_cita__lte=OuterRef('fecha_final'),
+        estado='finalizada'
+    )
+    dinero = DecimalField(max_digits=14, decimal_places=2)
+    return queryset.annotate(
+        ventas_total=_subconsulta(ventas, Sum('total'), dinero),
+        ventas_cantidad=_subconsulta(ventas, Count('id'), IntegerField()),
+        citas_total=_subconsulta(citas, Sum('precio_servicio'), dinero),
+        citas_cantidad=_subconsulta(citas, Count('id'), IntegerField()),
+    )
+
+
+def calcular_periodo(fecha_inicio, fecha_final, manicurista_ids):
+    """
+    Totales de ventas pagadas y citas finalizadas por manicurista.
+
+    Retorna {manicurista_id: resumen} con total, cantidad y comisión de ventas,
+    total, cantidad y 50% de citas, y el valor sugerido para la liquidación
+    (ventas si las hay; si no, el 50% de las citas, igual que
+    `calcular_valor_ventas`).
+    """
+    cero = Decimal('0.00')
+    resumenes = {
+        manicurista_id: {
+            'total_ventas': cero,
+            'cantidad_ventas': 0,
+            'comision_ventas': cero,
+            'total_citas': cero,
+            'cantidad_citas': 0,
+        }
+        for manicurista_id in manicurista_ids
+    }
+
+    ventas = VentaServicio.objects.filter(
+        manicurista_id__in=manicurista_ids,
+        fecha_venta__gte=inicio_dia(fecha_inicio),
+        fecha_venta__lt=inicio_dia(fecha_final + timedelta(days=1)),
+        estado='pagada'
+    ).order_by().values('manicurista_id').annotate(
+        total=Sum('total'),
+        cantidad=Count('id'),
+        comision=Sum('comision_manicurista')
+    )
+    for fila in ventas:
+        resumen = resumenes[fila['manicurista_id']]
+        resumen['total_ventas'] = fila['total'] or cero
+        resumen['cantidad_ventas'] = fila['cantidad']
+        resumen['comision_ventas'] = fila['comision'] or cero
+
+    citas = Cita.objects.filter(
+        manicurista_id__in=manicurista_ids,
+        fecha_cita__range=(fecha_inicio, fecha_final),
+        estado='finalizada'
+    ).order_by().values('manicurista_id').annotate(
+        total=Sum('precio_servicio'),
+        cantidad=Count('id')
+    )
+    for fila in citas:
+        resumen = resumenes[fila['manicurista_id']]
+        resumen['total_citas'] = fila['total'] or cero
+        resumen['cantidad_citas'] = fila['cantidad']
+
+    for resumen in resumenes.values():
+        resumen['comision_citas'] = resumen['total_citas'] * PORCENTAJE_CITAS
+        resumen['valor_sugerido'] = (
+            resumen['total_ventas'] if resumen['total_ventas'] > 0 else resumen['comision_citas']
+        )
+    return resumenes
+
+
+def generar_liquidaciones(fecha_inicio, fecha_final, manicurista_ids=None):
+    """
+    Crear las liquidaciones pendientes de un período con un solo bulk_create.
+
+    Sin `manicurista_ids` se liquidan todas las manicuristas activas. Las que
+    ya tienen liquidación para exactamente ese período se omiten; las
+    manicuristas quedan bloqueadas mientras tanto, así una generación
+    concurrente del mismo período las omite en vez de fallar.
+
+    Retorna (creadas, omitidas): la lista de Liquidacion creadas (cada una con
+    su resumen en `.resumen`) y los ids de manicuristas omitidas.
+    """
+    if fecha_final < fecha_inicio:
+        raise ValueError('La fecha final debe ser posterior a la fecha de inicio')
+
+    manicuristas = Manicurista.objects.order_by('nombre')
+    if manicurista_ids is not None:
+        manicuristas = manicuristas.filter(id__in=manicurista_ids)
+    else:
+        manicuristas = manicuristas.filter(estado='activo')
+
+    with transaction.atomic():
+        # Bloquear las manicuristas (en orden de id) serializa dos generaciones
+        # del mismo período: la segunda espera y ve las liquidaciones de la
+        # primera como omitidas, en vez de chocar con unique_together
+        list(manicuristas.select_for_update().order_by('pk').values_list('pk', flat=True))
+        manicuristas = dict(manicuristas.values_list('id', 'nombre'))
+
+        omitidas = set(Liquidacion.objects.filter(
+            manicurista_id__in=manicuristas,
+            fecha_inicio=fecha_inicio,
+            fecha_final=fecha_final
+        ).values_list('manicurista_id', flat=True))
+
+        pendientes = [manicurista_id for manicurista_id in manicuristas if manicurista_id not in omitidas]
+        resumenes = calcular_periodo(fecha_inicio, fecha_final, pendientes)
+
+        liquidaciones = []
+        for manicurista_id in pendientes:
+            resumen = resumenes[manicurista_id]
+            liquidacion = Liquidacion(
+                manicurista_id=manicurista_id,
+                fecha_inicio=fecha_inicio,
+                fecha_final=fecha_final,
+                valor=resumen['valor_sugerido'].quantize(Decimal('0.01')),
+                observaciones=(
+                    f"Generada para el período: {resumen['cantidad_ventas']} ventas pagadas, "
+                    f"{resumen['cantidad_citas']} citas finalizadas"
+                )
+            )
+            liquidacion.fijar_limites_periodo()
+            # bulk_create no llama a save() (que hace full_clean); se valida aquí sin
+            # consultar la manicurista ni la unicidad, que ya se comprobaron arriba
+            liquidacion.full_clean(exclude=['manicurista'], validate_unique=False)
+            liquidacion.resumen = dict(resumen, manicurista_nombre=manicuristas[manicurista_id])
+            liquidaciones.append(liquidacion)
+
+        Liquidacion.objects.bulk_create(liquidaciones)
+
+    return liquidaciones, sorted(omitidas)
@@ -37,6 +37,9 @@ class LiquidacionSerializer(serializers.ModelSerializer):
     
     def get_total_ventas_completadas(self, obj):
         """Calcular total de ventas completadas en el período"""
+        # Valor anotado por LiquidacionViewSet.get_queryset (anotar_totales)
+        if hasattr(obj, 'ventas_total'):
+            return float(obj.ventas_total or 0)
         try:
             if hasattr(VentaServicio, 'objects') and VentaServicio.objects is not None:
                 total = VentaServicio.objects.filter(
@@ -52,6 +55,8 @@ class LiquidacionSerializer(serializers.ModelSerializer):
     
     def get_cantidad_ventas_completadas(self, obj):
         """Contar ventas completadas en el período"""
+        if hasattr(obj, 'ventas_cantidad'):
+            return obj.ventas_cantidad or 0
         try:
             if hasattr(VentaServicio, 'objects') and VentaServicio.objects is not None:
                 return VentaServicio.objects.filter(
@@ -105,6 +110,9 @@ class LiquidacionDetailSerializer(serializers.ModelSerializer):
     
     def get_total_ventas_completadas(self, obj):
         """Calcular total de ventas completadas en el período"""
+        # Valor anotado por LiquidacionViewSet.get_queryset (anotar_totales)
+        if hasattr(obj, 'ventas_total'):
+            return float(obj.ventas_total or 0)
         try:
             if hasattr(VentaServicio, 'objects') and VentaServicio.objects is not None:
                 total = VentaServicio.objects.filter(
@@ -120,6 +128,8 @@ class LiquidacionDetailSerializer(serializers.ModelSerializer):
     
     def get_cantidad_ventas_completadas(self, obj):
         """Contar ventas completadas en el período"""
+        if hasattr(obj, 'ventas_cantidad'):
+            return obj.ventas_cantidad or 0
         try:
             if hasattr(VentaServicio, 'objects') and VentaServicio.objects is not None:
                 return VentaServicio.objects.filter(
@@ -1,9 +1,12 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db.models import Sum, Q
 from datetime import datetime
 from .models import Liquidacion
+from .periodo import anotar_totales, generar_liquidaciones
+from .comisiones import causado, quincena
 from .serializers import (
     LiquidacionSerializer, 
     LiquidacionDetailSerializer, 
@@ -43,7 +46,9 @@ class LiquidacionViewSet(viewsets.ModelViewSet):
         return LiquidacionSerializer
 
     def get_queryset(self):
-        queryset = Liquidacion.objects.select_related('manicurista').all()
+        # Los totales de ventas y citas van anotados para que los serializers
+        # no hagan consultas por cada liquidación
+        queryset = anotar_totales(Liquidacion.objects.select_related('manicurista__usuario'))
         manicurista_id = self.request.query_params.get('manicurista')
         estado = self.request.query_params.get('estado')
         fecha_inicio = self.request.query_params.get('fecha_inicio')
@@ -165,6 +170,104 @@ class LiquidacionViewSet(viewsets.ModelViewSet):
             'valor_sugerido': float(valor_sugerido)  # Usar ventas o citas como fallback
         })
 
+    @action(detail=False, methods=['post'], url_path='generar-periodo')
+    def generar_periodo(self, request):
+        """
+        Generar las liquidaciones de todas las manicuristas para un período
+        URL: POST /api/liquidaciones/generar-periodo/
+        Body: {"fecha_inicio": "2024-01-01", "fecha_final": "2024-01-15", "manicuristas": [1, 2]}
+
+        `manicuristas` es opcional (por defecto todas las activas). Las que ya
+        tienen liquidación para ese período se omiten.
+        """
+        fecha_inicio = request.data.get('fecha_inicio')
+        fecha_final = request.data.get('fecha_final')
+        manicurista_ids = request.data.get('manicuristas')
+
+        if not all([fecha_inicio, fecha_final]):
+            return Response({
+                "error": "Se requieren fecha_inicio y fecha_final"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            fecha_inicio_obj = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+            fecha_final_obj = datetime.strptime(fecha_final, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if manicurista_ids is not None:
+            if not isinstance(manicurista_ids, list) or not all(str(m).isdigit() for m in manicurista_ids):
+                return Response({"error": "manicuristas debe ser una lista de IDs"}, status=status.HTTP_400_BAD_REQUEST)
+            manicurista_ids = [int(m) for m in manicurista_ids]
+
+        try:
+            liquidaciones, omitidas = generar_liquidaciones(fecha_inicio_obj, fecha_final_obj, manicurista_ids)
+        except (ValueError, DjangoValidationError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'periodo': {
+                'fecha_inicio': fecha_inicio,
+                'fecha_final': fecha_final
+            },
+            'total_creadas': len(liquidaciones),
+            'manicuristas_omitidas': omitidas,
+            'liquidaciones': [
+                {
+                    'manicurista': {
+                        'id': liquidacion.manicurista_id,
+                        'nombre': liquidacion.resumen['manicurista_nombre']
+                    },
+                    'valor': float(liquidacion.valor),
+                    'resumen_ventas': {
+                        'total_ventas_completadas': float(liquidacion.resumen['total_ventas']),
+                        'cantidad_ventas': liquidacion.resumen['cantidad_ventas'],
+                        'comision_ventas': float(liquidacion.resumen['comision_ventas'])
+                    },
+                    'resumen_citas': {
+                        'total_servicios_completados': float(liquidacion.resumen['total_citas']),
+                        'citas_completadas_50_porciento': float(liquidacion.resumen['comision_citas']),
+                        'cantidad_citas': liquidacion.resumen['cantidad_citas']
+                    }
+                }
+                for liquidacion in liquidaciones
+            ]
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='comisiones-causadas')
+    def comisiones_causadas(self, request):
+        """
+        Comisión causada por una manicurista en un período, desde el libro de comisiones
+        URL: /api/liquidaciones/comisiones-causadas/?manicurista=1&desde=2024-01-01&hasta=2024-01-15
+
+        Sin fechas se usa la quincena actual. Son lecturas de saldo, no depende
+        de cuántas citas o ventas tenga el período.
+        """
+        manicurista_id = request.query_params.get('manicurista')
+        if not manicurista_id or not manicurista_id.isdigit():
+            return Response({"error": "Se requiere el ID de la manicurista"}, status=status.HTTP_400_BAD_REQUEST)
+
+        desde, hasta = quincena()
+        try:
+            if request.query_params.get('desde'):
+                desde = datetime.strptime(request.query_params['desde'], '%Y-%m-%d').date()
+            if request.query_params.get('hasta'):
+                hasta = datetime.strptime(request.query_params['hasta'], '%Y-%m-%d').date()
+        except ValueError:
+            return Response({"error": "Formato de fecha inválido. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        resumen = causado(int(manicurista_id), desde, hasta)
+        return Response({
+            'manicurista_id': int(manicurista_id),
+            'periodo': {
+                'fecha_inicio': desde.isoformat(),
+                'fecha_final': hasta.isoformat()
+            },
+            'comision_citas': float(resumen['cita']),
+            'comision_ventas': float(resumen['venta']),
+            'valor_sugerido': float(resumen['valor_sugerido'])
+        })
+
     @action(detail=False, methods=['post'])
     def calcular_citas_completadas(self, request):
         """
@@ -189,7 +292,7 @@ class LiquidacionViewSet(viewsets.ModelViewSet):
             manicurista=manicurista,
             fecha_cita__range=(fecha_inicio, fecha_final),
             estado='finalizada'
-        )
+        ).select_related('cliente', 'servicio')
 
         total_servicios = citas_completadas.aggregate(
             total=Sum('precio_servicio')
@@ -246,14 +349,18 @@ class LiquidacionViewSet(viewsets.ModelViewSet):
     def por_manicurista(self, request):
         manicurista_id = request.query_params.get('id')
         if manicurista_id:
-            liquidaciones = Liquidacion.objects.filter(manicurista_id=manicurista_id)
+            liquidaciones = anotar_totales(
+                Liquidacion.objects.select_related('manicurista__usuario').filter(manicurista_id=manicurista_id)
+            )
             serializer = LiquidacionDetailSerializer(liquidaciones, many=True)
             return Response(serializer.data)
         return Response({"error": "Se requiere el ID del manicurista"}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
     def pendientes(self, request):
-        liquidaciones = Liquidacion.objects.filter(estado='pendiente')
+        liquidaciones = anotar_totales(
+            Liquidacion.objects.select_related('manicurista__usuario').filter(estado='pendiente')
+        )
         serializer = LiquidacionDetailSerializer(liquidaciones, many=True)
         return Response(serializer.data)
 
@@ -76,6 +76,9 @@ class Manicurista(BaseModel):
         contraseña = ''.join(secrets.choice(caracteres) for i in range(8))
         self.contraseña_temporal = make_password(contraseña)
         self.debe_cambiar_contraseña = True
+        # El login verifica la contraseña del usuario: mantenerla igual a la temporal
+        if self.usuario_id:
+            Usuario.objects.filter(pk=self.usuario_id).update(password=self.contraseña_temporal)
         return contraseña  # Retorna la contraseña sin encriptar para enviarla por correo
     
     def verificar_contraseña_temporal(self, contraseña):
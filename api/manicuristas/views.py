@@ -2,8 +2,8 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.db.models import Count, Sum
-from django.core.mail import send_mail
-from django.conf import settings
+from api.authentication.login import ErrorLogin, autenticar, datos_sesion
+from api.utils.email_utils import encolar_correo
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.db import transaction
@@ -225,13 +225,11 @@ class ManicuristaViewSet(viewsets.ModelViewSet):
         Si tienes alguna pregunta, contacta al administrador.
         """
         
-        send_mail(
+        encolar_correo(
+            [manicurista.correo],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [manicurista.correo],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
     
     @action(detail=False, methods=['post'])
@@ -241,38 +239,23 @@ class ManicuristaViewSet(viewsets.ModelViewSet):
         """
         serializer = LoginManicuristaSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        
-        numero_documento = serializer.validated_data['numero_documento']
-        contraseña = serializer.validated_data['contraseña']
-        
+
         try:
-            manicurista = Manicurista.objects.get(numero_documento=numero_documento)
-            
-            if not manicurista.verificar_contraseña_temporal(contraseña):
-                return Response(
-                    {'error': 'Credenciales incorrectas'}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-            
-            if manicurista.estado != 'activo':
-                return Response(
-                    {'error': 'Cuenta inactiva. Contacta al administrador'}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-            
-            response_data = {
-                'mensaje': 'Login exitoso',
-                'manicurista': ManicuristaSerializer(manicurista).data,
-                'debe_cambiar_contraseña': manicurista.debe_cambiar_contraseña
-            }
-            
-            return Response(response_data)
-            
-        except Manicurista.DoesNotExist:
-            return Response(
-                {'error': 'Credenciales incorrectas'}, 
-                status=status.HTTP_401_UNAUTHORIZED
+            usuario = autenticar(
+                serializer.validated_data['contraseña'],
+                relacion='manicurista',
+                manicurista__numero_documento=serializer.validated_data['numero_documento']
             )
+        except ErrorLogin as e:
+            return Response({'error': e.mensaje}, status=status.HTTP_401_UNAUTHORIZED)
+
+        manicurista = usuario.manicurista
+        return Response({
+            'mensaje': 'Login exitoso',
+            'manicurista': ManicuristaSerializer(manicurista).data,
+            'debe_cambiar_contraseña': manicurista.debe_cambiar_contraseña,
+            **datos_sesion(usuario)
+        })
     
     @action(detail=True, methods=['post'])
     def cambiar_password(self, request, pk=None):
@@ -393,13 +376,11 @@ class ManicuristaViewSet(viewsets.ModelViewSet):
         Gracias por mantener tu información actualizada.
         """
         
-        send_mail(
+        encolar_correo(
+            [manicurista.correo],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [manicurista.correo],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
     
     @action(detail=True, methods=['post'])
@@ -519,13 +500,11 @@ class ManicuristaViewSet(viewsets.ModelViewSet):
         ¿Necesitas ayuda? Contacta al administrador.
         """
         
-        send_mail(
+        encolar_correo(
+            [manicurista.correo],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [manicurista.correo],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
     
     @action(detail=False, methods=['get'])
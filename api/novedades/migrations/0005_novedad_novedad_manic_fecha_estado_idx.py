@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manicuristas', '0003_manicurista_especialidad'),
+        ('novedades', '0004_alter_novedad_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='novedad',
+            index=models.Index(fields=['manicurista', 'fecha', 'estado'], name='novedad_manic_fecha_estado_idx'),
+        ),
+    ]
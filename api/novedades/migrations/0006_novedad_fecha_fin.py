@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def completar_fecha_fin(apps, schema_editor):
+    """Las novedades existentes son de un solo día"""
+    Novedad = apps.get_model('novedades', 'Novedad')
+    Novedad.objects.filter(fecha_fin__isnull=True).update(fecha_fin=models.F('fecha'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manicuristas', '0003_manicurista_especialidad'),
+        ('novedades', '0005_novedad_novedad_manic_fecha_estado_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='novedad',
+            name='fecha_fin',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(completar_fecha_fin, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='novedad',
+            name='fecha_fin',
+            field=models.DateField(blank=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='novedad',
+            unique_together=set(),
+        ),
+        migrations.AddIndex(
+            model_name='novedad',
+            index=models.Index(fields=['manicurista', 'fecha_fin', 'fecha'], name='novedad_manic_rango_idx'),
+        ),
+    ]
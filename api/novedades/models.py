@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 from datetime import time, date, timedelta
@@ -22,7 +23,10 @@ class Novedad(models.Model):
     HORA_MAX_PERMITIDA = time(22, 0) # Para validaciones de entrada/salida
 
     manicurista = models.ForeignKey('manicuristas.Manicurista', on_delete=models.CASCADE, related_name='novedades')
+    # Primer y último día de la novedad; una ausencia puede cubrir varios días
+    # (vacaciones, incapacidades). Si no se indica, fecha_fin es igual a fecha.
     fecha = models.DateField(default=timezone.localdate)
+    fecha_fin = models.DateField(blank=True)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='normal')
     
     # Campos para estado 'tardanza'
@@ -45,53 +49,74 @@ class Novedad(models.Model):
     class Meta:
         verbose_name = "Novedad"
         verbose_name_plural = "Novedades"
-        unique_together = [['manicurista', 'fecha']] # Una novedad por manicurista por día
         ordering = ['-fecha', 'manicurista__nombre'] # Corregido a 'manicurista__nombre'
+        indexes = [
+            # Novedades activas de la agenda; el cruce de rangos (fecha <= hasta y
+            # fecha_fin >= desde) se resuelve con el índice
+            models.Index(fields=['manicurista', 'fecha', 'estado'], name='novedad_manic_fecha_estado_idx'),
+            models.Index(fields=['manicurista', 'fecha_fin', 'fecha'], name='novedad_manic_rango_idx'),
+        ]
 
     def __str__(self):
+        if self.fecha_fin and self.fecha_fin != self.fecha:
+            return f"Novedad de {self.manicurista.nombre} del {self.fecha} al {self.fecha_fin} - Estado: {self.get_estado_display()}"
         return f"Novedad de {self.manicurista.nombre} el {self.fecha} - Estado: {self.get_estado_display()}"
 
+    @property
+    def dias(self):
+        """Fechas cubiertas por la novedad"""
+        fecha_fin = self.fecha_fin or self.fecha
+        return [self.fecha + timedelta(days=i) for i in range((fecha_fin - self.fecha).days + 1)]
+
     def clean(self):
         # Validaciones adicionales que no dependen de otros modelos
+        if self.fecha_fin and self.fecha and self.fecha_fin < self.fecha:
+            raise ValidationError({'fecha_fin': 'La fecha final no puede ser anterior a la fecha de inicio.'})
+        if self.estado == 'tardanza' and self.fecha_fin and self.fecha_fin != self.fecha:
+            raise ValidationError({'fecha_fin': 'Una tardanza solo puede registrarse para un día.'})
+
         if self.estado == 'tardanza':
             if not self.hora_entrada:
-                raise models.ValidationError({'hora_entrada': 'La hora de entrada es requerida para el estado "Tardanza".'})
+                raise ValidationError({'hora_entrada': 'La hora de entrada es requerida para el estado "Tardanza".'})
             if self.tipo_ausencia or self.hora_inicio_ausencia or self.hora_fin_ausencia:
-                raise models.ValidationError('Los campos de ausencia no deben especificarse para el estado "Tardanza".')
+                raise ValidationError('Los campos de ausencia no deben especificarse para el estado "Tardanza".')
         elif self.estado == 'ausente':
             if not self.tipo_ausencia:
-                raise models.ValidationError({'tipo_ausencia': 'El tipo de ausencia es requerido para el estado "Ausente".'})
+                raise ValidationError({'tipo_ausencia': 'El tipo de ausencia es requerido para el estado "Ausente".'})
             if self.tipo_ausencia == 'por_horas':
                 if not self.hora_inicio_ausencia or not self.hora_fin_ausencia:
-                    raise models.ValidationError('Las horas de inicio y fin de ausencia son requeridas para el tipo "Por Horas".')
+                    raise ValidationError('Las horas de inicio y fin de ausencia son requeridas para el tipo "Por Horas".')
                 if self.hora_inicio_ausencia >= self.hora_fin_ausencia:
-                    raise models.ValidationError('La hora de inicio de ausencia debe ser anterior a la hora de fin.')
+                    raise ValidationError('La hora de inicio de ausencia debe ser anterior a la hora de fin.')
             elif self.tipo_ausencia == 'completa':
                 if self.hora_inicio_ausencia or self.hora_fin_ausencia:
-                    raise models.ValidationError('Las horas de inicio y fin de ausencia no deben especificarse para el tipo "Día Completo".')
+                    raise ValidationError('Las horas de inicio y fin de ausencia no deben especificarse para el tipo "Día Completo".')
             if self.hora_entrada:
-                raise models.ValidationError('La hora de entrada no debe especificarse para el estado "Ausente".')
-        else: # 'normal' o 'anulada'
+                raise ValidationError('La hora de entrada no debe especificarse para el estado "Ausente".')
+        elif self.estado == 'normal':
+            # Una novedad anulada conserva los datos de la tardanza o ausencia original
             if self.hora_entrada or self.tipo_ausencia or self.hora_inicio_ausencia or self.hora_fin_ausencia:
-                raise models.ValidationError('No se deben especificar campos de tardanza o ausencia para el estado "Normal" o "Anulada".')
+                raise ValidationError('No se deben especificar campos de tardanza o ausencia para el estado "Normal".')
 
         # Validaciones de rango de horas
         if self.hora_entrada and not (self.HORA_MIN_PERMITIDA <= self.hora_entrada <= self.HORA_MAX_PERMITIDA):
-            raise models.ValidationError(
+            raise ValidationError(
                 f"La hora de entrada debe estar entre {self.HORA_MIN_PERMITIDA.strftime('%H:%M')} "
                 f"y {self.HORA_MAX_PERMITIDA.strftime('%H:%M')}."
             )
         if self.hora_inicio_ausencia and not (self.HORA_MIN_PERMITIDA <= self.hora_inicio_ausencia <= self.HORA_MAX_PERMITIDA):
-            raise models.ValidationError(
+            raise ValidationError(
                 f"La hora de inicio de ausencia debe estar entre {self.HORA_MIN_PERMITIDA.strftime('%H:%M')} "
                 f"y {self.HORA_MAX_PERMITIDA.strftime('%H:%M')}."
             )
         if self.hora_fin_ausencia and not (self.HORA_MIN_PERMITIDA <= self.hora_fin_ausencia <= self.HORA_MAX_PERMITIDA):
-            raise models.ValidationError(
+            raise ValidationError(
                 f"La hora de fin de ausencia debe estar entre {self.HORA_MIN_PERMITIDA.strftime('%H:%M')} "
                 f"y {self.HORA_MAX_PERMITIDA.strftime('%H:%M')}."
             )
 
     def save(self, *args, **kwargs):
+        if not self.fecha_fin:
+            self.fecha_fin = self.fecha
         self.full_clean() # Ejecuta las validaciones definidas en clean()
         super().save(*args, **kwargs)
@@ -57,11 +57,23 @@ class NovedadSerializer(serializers.ModelSerializer):
       Validaciones a nivel de objeto para asegurar la consistencia de los datos
       basado en el estado de la novedad.
       """
-      estado = data.get('estado')
-      hora_entrada = data.get('hora_entrada')
-      tipo_ausencia = data.get('tipo_ausencia')
-      hora_inicio_ausencia = data.get('hora_inicio_ausencia')
-      hora_fin_ausencia = data.get('hora_fin_ausencia')
+      # En una edición parcial (PATCH) los campos que no llegan conservan su
+      # valor actual, así se valida la novedad como quedará guardada
+      valores = data
+      if self.partial and self.instance is not None:
+          valores = {
+              campo: getattr(self.instance, campo) for campo in (
+                  'manicurista', 'fecha', 'fecha_fin', 'estado', 'hora_entrada',
+                  'tipo_ausencia', 'hora_inicio_ausencia', 'hora_fin_ausencia'
+              )
+          }
+          valores.update(data)
+
+      estado = valores.get('estado')
+      hora_entrada = valores.get('hora_entrada')
+      tipo_ausencia = valores.get('tipo_ausencia')
+      hora_inicio_ausencia = valores.get('hora_inicio_ausencia')
+      hora_fin_ausencia = valores.get('hora_fin_ausencia')
 
       if estado == 'tardanza':
           if not hora_entrada:
@@ -95,14 +107,20 @@ class NovedadSerializer(serializers.ModelSerializer):
       # Obtener la instancia actual si es una actualización
       instance = self.instance
       
-      fecha = data.get('fecha')
-      manicurista = data.get('manicurista')
+      fecha = valores.get('fecha')
+      fecha_fin = valores.get('fecha_fin') or (instance.fecha_fin if instance and instance.pk else None) or fecha
+      manicurista = valores.get('manicurista')
+
+      if fecha and fecha_fin and fecha_fin < fecha:
+          raise serializers.ValidationError({'fecha_fin': 'La fecha final no puede ser anterior a la fecha de inicio.'})
+      if estado == 'tardanza' and fecha and fecha_fin != fecha:
+          raise serializers.ValidationError({'fecha_fin': 'Una tardanza solo puede registrarse para un día.'})
 
       today = localdate()
       tomorrow = today + timedelta(days=1)
 
-      # Validación de fecha según el estado
-      if fecha and estado:
+      # Validación de fecha según el estado (solo si se cambia la fecha o el estado)
+      if fecha and estado and ('fecha' in data or 'estado' in data):
           if estado == 'ausente' and fecha < tomorrow:
               raise serializers.ValidationError({
                   'fecha': 'Para ausencias, debe seleccionar una fecha a partir de mañana.'
@@ -119,9 +137,11 @@ class NovedadSerializer(serializers.ModelSerializer):
       # Validación de duplicados activos
       # Solo validar si no es una novedad anulada
       if estado != 'anulada':
+          # Dos novedades activas se cruzan si sus rangos de fechas se solapan
           existing_query = Novedad.objects.filter(
               manicurista=manicurista,
-              fecha=fecha
+              fecha__lte=fecha_fin,
+              fecha_fin__gte=fecha
           ).exclude(estado='anulada')
           
           if instance and instance.pk: # Si es una actualización, excluir la instancia actual
@@ -129,7 +149,7 @@ class NovedadSerializer(serializers.ModelSerializer):
               
           if existing_query.exists():
               raise serializers.ValidationError(
-                  "Ya existe una novedad activa para esta manicurista en la fecha indicada."
+                  "Ya existe una novedad activa para esta manicurista en las fechas indicadas."
               )
 
       return data
@@ -172,6 +192,9 @@ class NovedadDetailSerializer(serializers.ModelSerializer):
           else:
               return f"La manicurista {nombre} llegó tarde, sin hora registrada."
       elif obj.estado == 'ausente':
+          if obj.tipo_ausencia == 'completa' and obj.fecha_fin and obj.fecha_fin != obj.fecha:
+              return (f"La manicurista {nombre} se ausenta del {obj.fecha.strftime('%d/%m/%Y')} "
+                      f"al {obj.fecha_fin.strftime('%d/%m/%Y')}.")
           if obj.tipo_ausencia == 'completa':
               return f"La manicurista {nombre} se ausentó todo el día ({Novedad.HORA_ENTRADA_BASE.strftime('%I:%M %p')} - {Novedad.HORA_SALIDA_BASE.strftime('%I:%M %p')})."
           elif obj.tipo_ausencia == 'por_horas':
@@ -191,7 +214,7 @@ class NovedadDetailSerializer(serializers.ModelSerializer):
           from api.citas.models import Cita
           citas = Cita.objects.filter(
               novedad_relacionada=obj # Usar el nuevo campo
-          ).values('id', 'hora_cita', 'estado', 'cliente__nombre')
+          ).values('id', 'fecha_cita', 'hora_cita', 'estado', 'cliente__nombre')
           return list(citas)
       except Exception as e:
           # Manejar el error si el modelo Cita no está disponible o hay otro problema
@@ -1,7 +1,9 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, ExtractHour, ExtractMinute, NullIf
 from django.utils import timezone
 from datetime import datetime, timedelta, time
 from .models import Novedad
@@ -9,8 +11,10 @@ from .serializers import NovedadSerializer, NovedadDetailSerializer, NovedadUpda
 from api.manicuristas.models import Manicurista
 from api.manicuristas.serializers import ManicuristaSerializer
 from api.citas.models import Cita # Importar el modelo Cita
-from django.core.mail import send_mail
-from django.conf import settings
+from api.citas.availability import (
+    INTERVALO_MINUTOS, obtener_agenda, invalidar_agenda, invalidar_agendas, formatear_minutos, minutos
+)
+from api.utils.email_utils import encolar_correos
 
 
 class NovedadViewSet(viewsets.ModelViewSet):
@@ -30,8 +34,9 @@ class NovedadViewSet(viewsets.ModelViewSet):
 
         if manicurista_id:
             queryset = queryset.filter(manicurista_id=manicurista_id)
+        # Los filtros de fechas devuelven las novedades que se cruzan con el rango
         if fecha_inicio:
-            queryset = queryset.filter(fecha__gte=fecha_inicio)
+            queryset = queryset.filter(fecha_fin__gte=fecha_inicio)
         if fecha_fin:
             queryset = queryset.filter(fecha__lte=fecha_fin)
         if estado:
@@ -39,7 +44,7 @@ class NovedadViewSet(viewsets.ModelViewSet):
         if fecha_desde:
             try:
                 fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha__gte=fecha_desde)
+                queryset = queryset.filter(fecha_fin__gte=fecha_desde)
             except ValueError:
                 pass
         if fecha_hasta:
@@ -61,7 +66,10 @@ class NovedadViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        # La novedad y la cancelación de sus citas se confirman juntas
+        with transaction.atomic():
+            self.perform_create(serializer)
+            self._manejar_citas_afectadas(serializer.instance)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
@@ -70,7 +78,11 @@ class NovedadViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        # Si el cambio amplía el rango o el horario (o pasa de tardanza a
+        # ausencia) se cancelan las citas que ahora quedan dentro
+        with transaction.atomic():
+            self.perform_update(serializer)
+            self._manejar_citas_afectadas(serializer.instance)
 
         if getattr(instance, '_prefetched_objects_cache', None):
             # If 'prefetch_related' has been applied to a queryset, we need to
@@ -93,14 +105,15 @@ class NovedadViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Anular la novedad
-            novedad.estado = 'anulada'
-            novedad.motivo_anulacion = motivo_anulacion
-            novedad.fecha_anulacion = timezone.now()
-            novedad.save()
-            
-            # Reactivar citas que fueron canceladas por esta novedad
-            self._reactivar_citas_canceladas(novedad)
+            with transaction.atomic():
+                # Anular la novedad
+                novedad.estado = 'anulada'
+                novedad.motivo_anulacion = motivo_anulacion
+                novedad.fecha_anulacion = timezone.now()
+                novedad.save()
+
+                # Reactivar citas que fueron canceladas por esta novedad
+                self._reactivar_citas_canceladas(novedad)
             
             detail_serializer = NovedadDetailSerializer(novedad)
             return Response({
@@ -144,98 +157,23 @@ class NovedadViewSet(viewsets.ModelViewSet):
             horario_base_inicio = Novedad.HORA_ENTRADA_BASE
             horario_base_fin = Novedad.HORA_SALIDA_BASE
 
-            # Lista para almacenar los slots ocupados
-            slots_ocupados = []
-
-            # 2. Obtener novedades activas para esa manicurista en esa fecha
-            novedades = Novedad.objects.filter(
-                manicurista_id=manicurista_id,
-                fecha=fecha,
-                estado__in=['ausente', 'tardanza']
-            )
-            
-            for novedad in novedades:
-                if novedad.estado == 'ausente':
-                    if novedad.tipo_ausencia == 'completa':
-                        # Ausencia completa: ocupa todo el horario base
-                        slots_ocupados.append({
-                            'inicio': horario_base_inicio,
-                            'fin': horario_base_fin,
-                            'motivo': f"Ausencia completa: {novedad.observaciones or 'Sin motivo'}" # Usar observaciones
-                        })
-                    elif novedad.tipo_ausencia == 'por_horas':
-                        # Ausencia por horas
-                        slots_ocupados.append({
-                            'inicio': novedad.hora_inicio_ausencia,
-                            'fin': novedad.hora_fin_ausencia,
-                            'motivo': f"Ausencia por horas: {novedad.observaciones or 'Sin motivo'}" # Usar observaciones
-                        })
-                elif novedad.estado == 'tardanza':
-                    # Tardanza: ocupa desde el inicio del horario base hasta la hora de llegada
-                    slots_ocupados.append({
-                        'inicio': horario_base_inicio,
-                        'fin': novedad.hora_entrada,
-                        'motivo': f"Tardanza: llega a las {novedad.hora_entrada.strftime('%H:%M')}"
-                    })
-            
-            # 3. Obtener citas existentes para esa manicurista en esa fecha
-            citas = Cita.objects.filter(
-                manicurista_id=manicurista_id,
-                fecha_cita=fecha,
-                estado__in=['pendiente', 'en_proceso'] # Citas que ocupan tiempo
-            )
-            
-            for cita in citas:
-                # Usar duracion_total del modelo Cita
-                duracion_cita_minutos = cita.duracion_total
-                
-                cita_inicio_dt = datetime.combine(fecha, cita.hora_cita)
-                cita_fin_dt = cita_inicio_dt + timedelta(minutes=duracion_cita_minutos)
-                
-                slots_ocupados.append({
-                    'inicio': cita_inicio_dt.time(),
-                    'fin': cita_fin_dt.time(),
-                    'motivo': f"Cita agendada con {cita.cliente.nombre if hasattr(cita, 'cliente') else 'Cliente'}"
-                })
+            # 2. Agenda del día con novedades activas y citas (según su duracion_total)
+            agenda = obtener_agenda(manicurista_id, fecha)
 
-            # 4. Generar todos los slots de 30 minutos en el horario base
-            intervalo_minutos = 30
+            # 3. Estado de cada slot de 30 minutos en el horario base
             horarios_disponibles_response = []
-            
-            current_time = datetime.combine(fecha, horario_base_inicio)
-            end_time = datetime.combine(fecha, horario_base_fin)
-
-            while current_time < end_time:
-                slot_inicio = current_time.time()
-                slot_fin = (current_time + timedelta(minutes=intervalo_minutos)).time()
-                
-                is_available = True
-                motivo_ocupado = None
-
-                # Verificar si este slot se solapa con algún slot ocupado
-                for ocupado in slots_ocupados:
-                    ocupado_inicio_dt = datetime.combine(fecha, ocupado['inicio'])
-                    ocupado_fin_dt = datetime.combine(fecha, ocupado['fin'])
-                    
-                    slot_inicio_dt = datetime.combine(fecha, slot_inicio)
-                    slot_fin_dt = datetime.combine(fecha, slot_fin)
-
-                    # Comprobar solapamiento
-                    if (slot_inicio_dt < ocupado_fin_dt and slot_fin_dt > ocupado_inicio_dt):
-                        is_available = False
-                        motivo_ocupado = ocupado['motivo']
-                        break
-                
+            for slot in agenda.slots():
+                slot_fin = slot + agenda.intervalo
+                ocupacion = agenda.motivo_en(slot)
+
                 horarios_disponibles_response.append({
-                    'slot': f"{slot_inicio.strftime('%H:%M')}-{slot_fin.strftime('%H:%M')}",
-                    'inicio': slot_inicio.strftime('%H:%M'),
-                    'fin': slot_fin.strftime('%H:%M'),
-                    'disponible': is_available,
-                    'motivo_ocupado': motivo_ocupado
+                    'slot': f"{formatear_minutos(slot)}-{formatear_minutos(slot_fin)}",
+                    'inicio': formatear_minutos(slot),
+                    'fin': formatear_minutos(slot_fin),
+                    'disponible': ocupacion is None,
+                    'motivo_ocupado': ocupacion.motivo if ocupacion else None
                 })
-                
-                current_time += timedelta(minutes=intervalo_minutos)
-            
+
             return Response({
                 'fecha': fecha_str,
                 'manicurista_id': manicurista_id,
@@ -263,7 +201,7 @@ class NovedadViewSet(viewsets.ModelViewSet):
     def novedades_hoy(self, request):
         """Obtener novedades registradas para el día actual."""
         hoy = timezone.now().date()
-        novedades_hoy = self.get_queryset().filter(fecha=hoy)
+        novedades_hoy = self.get_queryset().filter(fecha__lte=hoy, fecha_fin__gte=hoy)
         serializer = self.get_serializer(novedades_hoy, many=True)
         return Response(serializer.data)
 
@@ -282,115 +220,124 @@ class NovedadViewSet(viewsets.ModelViewSet):
         serializer = ManicuristaSerializer(manicuristas, many=True)
         return Response(serializer.data)
 
-    def _manejar_citas_afectadas(self, novedad):
-        """Manejar citas afectadas por la novedad"""
-        try:
-            # Buscar citas activas para esa manicurista en esa fecha
-            citas_afectadas = Cita.objects.filter(
-                manicurista=novedad.manicurista,
-                fecha_cita=novedad.fecha,
-                estado__in=['pendiente', 'en_proceso'] # Solo citas pendientes o en proceso
-            )
+    def _citas_afectadas(self, novedad):
+        """
+        Citas activas de la manicurista que se cruzan con la novedad, en todos
+        los días de su rango.
 
-            for cita in citas_afectadas:
-                # Verificar si la cita está en el horario afectado
-                if self._cita_en_horario_afectado(cita, novedad):
-                    # Cancelar la cita
-                    cita.estado = 'cancelada_por_novedad'
-                    cita.motivo_cancelacion = f"Novedad de manicurista: {novedad.get_estado_display()} - {novedad.observaciones or 'Sin motivo'}"
-                    cita.novedad_relacionada = novedad
-                    cita.save()
-
-                    # Enviar notificación al cliente
-                    self._notificar_cliente_cancelacion(cita, novedad)
-                    
-        except Exception as e:
-            print(f"Error manejando citas afectadas: {e}")
+        El cruce se resuelve en la consulta: la cita ocupa desde hora_cita
+        durante duracion_total minutos (con el mismo respaldo que usa la
+        agenda) y se compara en minutos del día con el horario de la novedad.
+        """
+        citas = Cita.objects.filter(
+            manicurista_id=novedad.manicurista_id,
+            fecha_cita__range=(novedad.fecha, novedad.fecha_fin),
+            estado__in=['pendiente', 'en_proceso'] # Solo citas pendientes o en proceso
+        )
 
-    def _cita_en_horario_afectado(self, cita, novedad):
-        """Verificar si una cita está en el horario afectado por la novedad"""
-        # Convertir horas a objetos datetime para comparación precisa
-        fecha_cita_dt = datetime.combine(cita.fecha_cita, time(0,0)) # Usar la fecha de la cita para combinar
-        
-        cita_inicio_dt = datetime.combine(fecha_cita_dt, cita.hora_cita)
-        # Usar duracion_total del modelo Cita
-        duracion_cita_minutos = cita.duracion_total
-        cita_fin_dt = cita_inicio_dt + timedelta(minutes=duracion_cita_minutos)
-
-        if novedad.estado == 'ausente':
-            if novedad.tipo_ausencia == 'completa':
-                return True  # Toda la jornada afectada
-            elif novedad.tipo_ausencia == 'por_horas':
-                novedad_inicio_dt = datetime.combine(fecha_cita_dt, novedad.hora_inicio_ausencia)
-                novedad_fin_dt = datetime.combine(fecha_cita_dt, novedad.hora_fin_ausencia)
-                # Comprobar solapamiento: (A_inicio < B_fin) and (A_fin > B_inicio)
-                return (cita_inicio_dt < novedad_fin_dt and cita_fin_dt > novedad_inicio_dt)
-        
-        elif novedad.estado == 'tardanza':
-            novedad_llegada_dt = datetime.combine(fecha_cita_dt, novedad.hora_entrada)
-            # Si la cita se solapa con el periodo de tardanza (es decir, la cita empieza antes de la llegada)
-            return cita_inicio_dt < novedad_llegada_dt
-        
-        return False
+        if novedad.estado == 'ausente' and novedad.tipo_ausencia == 'completa':
+            return citas  # Toda la jornada afectada
 
-    def _reactivar_citas_canceladas(self, novedad):
-        """Reactivar citas que fueron canceladas por esta novedad"""
-        try:
-            citas_canceladas = Cita.objects.filter(
-                novedad_relacionada=novedad,
-                estado='cancelada_por_novedad'
+        if novedad.estado == 'ausente' and novedad.tipo_ausencia == 'por_horas':
+            inicio_cita = ExtractHour('hora_cita') * 60 + ExtractMinute('hora_cita')
+            duracion = Coalesce(
+                NullIf('duracion_total', 0), NullIf('duracion_estimada', 0), Value(INTERVALO_MINUTOS)
+            )
+            # Comprobar solapamiento: (A_inicio < B_fin) and (A_fin > B_inicio)
+            return citas.alias(inicio_min=inicio_cita, fin_min=inicio_cita + duracion).filter(
+                inicio_min__lt=minutos(novedad.hora_fin_ausencia),
+                fin_min__gt=minutos(novedad.hora_inicio_ausencia)
             )
-            
-            for cita in citas_canceladas:
-                cita.estado = 'pendiente' # O el estado original que tenía antes de la cancelación
-                cita.motivo_cancelacion = None
-                cita.novedad_relacionada = None
-                cita.save()
-                
-                # Notificar al cliente que su cita fue reactivada
-                self._notificar_cliente_reactivacion(cita)
-                
-        except Exception as e:
-            print(f"Error reactivando citas: {e}")
 
-    def _notificar_cliente_cancelacion(self, cita, novedad):
-        """Notificar al cliente sobre la cancelación de su cita"""
-        try:
-            # Asegúrate de que cita.cliente y cita.cliente.email existan
-            if hasattr(cita, 'cliente') and cita.cliente and hasattr(cita.cliente, 'email') and cita.cliente.email:
-                send_mail(
-                    subject='Cancelación de tu cita en Spa',
-                    message=f"Hola {cita.cliente.nombre},\n\n"
-                            f"Lamentamos informarte que tu cita con {novedad.manicurista.nombre} " # Usar .nombre
-                            f"el {novedad.fecha.strftime('%d/%m/%Y')} a las {cita.hora_cita.strftime('%H:%M')} "
-                            f"ha sido cancelada debido a una novedad de la manicurista.\n\n"
-                            f"Motivo: {novedad.get_estado_display()} - {novedad.observaciones or 'Sin motivo'}\n\n"
-                            f"Te invitamos a agendar una nueva cita desde nuestra plataforma.\n\n"
-                            f"Gracias por tu comprensión.",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[cita.cliente.email],
-                    fail_silently=True
+        if novedad.estado == 'tardanza':
+            # La cita se solapa con la tardanza si empieza antes de la llegada
+            return citas.filter(hora_cita__lt=novedad.hora_entrada)
+
+        return citas.none()
+
+    def _manejar_citas_afectadas(self, novedad):
+        """
+        Cancelar las citas afectadas por la novedad.
+
+        Se leen las citas (con cliente y manicurista para los correos), se
+        cancelan con un solo UPDATE y las notificaciones se encolan juntas, así
+        el número de consultas no depende de cuántas citas se cancelen.
+
+        Los errores se propagan para que la transacción de quien llama (crear
+        o editar la novedad) se revierta completa.
+        """
+        with transaction.atomic():
+            citas = list(self._citas_afectadas(novedad).select_related('cliente', 'manicurista'))
+            if citas:
+                Cita.objects.filter(
+                    pk__in=[cita.pk for cita in citas],
+                    estado__in=['pendiente', 'en_proceso']
+                ).update(
+                    estado='cancelada_por_novedad',
+                    motivo_cancelacion=f"Novedad de manicurista: {novedad.get_estado_display()} - {novedad.observaciones or 'Sin motivo'}",
+                    novedad_relacionada=novedad,
+                    updated_at=timezone.now()
+                )
+                encolar_correos(
+                    self._correo_cancelacion(cita, novedad) for cita in citas
+                    if cita.cliente.correo_electronico
                 )
-        except Exception as e:
-            print(f"Error enviando notificación de cancelación: {e}")
 
-    def _notificar_cliente_reactivacion(self, cita):
-        """Notificar al cliente que su cita fue reactivada"""
-        try:
-            # Asegúrate de que cita.cliente y cita.cliente.email existan
-            if hasattr(cita, 'cliente') and cita.cliente and hasattr(cita.cliente, 'email') and cita.cliente.email:
-                send_mail(
-                    subject='Tu cita ha sido reactivada',
-                    message=f"Hola {cita.cliente.nombre},\n\n"
-                            f"Te informamos que tu cita con {cita.manicurista.nombre} " # Usar .nombre
-                            f"el {cita.fecha_cita.strftime('%d/%m/%Y')} a las {cita.hora_cita.strftime('%H:%M')} "
-                            f"ha sido reactivada.\n\n"
-                            f"La novedad que causó la cancelación ha sido anulada.\n\n"
-                            f"Tu cita está confirmada nuevamente.\n\n"
-                            f"¡Te esperamos!",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[cita.cliente.email],
-                    fail_silently=True
+        # update() no dispara señales: la agenda de los días se invalida aquí,
+        # y también cuando no hay citas afectadas porque la novedad la cambia
+        invalidar_agendas(novedad.manicurista_id, novedad.fecha, novedad.fecha_fin)
+        return len(citas)
+
+    def _reactivar_citas_canceladas(self, novedad):
+        """Reactivar las citas que fueron canceladas por esta novedad"""
+        with transaction.atomic():
+            citas = list(
+                Cita.objects.filter(
+                    novedad_relacionada=novedad,
+                    estado='cancelada_por_novedad'
+                ).select_related('cliente', 'manicurista')
+            )
+            if citas:
+                Cita.objects.filter(pk__in=[cita.pk for cita in citas]).update(
+                    estado='pendiente', # O el estado original que tenía antes de la cancelación
+                    motivo_cancelacion=None,
+                    novedad_relacionada=None,
+                    updated_at=timezone.now()
                 )
-        except Exception as e:
-            print(f"Error enviando notificación de reactivación: {e}")
+                # Notificar a los clientes que sus citas fueron reactivadas
+                encolar_correos(
+                    self._correo_reactivacion(cita) for cita in citas
+                    if cita.cliente.correo_electronico
+                )
+
+        for manicurista_id, fecha in {(cita.manicurista_id, cita.fecha_cita) for cita in citas}:
+            invalidar_agenda(manicurista_id, fecha)
+        return len(citas)
+
+    def _correo_cancelacion(self, cita, novedad):
+        """Correo al cliente sobre la cancelación de su cita"""
+        return {
+            'destinatarios': [cita.cliente.correo_electronico],
+            'asunto': 'Cancelación de tu cita en Spa',
+            'mensaje': f"Hola {cita.cliente.nombre},\n\n"
+                       f"Lamentamos informarte que tu cita con {cita.manicurista.nombre} "
+                       f"el {cita.fecha_cita.strftime('%d/%m/%Y')} a las {cita.hora_cita.strftime('%H:%M')} "
+                       f"ha sido cancelada debido a una novedad de la manicurista.\n\n"
+                       f"Motivo: {novedad.get_estado_display()} - {novedad.observaciones or 'Sin motivo'}\n\n"
+                       f"Te invitamos a agendar una nueva cita desde nuestra plataforma.\n\n"
+                       f"Gracias por tu comprensión.",
+        }
+
+    def _correo_reactivacion(self, cita):
+        """Correo al cliente avisando que su cita fue reactivada"""
+        return {
+            'destinatarios': [cita.cliente.correo_electronico],
+            'asunto': 'Tu cita ha sido reactivada',
+            'mensaje': f"Hola {cita.cliente.nombre},\n\n"
+                       f"Te informamos que tu cita con {cita.manicurista.nombre} "
+                       f"el {cita.fecha_cita.strftime('%d/%m/%Y')} a las {cita.hora_cita.strftime('%H:%M')} "
+                       f"ha sido reactivada.\n\n"
+                       f"La novedad que causó la cancelación ha sido anulada.\n\n"
+                       f"Tu cita está confirmada nuevamente.\n\n"
+                       f"¡Te esperamos!",
+        }
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class RolesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api.roles'
-    verbose_name = 'Roles'
\ No newline at end of file
+    verbose_name = 'Roles'
+
+    def ready(self):
+        from . import checks  # noqa: F401
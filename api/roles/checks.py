@@ -0,0 +1,32 @@
+"""
+Verificaciones de configuración de los permisos por rol.
+
+La versión de permisos cacheada decide si un token se acepta
+(JWTRolAuthentication). Con una cache por proceso, la invalidación solo llega
+al worker que hizo el cambio: los demás siguen aceptando tokens viejos y
+rechazan con 401 los recién renovados. Por eso se exige una cache compartida.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, Tags.security)
+def cache_compartida(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in CACHES_POR_PROCESO:
+        return []
+    return [
+        Error(
+            'Los permisos por rol necesitan una cache compartida entre procesos.',
+            hint='Configure CACHES["default"] con Redis (REDIS_URL). Las pruebas '
+                 'silencian esta verificación en winespa/settings_test.py.',
+            obj=backend,
+            id='roles.E001',
+        )
+    ]
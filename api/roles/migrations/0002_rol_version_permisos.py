@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rol',
+            name='version_permisos',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
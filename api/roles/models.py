@@ -27,6 +27,8 @@ class Rol(BaseModel):
     nombre = models.CharField(max_length=50, unique=True)
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='activo')
     permisos = models.ManyToManyField(Permiso, through='RolHasPermiso')
+    # Aumenta cada vez que cambian los permisos del rol; viaja en el token como rol_version
+    version_permisos = models.PositiveIntegerField(default=1)
     
     def __str__(self):
         return self.nombre
@@ -42,4 +44,47 @@ class RolHasPermiso(BaseModel):
     class Meta:
         unique_together = ('rol', 'permiso')
         verbose_name = "Rol - Permiso"
-        verbose_name_plural = "Roles - Permisos"
\ No newline at end of file
+        verbose_name_plural = "Roles - Permisos"
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from api.roles.permisos import invalidar_permisos_rol, invalidar_nombres_permisos
+
+
+@receiver(post_save, sender=RolHasPermiso)
+@receiver(post_delete, sender=RolHasPermiso)
+def invalidar_permisos_por_asignacion(sender, instance, **kwargs):
+    """Asignar o quitar un permiso cambia el conjunto del rol"""
+    invalidar_permisos_rol(instance.rol_id)
+
+
+@receiver(m2m_changed, sender=Rol.permisos.through)
+def invalidar_permisos_por_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    """`rol.permisos.set()` (RolSerializer) escribe la tabla intermedia sin post_save"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidar_permisos_rol(instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        for rol_id in pk_set:
+            invalidar_permisos_rol(rol_id)
+    elif action == 'pre_clear':
+        # Después del clear ya no se sabe qué roles tenían el permiso
+        for rol_id in RolHasPermiso.objects.filter(permiso=instance).values_list('rol_id', flat=True):
+            invalidar_permisos_rol(rol_id)
+
+
+@receiver(post_save, sender=Rol)
+@receiver(post_delete, sender=Rol)
+def invalidar_permisos_por_rol(sender, instance, created=False, **kwargs):
+    """El estado y el nombre del rol (administrador) afectan sus permisos"""
+    if not created:
+        invalidar_permisos_rol(instance.pk)
+
+
+@receiver(post_save, sender=Permiso)
+@receiver(post_delete, sender=Permiso)
+def invalidar_permisos_por_permiso(sender, instance, **kwargs):
+    """Activar, desactivar o renombrar un permiso afecta a todos los roles que lo tienen"""
+    invalidar_nombres_permisos()
+    for rol_id in RolHasPermiso.objects.filter(permiso_id=instance.pk).values_list('rol_id', flat=True):
+        invalidar_permisos_rol(rol_id)
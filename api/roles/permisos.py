@@ -0,0 +1,126 @@
+"""
+Permisos por rol cacheados como un conjunto de bits.
+
+Cada permiso activo ocupa el bit de su id, así el conjunto de un rol es un
+entero y verificar un permiso es una operación de bits. El conjunto de cada
+rol y el mapa nombre -> id se guardan en la cache configurada; las señales de
+RolHasPermiso, Rol y Permiso los invalidan y aumentan `Rol.version_permisos`.
+La cache debe ser compartida por todos los procesos (ver checks.py): un token
+renovado en un worker se compara con la versión que ve cualquier otro.
+
+Las vistas declaran el permiso que exigen y usan `TienePermiso`:
+
+    class InsumoViewSet(viewsets.ModelViewSet):
+        permission_classes = [TienePermiso]
+        permiso_requerido = 'insumos'
+        permisos_por_accion = {'ajustar_stock': 'inventario'}
+
+El rol sale del token (claim rol_id), de modo que una petición autorizada no
+consulta la base de datos mientras la cache esté caliente.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework.permissions import BasePermission
+
+from .models import Permiso, Rol, RolHasPermiso
+
+
+PREFIJO_CACHE = 'permisos'
+# El rol administrador tiene todos los permisos: -1 tiene todos los bits en 1
+TODOS_LOS_PERMISOS = -1
+ROL_ADMINISTRADOR = 'administrador'
+
+
+def _timeout():
+    # Con expiración, una carrera entre invalidar y recalcular no deja datos viejos para siempre
+    return getattr(settings, 'CACHE_TTL', 60 * 15)
+
+
+def _clave_rol(rol_id):
+    return f'{PREFIJO_CACHE}:rol:{rol_id}'
+
+
+def _clave_nombres():
+    return f'{PREFIJO_CACHE}:nombres'
+
+
+def calcular_permisos_rol(rol_id):
+    """Versión y conjunto de bits de un rol leídos de la base de datos"""
+    rol = Rol.objects.filter(pk=rol_id).values('nombre', 'estado', 'version_permisos').first()
+    if not rol or rol['estado'] != 'activo':
+        return {'version': rol['version_permisos'] if rol else 0, 'bits': 0}
+    if rol['nombre'].lower() == ROL_ADMINISTRADOR:
+        return {'version': rol['version_permisos'], 'bits': TODOS_LOS_PERMISOS}
+
+    bits = 0
+    for permiso_id in RolHasPermiso.objects.filter(
+        rol_id=rol_id, permiso__estado='activo'
+    ).values_list('permiso_id', flat=True):
+        bits |= 1 << permiso_id
+    return {'version': rol['version_permisos'], 'bits': bits}
+
+
+def permisos_rol(rol_id):
+    """Conjunto de permisos del rol desde la cache (se calcula si no está)"""
+    permisos = cache.get(_clave_rol(rol_id))
+    if permisos is None:
+        permisos = calcular_permisos_rol(rol_id)
+        cache.set(_clave_rol(rol_id), permisos, _timeout())
+    return permisos
+
+
+def ids_permisos():
+    """Mapa nombre -> id de los permisos, desde la cache"""
+    nombres = cache.get(_clave_nombres())
+    if nombres is None:
+        nombres = {nombre.lower(): permiso_id for permiso_id, nombre in Permiso.objects.values_list('id', 'nombre')}
+        cache.set(_clave_nombres(), nombres, _timeout())
+    return nombres
+
+
+def rol_tiene_permiso(rol_id, nombre_permiso):
+    if rol_id is None:
+        return False
+    bits = permisos_rol(rol_id)['bits']
+    if bits == TODOS_LOS_PERMISOS:
+        return True
+    permiso_id = ids_permisos().get(nombre_permiso.lower())
+    return permiso_id is not None and bool(bits & (1 << permiso_id))
+
+
+def version_permisos(rol_id):
+    return permisos_rol(rol_id)['version'] if rol_id else None
+
+
+def invalidar_permisos_rol(rol_id):
+    """Aumentar la versión del rol y descartar su conjunto cacheado"""
+    if rol_id is None:
+        return
+    Rol.objects.filter(pk=rol_id).update(version_permisos=F('version_permisos') + 1)
+    # Al confirmar: antes, otra petición podría cachear la versión vieja hasta el TTL
+    transaction.on_commit(lambda: cache.delete(_clave_rol(rol_id)))
+
+
+def invalidar_nombres_permisos():
+    transaction.on_commit(lambda: cache.delete(_clave_nombres()))
+
+
+class TienePermiso(BasePermission):
+    """
+    Permite la petición si el rol del token tiene el permiso que declara la
+    vista (`permisos_por_accion[action]` o `permiso_requerido`). Las vistas
+    que no declaran permiso solo exigen un usuario autenticado.
+    """
+    message = 'No tiene permiso para realizar esta acción.'
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+
+        requerido = getattr(view, 'permisos_por_accion', {}).get(getattr(view, 'action', None))
+        requerido = requerido or getattr(view, 'permiso_requerido', None)
+        if not requerido:
+            return True
+        return rol_tiene_permiso(getattr(request.user, 'rol_id', None), requerido)
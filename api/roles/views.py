@@ -5,6 +5,7 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.apps import apps
 from .models import Rol, Permiso, RolHasPermiso
+from .permisos import TienePermiso
 from .serializers import (
     RolSerializer,
     RolDetailSerializer,
@@ -19,6 +20,8 @@ class RolViewSet(viewsets.ModelViewSet):
     Proporciona operaciones CRUD completas y algunos endpoints adicionales.
     """
     queryset = Rol.objects.all()
+    permission_classes = [TienePermiso]
+    permiso_requerido = 'roles'
 
     def get_serializer_class(self):
         """
@@ -218,6 +221,8 @@ class PermisoViewSet(viewsets.ModelViewSet):
     Proporciona operaciones CRUD completas.
     """
     queryset = Permiso.objects.all()
+    permission_classes = [TienePermiso]
+    permiso_requerido = 'roles'
     serializer_class = PermisoSerializer
 
 
@@ -228,6 +233,8 @@ class RolHasPermisoViewSet(viewsets.ModelViewSet):
     """
     queryset = RolHasPermiso.objects.all()
     serializer_class = RolHasPermisoSerializer
+    permission_classes = [TienePermiso]
+    permiso_requerido = 'roles'
 
     @action(detail=False, methods=['get'])
     def by_rol(self, request):
@@ -0,0 +1,189 @@
+"""
+Imágenes de los servicios.
+
+Al crear o editar un servicio la imagen se guarda en MEDIA_ROOT, se generan
+miniaturas WebP de tamaño fijo y `Servicio.imagen` queda apuntando a la copia
+local, así la petición no espera al host remoto. Si hay IMGBB_API_KEY el
+servicio queda 'pendiente' y el comando
+
+    python manage.py subir_imagenes_servicios --continuo
+
+sube las imágenes con una sesión HTTP reutilizada y reemplaza la URL por la
+remota. IMGBB_UPLOAD_URL permite apuntar a otro host (por ejemplo uno falso
+en las pruebas).
+"""
+import base64
+import posixpath
+from io import BytesIO
+
+import requests
+from PIL import Image, UnidentifiedImageError
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .models import Servicio
+
+
+# Lado máximo en píxeles de cada miniatura (se conserva la proporción)
+TAMANOS_MINIATURA = {
+    'pequena': 150,
+    'mediana': 400,
+}
+CARPETA_MINIATURAS = 'servicios/miniaturas'
+CALIDAD_WEBP = 80
+MAX_INTENTOS = 5
+
+
+def validar_imagen(archivo):
+    """Comprobar que el archivo es una imagen que Pillow puede leer"""
+    try:
+        with Image.open(archivo) as imagen:
+            imagen.verify()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+        raise ValueError('El archivo enviado no es una imagen válida')
+    finally:
+        archivo.seek(0)
+
+
+def ruta_miniatura(nombre_archivo, tamano):
+    base = posixpath.splitext(posixpath.basename(nombre_archivo))[0]
+    return f'{CARPETA_MINIATURAS}/{base}_{tamano}.webp'
+
+
+def generar_miniaturas(nombre_archivo):
+    """Crear las miniaturas WebP de una imagen ya guardada en el storage"""
+    with default_storage.open(nombre_archivo, 'rb') as archivo, Image.open(archivo) as original:
+        original.load()
+        modo = 'RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB'
+        original = original.convert(modo)
+
+        for tamano, lado in TAMANOS_MINIATURA.items():
+            miniatura = original.copy()
+            miniatura.thumbnail((lado, lado))
+            contenido = BytesIO()
+            miniatura.save(contenido, 'WEBP', quality=CALIDAD_WEBP)
+
+            ruta = ruta_miniatura(nombre_archivo, tamano)
+            if default_storage.exists(ruta):
+                default_storage.delete(ruta)
+            default_storage.save(ruta, ContentFile(contenido.getvalue()))
+
+
+def eliminar_imagen_local(nombre_archivo):
+    """Borrar una imagen local y sus miniaturas"""
+    if not nombre_archivo:
+        return
+    for ruta in [nombre_archivo] + [ruta_miniatura(nombre_archivo, t) for t in TAMANOS_MINIATURA]:
+        try:
+            default_storage.delete(ruta)
+        except OSError as e:
+            print(f"Error borrando imagen {ruta}: {e}")
+
+
+def guardar_imagen(servicio, archivo, request=None):
+    """
+    Guardar la imagen de un servicio en MEDIA_ROOT con sus miniaturas y dejar
+    `servicio.imagen` apuntando a la copia local.
+
+    La imagen anterior (si había) se borra. No hace llamadas al host remoto.
+    """
+    anterior = servicio.imagen_archivo.name if servicio.imagen_archivo else None
+
+    servicio.imagen_archivo.save(archivo.name, archivo, save=False)
+    generar_miniaturas(servicio.imagen_archivo.name)
+
+    url = servicio.imagen_archivo.url
+    servicio.imagen = request.build_absolute_uri(url) if request else url
+    servicio.imagen_estado = Servicio.IMAGEN_PENDIENTE if settings.IMGBB_API_KEY else Servicio.IMAGEN_LOCAL
+    servicio.imagen_intentos = 0
+    servicio.save(update_fields=['imagen', 'imagen_archivo', 'imagen_estado', 'imagen_intentos', 'updated_at'])
+
+    if anterior and anterior != servicio.imagen_archivo.name:
+        eliminar_imagen_local(anterior)
+    return servicio
+
+
+def urls_miniaturas(servicio, request=None):
+    """URLs de las miniaturas del servicio ({} si no tiene imagen local)"""
+    if not servicio.imagen_archivo:
+        return {}
+    urls = {}
+    for tamano in TAMANOS_MINIATURA:
+        url = default_storage.url(ruta_miniatura(servicio.imagen_archivo.name, tamano))
+        urls[tamano] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def crear_sesion():
+    """
+    Sesión HTTP para el host de imágenes: mantiene las conexiones abiertas
+    entre subidas y reintenta los errores transitorios del servidor.
+    """
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=4,
+        max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=['POST'])
+    )
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    return sesion
+
+
+def subir_imagen(servicio, sesion):
+    """Subir la imagen local al host remoto y retornar su URL"""
+    with servicio.imagen_archivo.open('rb') as archivo:
+        contenido = base64.b64encode(archivo.read()).decode('utf-8')
+
+    response = sesion.post(
+        settings.IMGBB_UPLOAD_URL,
+        data={
+            'key': settings.IMGBB_API_KEY,
+            'image': contenido,
+            'name': posixpath.basename(servicio.imagen_archivo.name),
+        },
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()['data']['url']
+
+
+def subir_pendientes(lote=20, sesion=None, max_intentos=MAX_INTENTOS):
+    """
+    Subir un lote de imágenes pendientes por la misma sesión.
+
+    Retorna (subidas, fallidas). Una imagen que falla se reintenta en la
+    siguiente pasada hasta `max_intentos`; después queda 'fallida' y el
+    servicio sigue usando la copia local.
+    """
+    servicios = list(
+        Servicio.objects.filter(imagen_estado=Servicio.IMAGEN_PENDIENTE).order_by('updated_at', 'id')[:lote]
+    )
+    if not servicios:
+        return 0, 0
+
+    sesion = sesion or crear_sesion()
+    subidas = fallidas = 0
+    for servicio in servicios:
+        # Si la imagen se reemplazó mientras se subía, no pisar la nueva
+        misma_imagen = Servicio.objects.filter(
+            pk=servicio.pk, imagen_archivo=servicio.imagen_archivo.name, imagen_estado=Servicio.IMAGEN_PENDIENTE
+        )
+        try:
+            url = subir_imagen(servicio, sesion)
+        except (requests.RequestException, KeyError, ValueError, OSError) as e:
+            fallidas += 1
+            intentos = servicio.imagen_intentos + 1
+            misma_imagen.update(
+                imagen_intentos=intentos,
+                imagen_estado=Servicio.IMAGEN_FALLIDA if intentos >= max_intentos else Servicio.IMAGEN_PENDIENTE
+            )
+            print(f"Error subiendo imagen del servicio {servicio.id} (intento {intentos}): {e}")
+        else:
+            subidas += 1
+            misma_imagen.update(imagen=url, imagen_estado=Servicio.IMAGEN_SUBIDA)
+
+    return subidas, fallidas
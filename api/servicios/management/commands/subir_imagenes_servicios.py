@@ -0,0 +1,54 @@
+"""
+Subir al host remoto (ImgBB) las imágenes de servicios guardadas localmente.
+
+Uso:
+
+    python manage.py subir_imagenes_servicios                 # sube lo pendiente y termina
+    python manage.py subir_imagenes_servicios --continuo      # worker: revisa cada --intervalo segundos
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.servicios.imagenes import MAX_INTENTOS, crear_sesion, subir_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Sube las imágenes pendientes de los servicios reutilizando una sesión HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20, help='Imágenes por lote')
+        parser.add_argument('--max-intentos', type=int, default=MAX_INTENTOS,
+                            help='Intentos antes de marcar una imagen como fallida')
+        parser.add_argument('--continuo', action='store_true', help='Seguir revisando indefinidamente')
+        parser.add_argument('--intervalo', type=float, default=10, help='Segundos entre revisiones en modo continuo')
+
+    def handle(self, *args, **options):
+        if not settings.IMGBB_API_KEY:
+            self.stdout.write(self.style.WARNING('IMGBB_API_KEY no está configurada: las imágenes quedan locales'))
+            return
+
+        # Una sola sesión para todo el proceso: las conexiones al host se reutilizan
+        sesion = crear_sesion()
+        total_subidas = total_fallidas = 0
+
+        try:
+            while True:
+                subidas, fallidas = subir_pendientes(options['lote'], sesion, options['max_intentos'])
+                total_subidas += subidas
+                total_fallidas += fallidas
+                if subidas or fallidas:
+                    self.stdout.write(f'Lote: {subidas} subidas, {fallidas} con error')
+
+                if subidas + fallidas >= options['lote']:
+                    continue
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        finally:
+            sesion.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imágenes subidas: {total_subidas}, con error: {total_fallidas}'
+        ))
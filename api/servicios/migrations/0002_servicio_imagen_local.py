@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicio',
+            name='imagen_archivo',
+            field=models.ImageField(blank=True, null=True, upload_to='servicios/', verbose_name='Archivo de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='imagen_estado',
+            field=models.CharField(blank=True, choices=[('local', 'Solo local'), ('pendiente', 'Pendiente de subir'), ('subida', 'Subida'), ('fallida', 'Error al subir')], max_length=10, null=True, verbose_name='Estado de la imagen'),
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='imagen_intentos',
+            field=models.PositiveIntegerField(default=0, verbose_name='Intentos de subida de la imagen'),
+        ),
+    ]
@@ -41,6 +41,17 @@ class Servicio(BaseModel):
         verbose_name="Estado"
     )
 
+    IMAGEN_LOCAL = 'local'
+    IMAGEN_PENDIENTE = 'pendiente'
+    IMAGEN_SUBIDA = 'subida'
+    IMAGEN_FALLIDA = 'fallida'
+    IMAGEN_ESTADO_CHOICES = [
+        (IMAGEN_LOCAL, 'Solo local'),
+        (IMAGEN_PENDIENTE, 'Pendiente de subir'),
+        (IMAGEN_SUBIDA, 'Subida'),
+        (IMAGEN_FALLIDA, 'Error al subir'),
+    ]
+
     imagen = models.URLField(
         max_length=500,
         blank=True,
@@ -49,6 +60,28 @@ class Servicio(BaseModel):
         validators=[URLValidator()]
     )
 
+    # Copia local de la imagen subida (con sus miniaturas WebP). `imagen`
+    # apunta a esta copia hasta que el worker la sube al host remoto.
+    imagen_archivo = models.ImageField(
+        upload_to='servicios/',
+        blank=True,
+        null=True,
+        verbose_name="Archivo de la imagen"
+    )
+
+    imagen_estado = models.CharField(
+        max_length=10,
+        choices=IMAGEN_ESTADO_CHOICES,
+        blank=True,
+        null=True,
+        verbose_name="Estado de la imagen"
+    )
+
+    imagen_intentos = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Intentos de subida de la imagen"
+    )
+
     class Meta:
         verbose_name = "Servicio"
         verbose_name_plural = "Servicios"
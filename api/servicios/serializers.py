@@ -6,10 +6,16 @@ from .models import Servicio
 class ServicioSerializer(serializers.ModelSerializer):
     precio = serializers.CharField()  # Fuerza DRF a aceptarlo como string y luego validarlo
     duracion_formateada = serializers.ReadOnlyField()  # Campo calculado para mostrar duración formateada
+    miniaturas = serializers.SerializerMethodField()  # URLs de las miniaturas WebP locales
 
     class Meta:
         model = Servicio
         fields = '__all__'
+        read_only_fields = ['imagen_archivo', 'imagen_estado', 'imagen_intentos']
+
+    def get_miniaturas(self, obj):
+        from .imagenes import urls_miniaturas
+        return urls_miniaturas(obj, self.context.get('request'))
 
     def validate_nombre(self, value):
         value = value.strip()
@@ -5,15 +5,13 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from django.db.models import Q, Avg, Count
 from .models import Servicio
 from .serializers import ServicioSerializer
-import requests
-import base64
-
-IMGBB_API_KEY = 'a41bb72c7c09866b8a25df476e47c137'
+from .imagenes import guardar_imagen, validar_imagen
 
 class ServicioViewSet(viewsets.ModelViewSet):
     queryset = Servicio.objects.all()
     serializer_class = ServicioSerializer
     parser_classes = (MultiPartParser, FormParser)
+    pagination_class = None  # Catálogo pequeño: se lista completo
 
     def get_queryset(self):
         queryset = Servicio.objects.all()
@@ -65,96 +63,51 @@ class ServicioViewSet(viewsets.ModelViewSet):
 
         return queryset
 
-    def create(self, request, *args, **kwargs):
+    def _separar_imagen(self, request):
+        """
+        Sacar el archivo de imagen de los datos y validarlo con Pillow.
+        Retorna (data, archivo); el archivo se guarda después de validar el servicio.
+        """
         data = request.data.copy()
-
-        # Manejo de imagen
         image_file = request.FILES.get("imagen")
         if image_file:
-            try:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-
-                response = requests.post(
-                    "https://api.imgbb.com/1/upload",
-                    data={
-                        "key": IMGBB_API_KEY,
-                        "image": image_data,
-                        "name": image_file.name,
-                    },
-                    timeout=30  # Timeout para evitar cuelgues
-                )
-
-                if response.status_code == 200:
-                    image_url = response.json()["data"]["url"]
-                    data["imagen"] = image_url
-                else:
-                    return Response(
-                        {"error": "Error al subir imagen a ImgBB", "details": response.text},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
-            except requests.RequestException as e:
-                return Response(
-                    {"error": "Error de conexión al subir imagen", "details": str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
-            except Exception as e:
-                return Response(
-                    {"error": "Error inesperado al procesar imagen", "details": str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
+            data.pop("imagen", None)
+            validar_imagen(image_file)
+        return data, image_file
+
+    def create(self, request, *args, **kwargs):
+        try:
+            data, image_file = self._separar_imagen(request)
+        except ValueError as e:
+            return Response({"imagen": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
 
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # La imagen queda local; el comando subir_imagenes_servicios la sube al host remoto
+        if image_file:
+            guardar_imagen(serializer.instance, image_file, request)
+
+        return Response(self.get_serializer(serializer.instance).data, status=status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         """Manejo de PUT o PATCH con soporte para nueva imagen"""
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
-        data = request.data.copy()
-
-        # Manejo de imagen (solo si se envía una nueva)
-        image_file = request.FILES.get("imagen")
-        if image_file:
-            try:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-
-                response = requests.post(
-                    "https://api.imgbb.com/1/upload",
-                    data={
-                        "key": IMGBB_API_KEY,
-                        "image": image_data,
-                        "name": image_file.name,
-                    },
-                    timeout=30
-                )
-
-                if response.status_code == 200:
-                    image_url = response.json()["data"]["url"]
-                    data["imagen"] = image_url
-                else:
-                    return Response(
-                        {"error": "Error al subir imagen a ImgBB", "details": response.text},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    )
-            except requests.RequestException as e:
-                return Response(
-                    {"error": "Error de conexión al subir imagen", "details": str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
-            except Exception as e:
-                return Response(
-                    {"error": "Error inesperado al procesar imagen", "details": str(e)},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                )
+        try:
+            data, image_file = self._separar_imagen(request)
+        except ValueError as e:
+            return Response({"imagen": [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = self.get_serializer(instance, data=data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
 
-        return Response(serializer.data)
+        if image_file:
+            guardar_imagen(serializer.instance, image_file, request)
+
+        return Response(self.get_serializer(serializer.instance).data)
 
     @action(detail=False, methods=['get'])
     def activos(self, request):
@@ -227,26 +180,29 @@ class ServicioViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def top_vendidos(self, request):
-        """Obtener servicios más vendidos"""
-        try:
-            from ventaservicios.models import VentaServicio
-            from django.db.models import Case, When, IntegerField
-
-            limit = int(request.query_params.get('limit', 5))
-
-            servicios_ids = VentaServicio.objects.values('servicio') \
-                .annotate(total=Count('servicio')) \
-                .order_by('-total')[:limit] \
-                .values_list('servicio', flat=True)
-
-            order = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(servicios_ids)],
-                         output_field=IntegerField())
+        """Obtener servicios más vendidos (desde el resumen diario de ventas)"""
+        from api.ventaservicios.models import VentaDiaria
+        from django.db.models import Case, When, IntegerField, Sum
+
+        limit = int(request.query_params.get('limit', 5))
+
+        servicios_ids = list(
+            VentaDiaria.objects.filter(servicio__isnull=False)
+            .exclude(estado='cancelada')
+            .values('servicio')
+            .annotate(total=Sum('cantidad_servicios'))
+            .order_by('-total')
+            .values_list('servicio', flat=True)[:limit]
+        )
 
-            servicios = Servicio.objects.filter(pk__in=servicios_ids).order_by(order)
-            serializer = self.get_serializer(servicios, many=True)
-            return Response(serializer.data)
-        except ImportError:
-            # Si no existe el modelo VentaServicio, retornar servicios activos
-            servicios = Servicio.objects.filter(estado='activo')[:5]
+        if not servicios_ids:
+            servicios = Servicio.objects.filter(estado='activo')[:limit]
             serializer = self.get_serializer(servicios, many=True)
             return Response(serializer.data)
+
+        order = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(servicios_ids)],
+                     output_field=IntegerField())
+
+        servicios = Servicio.objects.filter(pk__in=servicios_ids).order_by(order)
+        serializer = self.get_serializer(servicios, many=True)
+        return Response(serializer.data)
@@ -1,6 +1,12 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.core.exceptions import ValidationError
+from rest_framework.test import APIClient
 from api.abastecimientos.models import Abastecimiento
+from api.categoriainsumos.models import CategoriaInsumo
+from api.insumos.models import Insumo, MovimientoInventario
+from api.insumoshasabastecimientos.models import InsumoHasAbastecimiento
 from api.manicuristas.models import Manicurista
 from datetime import date
 
@@ -38,3 +44,101 @@ class AbastecimientoTestCase(TestCase):
         abastecimiento = Abastecimiento.objects.create(**self.data_valida)
         esperado = f"Abastecimiento {abastecimiento.id} - {self.manicurista} ({abastecimiento.fecha})"
         self.assertEqual(str(abastecimiento), esperado)
+
+
+class StockAbastecimientoTestCase(TestCase):
+
+    def setUp(self):
+        self.client_api = APIClient()
+        categoria = CategoriaInsumo.objects.create(nombre='Esmaltes')
+        self.esmalte = Insumo.objects.create(nombre='Esmalte rojo', cantidad=10, categoria_insumo=categoria)
+        self.lima = Insumo.objects.create(nombre='Lima', cantidad=5, categoria_insumo=categoria)
+        self.algodon = Insumo.objects.create(nombre='Algodón', cantidad=8, categoria_insumo=categoria)
+        self.manicurista = Manicurista.objects.create(nombre='Ana Perez', correo='ana@prueba.com')
+
+    def _entregar(self, **cantidades):
+        return self.client_api.post('/api/abastecimientos/', {
+            'fecha': date.today().isoformat(), 'cantidad': 1, 'manicurista': self.manicurista.id,
+            'insumos': self._lineas(cantidades),
+        }, format='json')
+
+    def _lineas(self, cantidades):
+        return [{'insumo': getattr(self, nombre).id, 'cantidad': cantidad} for nombre, cantidad in cantidades.items()]
+
+    def _stock(self):
+        return dict(Insumo.objects.values_list('nombre', 'cantidad'))
+
+    def test_entrega_descuenta_el_stock(self):
+        response = self._entregar(esmalte=3, lima=2)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._stock(), {'Esmalte rojo': 7, 'Lima': 3, 'Algodón': 8})
+        self.assertEqual(
+            set(MovimientoInventario.objects.filter(tipo='abastecimiento').values_list('documento_id', 'cantidad')),
+            {(response.data['id'], -3), (response.data['id'], -2)}
+        )
+
+    def test_sin_stock_no_crea_nada(self):
+        response = self._entregar(esmalte=3, lima=6)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Lima', str(response.data['insumos']))
+        self.assertFalse(Abastecimiento.objects.exists())
+        self.assertEqual(self._stock(), {'Esmalte rojo': 10, 'Lima': 5, 'Algodón': 8})
+
+    def test_editar_solo_toca_las_lineas_que_cambian(self):
+        abastecimiento_id = self._entregar(esmalte=3, lima=2).data['id']
+        esmalte_linea = InsumoHasAbastecimiento.objects.get(insumo=self.esmalte).pk
+
+        response = self.client_api.patch(f'/api/abastecimientos/{abastecimiento_id}/', {
+            'insumos': self._lineas({'esmalte': 3, 'algodon': 4})
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._stock(), {'Esmalte rojo': 7, 'Lima': 5, 'Algodón': 4})
+        lineas = dict(InsumoHasAbastecimiento.objects.values_list('insumo__nombre', 'pk'))
+        self.assertEqual(set(lineas), {'Esmalte rojo', 'Algodón'})
+        self.assertEqual(lineas['Esmalte rojo'], esmalte_linea)
+
+    def test_borrar_devuelve_el_stock(self):
+        abastecimiento_id = self._entregar(esmalte=3).data['id']
+
+        self.assertEqual(self.client_api.delete(f'/api/abastecimientos/{abastecimiento_id}/').status_code, 204)
+        self.assertEqual(self._stock()['Esmalte rojo'], 10)
+
+    def test_abastecimiento_anterior_al_kardex_no_mueve_stock(self):
+        abastecimiento = Abastecimiento.objects.create(
+            fecha=date.today(), cantidad=1, manicurista=self.manicurista, stock_descontado=False
+        )
+        InsumoHasAbastecimiento.objects.create(abastecimiento=abastecimiento, insumo=self.esmalte, cantidad=3)
+
+        self.client_api.patch(f'/api/abastecimientos/{abastecimiento.id}/', {
+            'insumos': self._lineas({'esmalte': 1})
+        }, format='json')
+        self.client_api.delete(f'/api/abastecimientos/{abastecimiento.id}/')
+
+        self.assertEqual(self._stock()['Esmalte rojo'], 10)
+        self.assertFalse(MovimientoInventario.objects.filter(tipo='abastecimiento').exists())
+
+    def test_lineas_sueltas_son_de_solo_lectura(self):
+        abastecimiento_id = self._entregar(esmalte=3).data['id']
+
+        response = self.client_api.post('/api/insumo-abastecimiento/', {
+            'abastecimiento': abastecimiento_id, 'insumo': self.lima.id, 'cantidad': 2
+        }, format='json')
+
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self._stock()['Lima'], 5)
+
+    def test_listado_sin_consultas_por_fila(self):
+        def consultas_del_listado():
+            with CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(self.client_api.get('/api/abastecimientos/').status_code, 200)
+            return len(consultas)
+
+        self._entregar(esmalte=1, lima=1)
+        pocas = consultas_del_listado()
+        for _ in range(5):
+            self._entregar(esmalte=1, algodon=1)
+
+        self.assertEqual(consultas_del_listado(), pocas)
@@ -0,0 +1,115 @@
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from api.clientes.models import Cliente
+from api.manicuristas.models import Manicurista
+from api.roles.models import Rol
+from api.usuarios.models import Usuario
+
+
+class LoginUnicoTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        rol = Rol.objects.create(nombre='Manicurista')
+        self.rol_cliente = Rol.objects.create(nombre='Cliente')
+        self.usuario = Usuario.objects.create_user(
+            correo_electronico='ana@prueba.com', password='Clave123*', nombre='Ana María Ruiz',
+            tipo_documento='CC', documento='8001', celular='+12345678901', rol=rol
+        )
+        self.manicurista = Manicurista.objects.create(
+            nombre='Ana María Ruiz', numero_documento='8001', correo='ana@prueba.com', usuario=self.usuario
+        )
+
+    def test_login_resuelve_el_perfil_en_una_consulta(self):
+        # Una lectura (usuario, rol y perfiles) y el registro del refresh token para el logout
+        with self.assertNumQueries(2):
+            response = self.client_api.post(
+                '/api/auth/login/', {'correo_electronico': 'ana@prueba.com', 'password': 'Clave123*'}, format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['manicurista_id'], self.manicurista.id)
+        self.assertIsNone(response.data['cliente_id'])
+        self.assertEqual(response.data['user']['id'], self.usuario.id)
+
+    def test_credenciales_incorrectas(self):
+        for correo, clave in (('ana@prueba.com', 'otra'), ('nadie@prueba.com', 'Clave123*')):
+            response = self.client_api.post(
+                '/api/auth/login/', {'correo_electronico': correo, 'password': clave}, format='json'
+            )
+            self.assertEqual(response.status_code, 401)
+
+    def test_login_de_manicurista_con_contraseña_temporal(self):
+        temporal = self.manicurista.generar_contraseña_temporal()
+        self.manicurista.save()
+
+        response = self.client_api.post(
+            '/api/manicuristas/login/', {'numero_documento': '8001', 'contraseña': temporal}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['manicurista']['id'], self.manicurista.id)
+        self.assertTrue(response.data['debe_cambiar_contraseña'])
+        self.assertIn('access', response.data)
+
+    def test_reseteo_invalida_la_contraseña_anterior(self):
+        self.client_api.post(f'/api/manicuristas/{self.manicurista.id}/resetear_password/')
+
+        response = self.client_api.post(
+            '/api/manicuristas/login/', {'numero_documento': '8001', 'contraseña': 'Clave123*'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_contraseña_temporal_no_copiada_al_usuario(self):
+        # Reseteo hecho antes de que la temporal se copiara al usuario
+        Manicurista.objects.filter(pk=self.manicurista.pk).update(contraseña_temporal=make_password('Temp1234'))
+
+        response = self.client_api.post(
+            '/api/manicuristas/login/', {'numero_documento': '8001', 'contraseña': 'Temp1234'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.check_password('Temp1234'))
+
+    def test_cliente_sin_usuario_inicia_sesion_con_su_temporal(self):
+        cliente = Cliente.objects.create(
+            tipo_documento='CC', documento='8003', nombre='Cliente Antiguo', celular='+12345678901',
+            correo_electronico='antiguo@prueba.com', direccion='Calle 3', contraseña_temporal=make_password('Temp1234')
+        )
+
+        response = self.client_api.post(
+            '/api/clientes/login/', {'documento': '8003', 'contraseña': 'Temp1234'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        cliente.refresh_from_db()
+        self.assertIsNotNone(cliente.usuario_id)
+        self.assertEqual(response.data['cliente_id'], cliente.id)
+        self.assertEqual(
+            self.client_api.post(
+                '/api/clientes/login/', {'documento': '8003', 'contraseña': 'otra'}, format='json'
+            ).status_code,
+            401
+        )
+
+    def test_cliente_inactivo(self):
+        usuario = Usuario.objects.create_user(
+            correo_electronico='cli@prueba.com', password='Clave123*', nombre='Cliente Inactivo',
+            tipo_documento='CC', documento='8002', celular='+12345678901', rol=self.rol_cliente
+        )
+        Cliente.objects.create(
+            tipo_documento='CC', documento='8002', nombre='Cliente Inactivo', celular='+12345678901',
+            correo_electronico='cli@prueba.com', direccion='Calle 2', usuario=usuario, estado=False
+        )
+
+        response = self.client_api.post(
+            '/api/clientes/login/', {'documento': '8002', 'contraseña': 'Clave123*'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['error'], 'Cuenta inactiva. Contacta al administrador')
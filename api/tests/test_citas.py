@@ -0,0 +1,409 @@
+from datetime import date, time, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from api.citas import availability
+from api.citas.availability import AgendaDia, TIPO_CITA, TIPO_HORARIO, TIPO_NOVEDAD
+from api.citas.models import Cita
+from api.clientes.models import Cliente
+from api.manicuristas.models import Manicurista
+from api.novedades.models import Novedad
+from api.servicios.models import Servicio
+
+
+class DisponibilidadGridTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.fecha = date.today() + timedelta(days=1)
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='1001',
+            nombre='Cliente Grid',
+            celular='+12345678901',
+            correo_electronico='grid@prueba.com',
+            direccion='Calle 1'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Ana Perez', correo='ana@prueba.com')
+        self.otra_manicurista = Manicurista.objects.create(nombre='Luisa Gomez', correo='luisa@prueba.com')
+        self.servicio = Servicio.objects.create(
+            nombre='Manicure', precio=30000, descripcion='Manicure', duracion=90
+        )
+
+    def _grid(self, **params):
+        return self.client_api.get('/api/citas/disponibilidad-grid/', params)
+
+    def test_cita_bloquea_slots_segun_duracion(self):
+        Cita.objects.create(
+            cliente=self.cliente,
+            manicurista=self.manicurista,
+            servicio=self.servicio,
+            fecha_cita=self.fecha,
+            hora_cita=time(11, 0)
+        )
+        response = self._grid(fecha_desde=self.fecha.isoformat(), manicuristas=str(self.manicurista.id))
+        self.assertEqual(response.status_code, 200)
+
+        bitmap = response.data['manicuristas'][str(self.manicurista.id)][self.fecha.isoformat()]
+        self.assertEqual(len(bitmap), len(response.data['slots']))
+        # 11:00 - 12:30 ocupados (slots 2, 3 y 4), el resto libres
+        self.assertEqual(bitmap[:6], '110001')
+
+    def test_novedades_y_rango_en_dos_consultas(self):
+        Novedad.objects.create(
+            manicurista=self.otra_manicurista,
+            fecha=self.fecha,
+            estado='tardanza',
+            hora_entrada=time(11, 0)
+        )
+        fecha_hasta = self.fecha + timedelta(days=2)
+        ids = f'{self.manicurista.id},{self.otra_manicurista.id}'
+
+        with self.assertNumQueries(2):
+            response = self._grid(
+                fecha_desde=self.fecha.isoformat(),
+                fecha_hasta=fecha_hasta.isoformat(),
+                manicuristas=ids
+            )
+
+        self.assertEqual(response.status_code, 200)
+        dias = response.data['manicuristas'][str(self.otra_manicurista.id)]
+        self.assertEqual(len(dias), 3)
+        self.assertTrue(dias[self.fecha.isoformat()].startswith('001'))
+        self.assertNotIn('0', dias[fecha_hasta.isoformat()])
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self._grid().status_code, 400)
+        self.assertEqual(self._grid(fecha_desde='15-01-2024').status_code, 400)
+        fecha_hasta = self.fecha + timedelta(days=60)
+        response = self._grid(fecha_desde=self.fecha.isoformat(), fecha_hasta=fecha_hasta.isoformat())
+        self.assertEqual(response.status_code, 400)
+
+
+class AgendaDiaTestCase(TestCase):
+
+    def test_bloques_solapados_y_duracion(self):
+        agenda = AgendaDia()
+        agenda.agregar(11 * 60, 12 * 60 + 30, TIPO_CITA, 'Cita 90 min')
+        agenda.agregar(12 * 60, 13 * 60, TIPO_NOVEDAD, 'Ausencia')
+
+        self.assertTrue(agenda.esta_libre(10 * 60, 60))
+        self.assertFalse(agenda.esta_libre(10 * 60 + 30, 60))
+        self.assertFalse(agenda.esta_libre(11 * 60 + 30))
+        self.assertTrue(agenda.esta_libre(13 * 60))
+        self.assertEqual(agenda.motivo_en(12 * 60 + 30).motivo, 'Ausencia')
+        self.assertEqual(
+            [o.tipo for o in agenda.ocupaciones_en(12 * 60, 12 * 60 + 30)],
+            [TIPO_CITA, TIPO_NOVEDAD]
+        )
+
+    def test_fuera_de_horario_no_esta_libre(self):
+        agenda = AgendaDia()
+        self.assertFalse(agenda.esta_libre(9 * 60 + 30))
+        self.assertFalse(agenda.esta_libre(20 * 60))
+        self.assertEqual(len(agenda.slots_libres(60)), 19)
+
+    def test_servicio_que_termina_despues_del_cierre(self):
+        agenda = AgendaDia()
+
+        # 90 minutos a las 19:30 terminarían a las 21:00
+        self.assertFalse(agenda.esta_libre(19 * 60 + 30, 90))
+        self.assertTrue(agenda.esta_libre(18 * 60 + 30, 90))
+        self.assertEqual(agenda.motivo_en(19 * 60 + 30, 90).tipo, TIPO_HORARIO)
+        self.assertEqual(agenda.slots_libres(90)[-1], 18 * 60 + 30)
+
+
+class CrearCitaDisponibilidadTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.fecha = date.today() + timedelta(days=1)
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='2001',
+            nombre='Cliente Agenda',
+            celular='+12345678901',
+            correo_electronico='agenda@prueba.com',
+            direccion='Calle 2'
+        )
+        self.otro_cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='2002',
+            nombre='Otro Cliente',
+            celular='+12345678902',
+            correo_electronico='otro@prueba.com',
+            direccion='Calle 3'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Marta Ruiz', correo='marta@prueba.com')
+        self.servicio_largo = Servicio.objects.create(
+            nombre='Spa de manos', precio=50000, descripcion='Spa', duracion=90
+        )
+        Cita.objects.create(
+            cliente=self.cliente,
+            manicurista=self.manicurista,
+            servicio=self.servicio_largo,
+            fecha_cita=self.fecha,
+            hora_cita=time(11, 0)
+        )
+
+    def _crear(self, hora):
+        return self.client_api.post('/api/citas/', {
+            'cliente': self.otro_cliente.id,
+            'manicurista': self.manicurista.id,
+            'servicios': [self.servicio_largo.id],
+            'fecha_cita': self.fecha.isoformat(),
+            'hora_cita': hora
+        }, format='json')
+
+    def test_cita_larga_bloquea_slots_siguientes(self):
+        response = self._crear('11:30')
+        self.assertEqual(response.status_code, 400)
+
+    def test_nueva_cita_no_puede_invadir_la_siguiente(self):
+        response = self._crear('10:00')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cita_despues_de_terminar(self):
+        response = self._crear('12:30')
+        self.assertEqual(response.status_code, 201)
+
+    def test_cita_que_termina_despues_del_cierre(self):
+        response = self._crear('19:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('horario de atención', str(response.data))
+
+    def test_servicio_repetido_suma_su_duracion_cada_vez(self):
+        response = self.client_api.post('/api/citas/', {
+            'cliente': self.otro_cliente.id,
+            'manicurista': self.manicurista.id,
+            'servicios': [self.servicio_largo.id, self.servicio_largo.id],
+            'fecha_cita': self.fecha.isoformat(),
+            'hora_cita': '12:30'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['duracion_total'], 180)
+
+        # La cita repetida ocupa de 12:30 a 15:30
+        self.assertEqual(self._crear('15:00').status_code, 400)
+        self.assertEqual(self._crear('15:30').status_code, 201)
+
+    def test_disponibilidad_rechaza_duracion_menor_al_intervalo(self):
+        for duracion in ('0', '-30', '15', 'noventa'):
+            response = self.client_api.get('/api/citas/disponibilidad/', {
+                'manicurista': self.manicurista.id, 'fecha': self.fecha.isoformat(), 'duracion': duracion
+            })
+            self.assertEqual(response.status_code, 400, duracion)
+
+
+class CacheCaida:
+    """Backend de cache que no responde"""
+
+    def __getattr__(self, nombre):
+        def fallar(*args, **kwargs):
+            raise ConnectionError('Redis no responde')
+        return fallar
+
+
+class DisponibilidadCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.fecha = date.today() + timedelta(days=2)
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='3001',
+            nombre='Cliente Cache',
+            celular='+12345678901',
+            correo_electronico='cache@prueba.com',
+            direccion='Calle 4'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Sara Diaz', correo='sara@prueba.com')
+        self.servicio = Servicio.objects.create(
+            nombre='Pedicure', precio=40000, descripcion='Pedicure', duracion=60
+        )
+
+    def _disponibilidad(self):
+        return self.client_api.get('/api/citas/disponibilidad/', {
+            'manicurista': self.manicurista.id,
+            'fecha': self.fecha.isoformat()
+        })
+
+    def test_segunda_lectura_sale_de_cache(self):
+        self._disponibilidad()
+        with self.assertNumQueries(0):
+            response = self._disponibilidad()
+        self.assertEqual(response.data['total_disponibles'], 20)
+
+        stats = self.client_api.get('/api/citas/disponibilidad-cache/').data
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_cita_y_novedad_invalidan_la_cache(self):
+        self._disponibilidad()
+
+        # La cache se invalida al confirmar la transacción, no antes
+        with self.captureOnCommitCallbacks() as pendientes:
+            cita = Cita.objects.create(
+                cliente=self.cliente,
+                manicurista=self.manicurista,
+                servicio=self.servicio,
+                fecha_cita=self.fecha,
+                hora_cita=time(10, 0)
+            )
+            self.assertNotIn('10:30', self._disponibilidad().data['horarios_ocupados_citas'])
+        for callback in pendientes:
+            callback()
+        self.assertIn('10:30', self._disponibilidad().data['horarios_ocupados_citas'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cita.fecha_cita = self.fecha + timedelta(days=1)
+            cita.save()
+        self.assertEqual(self._disponibilidad().data['total_disponibles'], 20)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Novedad.objects.create(
+                manicurista=self.manicurista,
+                fecha=self.fecha,
+                estado='ausente',
+                tipo_ausencia='completa'
+            )
+        response = self._disponibilidad()
+        self.assertEqual(response.data['total_disponibles'], 0)
+        self.assertIsNotNone(response.data['razon_no_disponible'])
+
+    def test_caida_y_recuperacion_no_sirven_agendas_viejas(self):
+        self.addCleanup(setattr, availability, '_backend_caido_hasta', 0)
+        self._disponibilidad()
+
+        with mock.patch.object(availability, '_cache', return_value=CacheCaida()), \
+                self.assertLogs('api.citas.availability', 'WARNING'):
+            # La invalidación de la cita se pierde, pero la agenda sale de la base de datos
+            Cita.objects.create(
+                cliente=self.cliente, manicurista=self.manicurista, servicio=self.servicio,
+                fecha_cita=self.fecha, hora_cita=time(10, 0)
+            )
+            self.assertIn('10:30', self._disponibilidad().data['horarios_ocupados_citas'])
+
+        # El backend vuelve con la generación vieja: la época descarta lo cacheado antes de la caída
+        availability._backend_caido_hasta = 0
+        self.assertIn('10:30', self._disponibilidad().data['horarios_ocupados_citas'])
+        self.assertTrue(self.client_api.get('/api/citas/disponibilidad-cache/').data['disponible'])
+
+
+class ProximosDisponiblesTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.fecha = date.today() + timedelta(days=1)
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='4001',
+            nombre='Cliente Proximos',
+            celular='+12345678901',
+            correo_electronico='proximos@prueba.com',
+            direccion='Calle 5'
+        )
+        self.ana = Manicurista.objects.create(nombre='Ana Lopez', correo='ana.lopez@prueba.com')
+        self.bea = Manicurista.objects.create(nombre='Bea Mora', correo='bea@prueba.com')
+        self.servicio = Servicio.objects.create(
+            nombre='Manicure', precio=30000, descripcion='Manicure', duracion=60
+        )
+        Cita.objects.create(
+            cliente=self.cliente,
+            manicurista=self.ana,
+            servicio=self.servicio,
+            fecha_cita=self.fecha,
+            hora_cita=time(10, 0)
+        )
+
+    def _buscar(self, **params):
+        return self.client_api.get('/api/citas/proximos-disponibles/', params)
+
+    def test_primeros_huecos_en_orden_cronologico(self):
+        # Servicios + manicuristas + citas y novedades de un solo día
+        with self.assertNumQueries(4):
+            response = self._buscar(
+                servicios=str(self.servicio.id), n=3, desde=self.fecha.isoformat()
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['duracion_total'], 60)
+        self.assertEqual(
+            [(r['manicurista_id'], r['hora']) for r in response.data['resultados']],
+            [(self.bea.id, '10:00'), (self.bea.id, '10:30'), (self.ana.id, '11:00')]
+        )
+
+    def test_salta_dias_sin_huecos(self):
+        for manicurista in (self.ana, self.bea):
+            Novedad.objects.create(
+                manicurista=manicurista, fecha=self.fecha, estado='ausente', tipo_ausencia='completa'
+            )
+        response = self._buscar(servicios=str(self.servicio.id), n=1, desde=self.fecha.isoformat())
+
+        resultado = response.data['resultados'][0]
+        self.assertEqual(resultado['fecha'], (self.fecha + timedelta(days=1)).isoformat())
+        self.assertEqual((resultado['manicurista_id'], resultado['hora']), (self.ana.id, '10:00'))
+
+    def test_servicio_inexistente(self):
+        response = self._buscar(servicios='999')
+        self.assertEqual(response.status_code, 400)
+
+
+class EstadisticasCitasTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='6001',
+            nombre='Cliente Stats',
+            celular='+12345678901',
+            correo_electronico='stats@prueba.com',
+            direccion='Calle 7'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Lina Soto', correo='lina@prueba.com')
+        self.servicio = Servicio.objects.create(
+            nombre='Manicure', precio=30000, descripcion='Manicure', duracion=30
+        )
+        self.manana = date.today() + timedelta(days=1)
+        for hora, estado in ((time(10, 0), 'pendiente'), (time(11, 0), 'finalizada'), (time(12, 0), 'cancelada')):
+            Cita.objects.create(
+                cliente=self.cliente,
+                manicurista=self.manicurista,
+                servicio=self.servicio,
+                fecha_cita=self.manana,
+                hora_cita=hora,
+                estado=estado
+            )
+
+    def test_contadores_en_dos_consultas(self):
+        with self.assertNumQueries(2):
+            response = self.client_api.get('/api/citas/estadisticas/', {
+                'desde': self.manana.isoformat(),
+                'hasta': self.manana.isoformat()
+            })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_citas'], 3)
+        self.assertEqual(response.data['citas_pendientes'], 1)
+        self.assertEqual(response.data['periodo']['citas'], 3)
+        self.assertEqual(response.data['periodo']['ingresos'], 30000)
+        self.assertEqual(
+            response.data['por_estado'],
+            [{'estado': 'cancelada', 'count': 1}, {'estado': 'finalizada', 'count': 1}, {'estado': 'pendiente', 'count': 1}]
+        )
+        self.assertEqual(response.data['manicuristas_top'][0]['total_citas'], 3)
+
+    def test_periodo_sin_citas(self):
+        ayer = date.today() - timedelta(days=1)
+        response = self.client_api.get('/api/citas/estadisticas/', {
+            'desde': ayer.isoformat(), 'hasta': ayer.isoformat()
+        })
+        self.assertEqual(response.data['periodo']['citas'], 0)
+        self.assertEqual(response.data['manicuristas_top'], [])
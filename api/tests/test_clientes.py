@@ -1,6 +1,7 @@
 from django.test import TestCase
+from rest_framework.test import APIClient
 from django.core.exceptions import ValidationError
-from api.clientes.models import Cliente
+from api.clientes.models import Cliente, TerminoBusquedaCliente
 from api.usuarios.models import Usuario
 from api.roles.models import Rol
 
@@ -56,3 +57,54 @@ class ClienteTestCase(TestCase):
         cliente = Cliente(**self.data_valida)
         esperado = f"{self.data_valida['nombre']} ({self.data_valida['documento']})"
         self.assertEqual(str(cliente), esperado)
+
+
+class BusquedaClienteTestCase(TestCase):
+
+    def setUp(self):
+        self.client_api = APIClient()
+        for documento, nombre in (
+            ('1020', 'María Pérez'),
+            ('5510', 'Mariana Gómez'),
+            ('7700', 'Ana Marín'),
+            ('3301', 'Rosa Amaris'),
+            ('1020345', 'Lucía Ortiz'),
+        ):
+            Cliente.objects.create(
+                tipo_documento='CC', documento=documento, nombre=nombre, celular='+12345678901',
+                correo_electronico=f'{documento}@prueba.com', direccion='Calle 1'
+            )
+
+    def _buscar(self, q, **params):
+        response = self.client_api.get('/api/clientes/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [c['nombre'] for c in response.data]
+
+    def test_ignora_tildes_y_mayusculas(self):
+        self.assertEqual(self._buscar('MARIA perez'), ['María Pérez'])
+        self.assertEqual(self._buscar('lucia'), ['Lucía Ortiz'])
+
+    def test_ordena_por_relevancia(self):
+        # Prefijo del nombre, luego prefijo de una palabra, luego subcadena
+        self.assertEqual(self._buscar('mari'), ['María Pérez', 'Mariana Gómez', 'Ana Marín', 'Rosa Amaris'])
+        # Documento exacto antes que el que solo empieza igual
+        self.assertEqual(self._buscar('1020'), ['María Pérez', 'Lucía Ortiz'])
+
+    def test_respeta_el_limite(self):
+        self.assertEqual(self._buscar('mari', limite=2), ['María Pérez', 'Mariana Gómez'])
+
+    def test_cambiar_el_nombre_actualiza_los_terminos(self):
+        cliente = Cliente.objects.get(documento='7700')
+        cliente.nombre = 'Ana Zuluaga'
+        cliente.save()
+
+        self.assertEqual(
+            sorted(TerminoBusquedaCliente.objects.filter(cliente=cliente).values_list('termino', flat=True)),
+            ['ana', 'zuluaga']
+        )
+        self.assertEqual(self._buscar('zulu'), ['Ana Zuluaga'])
+
+    def test_citas_usa_la_misma_busqueda(self):
+        response = self.client_api.post('/api/citas/buscar_clientes/', {'query': 'perez'}, format='json')
+
+        self.assertEqual([c['nombre'] for c in response.data], ['María Pérez'])
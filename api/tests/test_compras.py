@@ -0,0 +1,170 @@
+import threading
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from api.categoriainsumos.models import CategoriaInsumo
+from api.compras.models import Compra, DetalleCompra
+from api.insumos.models import Insumo, MovimientoInventario
+from api.insumos.stock import aplicar_movimientos
+from api.proveedores.models import Proveedor
+
+
+class DatosCompraMixin:
+    """Un proveedor y dos insumos con stock inicial"""
+
+    def setUp(self):
+        self.client_api = APIClient()
+        categoria = CategoriaInsumo.objects.create(nombre='Esmaltes')
+        self.proveedor = Proveedor.objects.create(
+            tipo_persona='juridica', nombre_empresa='Distribuidora Uñas', nit='900123',
+            nombre='Laura Gil', direccion='Calle 5', correo_electronico='ventas@prueba.com',
+            celular='+12345678901'
+        )
+        self.esmalte = Insumo.objects.create(nombre='Esmalte rojo', cantidad=10, categoria_insumo=categoria)
+        self.lima = Insumo.objects.create(nombre='Lima', cantidad=5, categoria_insumo=categoria)
+
+    def _comprar(self, estado='finalizada', **cantidades):
+        detalles = [
+            {'insumo_id': getattr(self, nombre).id, 'cantidad': cantidad, 'precio_unitario': 1500}
+            for nombre, cantidad in cantidades.items()
+        ]
+        return self.client_api.post('/api/compras/', {
+            'proveedor': self.proveedor.id, 'estado': estado, 'detalles': detalles
+        }, format='json')
+
+    def _stock(self):
+        return dict(Insumo.objects.values_list('nombre', 'cantidad'))
+
+
+class StockComprasTestCase(DatosCompraMixin, TestCase):
+
+    def test_compra_finalizada_suma_todas_las_lineas(self):
+        response = self._comprar(esmalte=4, lima=2)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self._stock(), {'Esmalte rojo': 14, 'Lima': 7})
+
+    def test_compra_pendiente_suma_al_finalizar(self):
+        self._comprar(estado='pendiente', esmalte=4)
+        compra = Compra.objects.get()
+        self.assertEqual(self._stock()['Esmalte rojo'], 10)
+
+        response = self.client_api.patch(f'/api/compras/{compra.id}/', {'estado': 'finalizada'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._stock()['Esmalte rojo'], 14)
+        self.assertEqual(compra.detalles.count(), 1)
+
+    def test_anular_revierte_el_stock(self):
+        self._comprar(esmalte=4, lima=2)
+        compra = Compra.objects.get()
+
+        response = self.client_api.patch(
+            f'/api/compras/{compra.id}/anular/', {'motivo_anulacion': 'Pedido duplicado'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._stock(), {'Esmalte rojo': 10, 'Lima': 5})
+
+    def test_anular_sin_stock_suficiente_no_cambia_nada(self):
+        self._comprar(esmalte=4, lima=2)
+        compra = Compra.objects.get()
+        self.client_api.patch(f'/api/insumos/{self.lima.id}/ajustar_stock/', {'cantidad': -6}, format='json')
+
+        response = self.client_api.patch(
+            f'/api/compras/{compra.id}/anular/', {'motivo_anulacion': 'Pedido duplicado'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._stock(), {'Esmalte rojo': 14, 'Lima': 1})
+        self.assertEqual(Compra.objects.get().estado, 'finalizada')
+
+    def test_ajustar_stock(self):
+        url = f'/api/insumos/{self.esmalte.id}/ajustar_stock/'
+
+        self.assertEqual(self.client_api.patch(url, {'cantidad': -3}, format='json').data['cantidad'], 7)
+        self.assertEqual(self.client_api.patch(url, {'cantidad': -8}, format='json').status_code, 400)
+        self.assertEqual(self._stock()['Esmalte rojo'], 7)
+
+
+class TotalCompraTestCase(DatosCompraMixin, TestCase):
+
+    def _compra_de(self, lineas):
+        categoria = self.esmalte.categoria_insumo
+        insumos = Insumo.objects.bulk_create([
+            Insumo(nombre=f'Insumo {lineas}-{i}', categoria_insumo=categoria) for i in range(lineas)
+        ])
+        detalles = [
+            {'insumo_id': insumo.id, 'cantidad': i % 3 + 1, 'precio_unitario': 1000 + i}
+            for i, insumo in enumerate(insumos)
+        ]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client_api.post('/api/compras/', {
+                'proveedor': self.proveedor.id, 'estado': 'finalizada', 'detalles': detalles
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        esperado = sum(Decimal(d['cantidad']) * d['precio_unitario'] for d in detalles)
+        return len(consultas), esperado
+
+    def test_total_con_200_lineas_sin_consultas_por_linea(self):
+        consultas_pocas, _ = self._compra_de(2)
+        consultas_muchas, esperado = self._compra_de(200)
+
+        self.assertEqual(Compra.objects.order_by('-id').first().total, esperado)
+        # Solo los lotes de bulk_create/bulk_update pueden sumar consultas
+        self.assertLessEqual(consultas_muchas - consultas_pocas, 4)
+
+    def test_editar_un_detalle_actualiza_el_total(self):
+        self._comprar(esmalte=4, lima=2)
+        compra = Compra.objects.get()
+        self.assertEqual(compra.total, Decimal('9000'))
+
+        detalle = compra.detalles.get(insumo=self.lima)
+        detalle.cantidad = 6
+        detalle.save()
+        compra.refresh_from_db()
+        self.assertEqual(compra.total, Decimal('15000'))
+
+        DetalleCompra.objects.get(insumo=self.esmalte).delete()
+        compra.refresh_from_db()
+        self.assertEqual(compra.total, Decimal('9000'))
+
+
+class StockConcurrenteTestCase(DatosCompraMixin, TransactionTestCase):
+    """Necesita una base de datos con bloqueo de filas (MySQL en producción)"""
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_movimientos_simultaneos_no_se_pierden(self):
+        hilos_por_insumo = 8
+        inicio = threading.Barrier(hilos_por_insumo * 2)
+        errores = []
+
+        def mover(deltas):
+            try:
+                inicio.wait()
+                aplicar_movimientos(deltas, MovimientoInventario.TIPO_AJUSTE)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        # La mitad de los hilos toca los insumos en un orden y la otra mitad en el contrario
+        hilos = [
+            threading.Thread(target=mover, args=({self.esmalte.id: 1, self.lima.id: 2},))
+            for _ in range(hilos_por_insumo)
+        ] + [
+            threading.Thread(target=mover, args=({self.lima.id: 1, self.esmalte.id: 3},))
+            for _ in range(hilos_por_insumo)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(self._stock(), {
+            'Esmalte rojo': 10 + hilos_por_insumo * 4,
+            'Lima': 5 + hilos_por_insumo * 3,
+        })
@@ -0,0 +1,124 @@
+from datetime import timedelta
+from io import StringIO
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from api.utils.email_utils import encolar_correo, enviar_correo, procesar_cola
+from api.utils.models import CorreoPendiente
+
+
+class ConexionContada:
+    """Conexión de correo falsa que cuenta aperturas y puede fallar"""
+
+    def __init__(self, falla=False, falla_al_abrir=False):
+        self.falla = falla
+        self.falla_al_abrir = falla_al_abrir
+        self.aperturas = 0
+        self.enviados = []
+
+    def open(self):
+        if self.falla_al_abrir:
+            raise ConnectionRefusedError('SMTP inalcanzable')
+        self.aperturas += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, mensajes):
+        if self.falla:
+            raise ConnectionError('SMTP no disponible')
+        self.enviados.extend(mensajes)
+        return len(mensajes)
+
+
+class BandejaSalidaTestCase(TestCase):
+
+    def test_enviar_correo_solo_encola(self):
+        self.assertTrue(enviar_correo('cliente@prueba.com', 'Código', 'Tu código es 123456'))
+
+        correo = CorreoPendiente.objects.get()
+        self.assertEqual(correo.estado, 'pendiente')
+        self.assertEqual(correo.destinatarios, ['cliente@prueba.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_procesar_cola_usa_una_conexion_por_lote(self):
+        for i in range(3):
+            encolar_correo([f'c{i}@prueba.com'], 'Asunto', 'Texto', mensaje_html='<p>Texto</p>')
+        conexion = ConexionContada()
+
+        self.assertEqual(procesar_cola(conexion=conexion), (3, 0))
+
+        self.assertEqual(conexion.aperturas, 1)
+        self.assertEqual(len(conexion.enviados), 3)
+        self.assertEqual(conexion.enviados[0].alternatives[0][1], 'text/html')
+        self.assertFalse(CorreoPendiente.objects.exclude(estado='enviado').exists())
+        # El cuerpo (contraseñas temporales, códigos) no se conserva después de enviado
+        self.assertFalse(CorreoPendiente.objects.exclude(mensaje='').exists())
+        self.assertFalse(CorreoPendiente.objects.filter(mensaje_html__isnull=False).exists())
+
+    def test_reintenta_con_espera_y_marca_fallido(self):
+        correo = encolar_correo(['cliente@prueba.com'], 'Asunto', 'Texto')
+        conexion = ConexionContada(falla=True)
+
+        self.assertEqual(procesar_cola(max_intentos=2, conexion=conexion), (0, 1))
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('pendiente', 1))
+        self.assertEqual(correo.mensaje, 'Texto')
+        self.assertGreater(correo.proximo_intento, timezone.now())
+        self.assertIn('SMTP', correo.ultimo_error)
+
+        # Antes de la espera no se vuelve a intentar
+        self.assertEqual(procesar_cola(max_intentos=2, conexion=conexion), (0, 0))
+
+        CorreoPendiente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+        procesar_cola(max_intentos=2, conexion=conexion)
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('fallido', 2))
+        self.assertEqual(correo.mensaje, '')
+
+    def test_servidor_caido_reprograma_el_lote(self):
+        for i in range(2):
+            encolar_correo([f'c{i}@prueba.com'], 'Asunto', 'Texto')
+
+        self.assertEqual(procesar_cola(conexion=ConexionContada(falla_al_abrir=True)), (0, 2))
+
+        for correo in CorreoPendiente.objects.all():
+            self.assertEqual((correo.estado, correo.intentos), ('pendiente', 1))
+            self.assertGreater(correo.proximo_intento, timezone.now())
+            self.assertIn('inalcanzable', correo.ultimo_error)
+
+    def test_toma_el_lote_antes_de_enviar(self):
+        correo = encolar_correo(['cliente@prueba.com'], 'Asunto', 'Texto')
+        estados = []
+
+        class ConexionQueConsulta(ConexionContada):
+            def send_messages(self, mensajes):
+                # Mientras se habla con el SMTP la fila ya está tomada (y sin bloqueo)
+                estados.append(CorreoPendiente.objects.values_list('estado', 'intentos').get(pk=correo.pk))
+                return super().send_messages(mensajes)
+
+        self.assertEqual(procesar_cola(conexion=ConexionQueConsulta()), (1, 0))
+        self.assertEqual(estados, [('enviando', 1)])
+
+    def test_correo_de_un_worker_caido_se_retoma_al_vencer_el_plazo(self):
+        correo = encolar_correo(['cliente@prueba.com'], 'Asunto', 'Texto')
+        CorreoPendiente.objects.update(estado='enviando', intentos=1, proximo_intento=timezone.now() + timedelta(minutes=5))
+        conexion = ConexionContada()
+
+        self.assertEqual(procesar_cola(conexion=conexion), (0, 0))
+
+        CorreoPendiente.objects.update(proximo_intento=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(procesar_cola(conexion=conexion), (1, 0))
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), ('enviado', 2))
+
+    def test_comando_envia_pendientes(self):
+        encolar_correo(['cliente@prueba.com'], 'Asunto', 'Texto')
+
+        salida = StringIO()
+        call_command('procesar_correos', stdout=salida)
+
+        self.assertIn('Correos enviados: 1', salida.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['cliente@prueba.com'])
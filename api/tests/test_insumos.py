@@ -1,6 +1,17 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
 from django.test import TestCase
 from django.core.exceptions import ValidationError
-from api.insumos.models import Insumo
+from django.utils import timezone
+from api.abastecimientos.models import Abastecimiento
+from api.compras.models import Compra
+from api.insumos.models import Insumo, MovimientoInventario, ReabastecimientoInsumo
+from api.insumos.reabastecimiento import tiempos_entrega
+from api.insumoshasabastecimientos.models import InsumoHasAbastecimiento
+from api.manicuristas.models import Manicurista
+from api.tests.test_compras import DatosCompraMixin
 from api.categoriainsumos.models import CategoriaInsumo
 
 
@@ -37,3 +48,144 @@ class InsumoTestCase(TestCase):
     def test_str_retorna_nombre(self):
         insumo = Insumo(**self.data_valida)
         self.assertEqual(str(insumo), self.data_valida['nombre'])
+
+
+class KardexTestCase(DatosCompraMixin, TestCase):
+
+    def _mover_a(self, dias, **filtro):
+        # Los movimientos no se editan con save(); en la prueba se fechan con un update
+        MovimientoInventario.objects.filter(**filtro).update(fecha=timezone.now() - timedelta(days=dias))
+
+    def _dia(self, dias):
+        return (timezone.localdate() - timedelta(days=dias)).isoformat()
+
+    def test_cada_camino_deja_su_movimiento(self):
+        self._comprar(esmalte=4, lima=2)
+        compra = Compra.objects.get()
+        self.client_api.patch(f'/api/insumos/{self.esmalte.id}/ajustar_stock/', {'cantidad': -3}, format='json')
+        self.client_api.patch(
+            f'/api/compras/{compra.id}/anular/', {'motivo_anulacion': 'Pedido duplicado'}, format='json'
+        )
+
+        self.assertEqual(
+            list(self.esmalte.movimientos.order_by('id').values_list('tipo', 'documento_id', 'cantidad', 'stock_resultante')),
+            [
+                ('saldo_inicial', None, 10, 10),
+                ('compra', compra.id, 4, 14),
+                ('ajuste', None, -3, 11),
+                ('anulacion_compra', compra.id, -4, 7),
+            ]
+        )
+
+    def test_no_se_borra_un_insumo_con_kardex(self):
+        response = self.client_api.delete(f'/api/insumos/{self.esmalte.id}/')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('movimientos de inventario', response.data['error'])
+        self.assertTrue(MovimientoInventario.objects.filter(insumo=self.esmalte).exists())
+
+    def test_kardex_de_un_periodo(self):
+        self._comprar(esmalte=4)
+        self.client_api.patch(f'/api/insumos/{self.esmalte.id}/ajustar_stock/', {'cantidad': -3}, format='json')
+        self._mover_a(20, tipo='saldo_inicial')
+        self._mover_a(10, tipo='compra')
+
+        response = self.client_api.get(
+            f'/api/insumos/{self.esmalte.id}/kardex/', {'desde': self._dia(15), 'hasta': self._dia(0)}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [response.data[campo] for campo in ('stock_inicial', 'entradas', 'salidas', 'stock_final')],
+            [10, 4, 3, 11]
+        )
+        self.assertEqual([m['tipo'] for m in response.data['movimientos']], ['compra', 'ajuste'])
+
+    def test_stock_a_fecha_en_una_consulta(self):
+        self._comprar(esmalte=4, lima=2)
+        self._mover_a(20, tipo='saldo_inicial')
+        self._mover_a(10, tipo='compra')
+
+        stock = {}
+        for dias in (15, 5):
+            with self.assertNumQueries(1):
+                response = self.client_api.get('/api/insumos/stock-a-fecha/', {'fecha': self._dia(dias)})
+            stock[dias] = {i['nombre']: i['stock'] for i in response.data['insumos']}
+
+        self.assertEqual(stock[15], {'Esmalte rojo': 10, 'Lima': 5})
+        self.assertEqual(stock[5], {'Esmalte rojo': 14, 'Lima': 7})
+        antes = self.client_api.get('/api/insumos/stock-a-fecha/', {'fecha': self._dia(30)})
+        self.assertEqual({i['stock'] for i in antes.data['insumos']}, {0})
+
+
+class ReabastecimientoTestCase(DatosCompraMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        manicurista = Manicurista.objects.create(nombre='Ana Perez', correo='ana@prueba.com')
+        hoy = timezone.localdate()
+        # Diez días de entregas: 2 esmaltes y 1 lima por día
+        for dias in range(10):
+            abastecimiento = Abastecimiento.objects.create(
+                fecha=hoy - timedelta(days=dias), cantidad=1, manicurista=manicurista
+            )
+            InsumoHasAbastecimiento.objects.bulk_create([
+                InsumoHasAbastecimiento(abastecimiento=abastecimiento, insumo=self.esmalte, cantidad=2),
+                InsumoHasAbastecimiento(abastecimiento=abastecimiento, insumo=self.lima, cantidad=1),
+            ])
+        # El proveedor entregó el esmalte tres días después de la compra
+        self._comprar(esmalte=4)
+        compra = Compra.objects.get()
+        entrada = MovimientoInventario.objects.get(tipo='compra', documento_id=compra.id).fecha
+        Compra.objects.filter(pk=compra.pk).update(fecha=entrada - timedelta(days=3))
+
+    def _calcular(self):
+        salida = StringIO()
+        call_command('calcular_reabastecimiento', '--dias', '10', stdout=salida)
+        return salida.getvalue()
+
+    def test_calculo_de_punto_de_reorden_y_cobertura(self):
+        self.assertIn('2 insumos, 1 por pedir', self._calcular())
+
+        esmalte = ReabastecimientoInsumo.objects.get(insumo=self.esmalte)
+        self.assertEqual(esmalte.proveedor, self.proveedor)
+        self.assertEqual(
+            (esmalte.consumo_diario, esmalte.tiempo_entrega_dias, esmalte.punto_reorden, esmalte.dias_cobertura),
+            (Decimal('2'), Decimal('3'), 6, Decimal('7'))
+        )
+        self.assertFalse(esmalte.requiere_reorden)
+
+        # Sin compras se usa el tiempo de entrega por defecto (7 días)
+        lima = ReabastecimientoInsumo.objects.get(insumo=self.lima)
+        self.assertEqual((lima.punto_reorden, lima.dias_cobertura), (7, Decimal('5')))
+        self.assertTrue(lima.requiere_reorden)
+        self.assertEqual(lima.cantidad_sugerida, 7 + 14 - 5)
+
+    def test_compras_registradas_finalizadas_no_cuentan_como_entrega(self):
+        # Entra al stock al registrarse: no es una muestra del tiempo de entrega
+        self._comprar(lima=5)
+
+        entregas = tiempos_entrega(timezone.localdate() - timedelta(days=365))
+
+        self.assertEqual(entregas, {self.proveedor.id: 3})
+
+    def test_reabastecer_es_una_sola_lectura(self):
+        self._calcular()
+
+        with self.assertNumQueries(1):
+            response = self.client_api.get('/api/insumos/reabastecer/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([fila['insumo_nombre'] for fila in response.data], ['Lima'])
+
+        todos = self.client_api.get('/api/insumos/reabastecer/', {'todos': 'true'})
+        self.assertEqual([fila['insumo_nombre'] for fila in todos.data], ['Lima', 'Esmalte rojo'])
+        self.assertEqual(todos.data[1]['proveedor_nombre'], 'Distribuidora Uñas')
+
+    def test_recalcular_reemplaza_la_tabla(self):
+        self._calcular()
+        self.esmalte.estado = 'inactivo'
+        self.esmalte.save()
+
+        self._calcular()
+
+        self.assertEqual(list(ReabastecimientoInsumo.objects.values_list('insumo_id', flat=True)), [self.lima.id])
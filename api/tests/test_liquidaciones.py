@@ -0,0 +1,305 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.citas.models import Cita
+from api.clientes.models import Cliente
+from api.liquidaciones.comisiones import causado, saldo
+from api.liquidaciones.periodo import anotar_totales
+from api.liquidaciones.models import Liquidacion, MovimientoComision
+from api.manicuristas.models import Manicurista
+from api.servicios.models import Servicio
+from api.ventaservicios.models import VentaServicio
+
+
+class DatosPeriodoMixin:
+    """Una manicurista con ventas pagadas, otra con citas finalizadas y una inactiva, en enero de 2024"""
+
+    def setUp(self):
+        self.client_api = APIClient()
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='8001',
+            nombre='Cliente Liquidación',
+            celular='+12345678901',
+            correo_electronico='liquidacion@prueba.com',
+            direccion='Calle 12'
+        )
+        self.servicio = Servicio.objects.create(nombre='Manicure', precio=30000, descripcion='Manicure', duracion=30)
+        self.con_ventas = Manicurista.objects.create(nombre='Ana Ventas', correo='ana.v@prueba.com')
+        self.con_citas = Manicurista.objects.create(nombre='Bea Citas', correo='bea.c@prueba.com')
+        self.inactiva = Manicurista.objects.create(nombre='Cris Inactiva', correo='cris@prueba.com', estado='inactivo')
+
+        dia = date(2024, 1, 10)
+        momento = timezone.make_aware(datetime.combine(dia, time(12, 0)))
+        VentaServicio.objects.bulk_create([
+            VentaServicio(cliente=self.cliente, manicurista=self.con_ventas, total=Decimal('100000'),
+                          comision_manicurista=Decimal('40000'), estado='pagada', fecha_venta=momento),
+            VentaServicio(cliente=self.cliente, manicurista=self.con_ventas, total=Decimal('50000'),
+                          estado='pagada', fecha_venta=momento),
+            VentaServicio(cliente=self.cliente, manicurista=self.con_ventas, total=Decimal('999999'),
+                          estado='pendiente', fecha_venta=momento),
+        ])
+        Cita.objects.bulk_create([
+            Cita(cliente=self.cliente, manicurista=self.con_citas, servicio=self.servicio, fecha_cita=dia,
+                 hora_cita=time(10 + i, 0), estado='finalizada', precio_servicio=Decimal('30000'),
+                 precio_total=Decimal('30000'), duracion_total=30, duracion_estimada=30)
+            for i in range(3)
+        ])
+
+
+class GenerarPeriodoTestCase(DatosPeriodoMixin, TestCase):
+
+    def _generar(self, **datos):
+        datos = {'fecha_inicio': '2024-01-01', 'fecha_final': '2024-01-15', **datos}
+        return self.client_api.post('/api/liquidaciones/generar-periodo/', datos, format='json')
+
+    def test_genera_liquidaciones_de_las_activas(self):
+        response = self._generar()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_creadas'], 2)
+        liquidaciones = {l.manicurista_id: l for l in Liquidacion.objects.all()}
+        self.assertEqual(set(liquidaciones), {self.con_ventas.id, self.con_citas.id})
+        # Con ventas pagadas se liquidan las ventas; sin ventas, el 50% de las citas
+        self.assertEqual(liquidaciones[self.con_ventas.id].valor, Decimal('150000'))
+        self.assertEqual(liquidaciones[self.con_citas.id].valor, Decimal('45000'))
+
+        resumen = next(l for l in response.data['liquidaciones'] if l['manicurista']['id'] == self.con_citas.id)
+        self.assertEqual(resumen['resumen_citas']['cantidad_citas'], 3)
+
+    def test_omite_las_que_ya_tienen_liquidacion(self):
+        Liquidacion.objects.create(
+            manicurista=self.con_ventas, fecha_inicio=date(2024, 1, 1), fecha_final=date(2024, 1, 15), valor=1
+        )
+
+        response = self._generar()
+
+        self.assertEqual(response.data['total_creadas'], 1)
+        self.assertEqual(response.data['manicuristas_omitidas'], [self.con_ventas.id])
+        self.assertEqual(Liquidacion.objects.count(), 2)
+
+    def test_consultas_no_dependen_de_la_cantidad_de_manicuristas(self):
+        with CaptureQueriesContext(connection) as pocas:
+            self._generar(manicuristas=[self.con_ventas.id])
+        Liquidacion.objects.all().delete()
+
+        for i in range(10):
+            Manicurista.objects.create(nombre=f'Extra {i}', correo=f'extra{i}@prueba.com')
+        with CaptureQueriesContext(connection) as muchas:
+            response = self._generar()
+
+        self.assertEqual(response.data['total_creadas'], 12)
+        self.assertEqual(len(muchas), len(pocas))
+
+    def test_fechas_invertidas(self):
+        response = self._generar(fecha_inicio='2024-01-15', fecha_final='2024-01-01')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Liquidacion.objects.exists())
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command('generar_liquidaciones', '--desde', '2024-01-01', '--hasta', '2024-01-15', stdout=salida)
+
+        self.assertIn('Liquidaciones creadas: 2', salida.getvalue())
+        self.assertEqual(Liquidacion.objects.count(), 2)
+
+
+class ListadoLiquidacionesTestCase(DatosPeriodoMixin, TestCase):
+
+    def _crear_liquidaciones(self, meses):
+        for mes in meses:
+            for manicurista in (self.con_ventas, self.con_citas):
+                Liquidacion.objects.create(
+                    manicurista=manicurista, fecha_inicio=date(2024, mes, 1), fecha_final=date(2024, mes, 15),
+                    valor=Decimal('1000')
+                )
+
+    def test_listado_con_consultas_constantes(self):
+        self._crear_liquidaciones([1])
+        with CaptureQueriesContext(connection) as pocas:
+            self.client_api.get('/api/liquidaciones/')
+
+        self._crear_liquidaciones(range(2, 13))
+        with CaptureQueriesContext(connection) as muchas:
+            response = self.client_api.get('/api/liquidaciones/')
+
+        self.assertEqual(len(muchas), len(pocas))
+        self.assertEqual(len(muchas), 1)
+        enero = {
+            l['manicurista']['id']: l for l in response.data['results'] if l['fecha_inicio'] == '2024-01-01'
+        }
+        self.assertEqual(enero[self.con_ventas.id]['total_ventas_completadas'], 150000)
+        self.assertEqual(enero[self.con_ventas.id]['cantidad_ventas_completadas'], 2)
+        self.assertEqual(enero[self.con_citas.id]['total_servicios_completados'], Decimal('90000'))
+        self.assertEqual(enero[self.con_citas.id]['cantidad_servicios_completados'], 3)
+
+    def test_limites_del_periodo_en_hora_local(self):
+        # Una venta a las 23:30 del último día entra; una a las 00:30 del día siguiente no
+        VentaServicio.objects.bulk_create([
+            VentaServicio(cliente=self.cliente, manicurista=self.con_ventas, total=Decimal('1000'), estado='pagada',
+                          fecha_venta=timezone.make_aware(datetime.combine(dia, hora)))
+            for dia, hora in ((date(2024, 1, 15), time(23, 30)), (date(2024, 1, 16), time(0, 30)))
+        ])
+        self._crear_liquidaciones([1])
+
+        liquidacion = anotar_totales(Liquidacion.objects.filter(manicurista=self.con_ventas)).get()
+
+        self.assertEqual(liquidacion.fin_periodo, timezone.make_aware(datetime(2024, 1, 16)))
+        self.assertEqual(liquidacion.ventas_cantidad, 3)
+        self.assertEqual(liquidacion.ventas_total, Decimal('151000'))
+
+    def test_detalle_sin_anotaciones_usa_consultas(self):
+        self._crear_liquidaciones([1])
+        liquidacion = Liquidacion.objects.get(manicurista=self.con_citas)
+
+        self.assertEqual(liquidacion.total_servicios_completados, Decimal('90000'))
+        self.assertEqual(liquidacion.cantidad_servicios_completados, 3)
+
+
+class LibroComisionesTestCase(TestCase):
+
+    def setUp(self):
+        self.client_api = APIClient()
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='8002',
+            nombre='Cliente Comisiones',
+            celular='+12345678901',
+            correo_electronico='comisiones@prueba.com',
+            direccion='Calle 13'
+        )
+        self.servicio = Servicio.objects.create(nombre='Manicure', precio=30000, descripcion='Manicure', duracion=30)
+        self.manicurista = Manicurista.objects.create(nombre='Dora Libro', correo='dora@prueba.com')
+        self.hoy = timezone.localdate()
+
+    def _cita(self, estado='en_proceso'):
+        return Cita.objects.create(
+            cliente=self.cliente, manicurista=self.manicurista, servicio=self.servicio,
+            fecha_cita=self.hoy, hora_cita=time(10, 0), estado=estado, precio_servicio=Decimal('30000')
+        )
+
+    def _venta(self, estado='pendiente'):
+        return VentaServicio.objects.create(
+            cliente=self.cliente, manicurista=self.manicurista, servicio=self.servicio,
+            precio_unitario=Decimal('30000'), total=Decimal('30000'), porcentaje_comision=Decimal('40'),
+            estado=estado
+        )
+
+    def test_cita_finalizada_causa_y_eliminada_reversa(self):
+        cita = self._cita()
+        response = self.client_api.patch(
+            f'/api/citas/{cita.id}/actualizar_estado/', {'estado': 'finalizada'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        movimiento = MovimientoComision.objects.get(origen='cita')
+        self.assertEqual((movimiento.tipo, movimiento.valor, movimiento.saldo), ('causacion', Decimal('15000'), Decimal('15000')))
+
+        # Guardar de nuevo la cita finalizada no duplica la causación
+        cita.refresh_from_db()
+        cita.save()
+        self.assertEqual(MovimientoComision.objects.filter(origen='cita').count(), 1)
+
+        cita.delete()
+        reverso = MovimientoComision.objects.filter(origen='cita').first()
+        self.assertEqual((reverso.tipo, reverso.valor, reverso.saldo), ('reverso', Decimal('-15000'), Decimal('0')))
+
+    def test_venta_pagada_causa_y_cancelada_reversa(self):
+        venta = self._venta()
+        self.assertFalse(MovimientoComision.objects.exists())
+
+        response = self.client_api.patch(
+            f'/api/venta-servicios/{venta.id}/actualizar_estado/', {'estado': 'pagada', 'metodo_pago': 'efectivo'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(saldo(self.manicurista.id, 'venta'), Decimal('12000'))
+
+        venta.refresh_from_db()
+        venta.estado = 'cancelada'
+        venta.save()
+        self.assertEqual(saldo(self.manicurista.id, 'venta'), Decimal('0'))
+        self.assertEqual(
+            list(MovimientoComision.objects.order_by('id').values_list('tipo', flat=True)),
+            ['causacion', 'reverso']
+        )
+
+    def test_causado_en_periodo_es_lectura_de_saldos(self):
+        self._venta(estado='pagada')
+        self._venta(estado='pagada')
+        self._cita(estado='finalizada')
+
+        with self.assertNumQueries(4):
+            resumen = causado(self.manicurista.id, self.hoy, self.hoy)
+
+        self.assertEqual(resumen['venta'], Decimal('24000'))
+        self.assertEqual(resumen['cita'], Decimal('15000'))
+        self.assertEqual(resumen['valor_sugerido'], Decimal('24000'))
+
+        response = self.client_api.get('/api/liquidaciones/comisiones-causadas/', {'manicurista': self.manicurista.id})
+        self.assertEqual(response.data['comision_ventas'], 24000)
+
+    def test_conciliar_detecta_y_corrige(self):
+        self._venta(estado='pagada')
+        # bulk_create no dispara señales: la venta queda fuera del libro
+        VentaServicio.objects.bulk_create([
+            VentaServicio(cliente=self.cliente, manicurista=self.manicurista, total=Decimal('50000'),
+                          comision_manicurista=Decimal('5000'), estado='pagada')
+        ])
+
+        salida = StringIO()
+        call_command('conciliar_comisiones', stdout=salida)
+        self.assertIn('Diferencias: 1', salida.getvalue())
+
+        call_command('conciliar_comisiones', '--corregir', stdout=StringIO())
+        salida = StringIO()
+        call_command('conciliar_comisiones', stdout=salida)
+        self.assertIn('coincide', salida.getvalue())
+        self.assertEqual(saldo(self.manicurista.id, 'venta'), Decimal('17000'))
+
+    def test_conciliar_causa_con_la_fecha_de_la_venta(self):
+        self._venta(estado='pagada')
+        dia_antiguo = self.hoy - timedelta(days=40)
+        VentaServicio.objects.bulk_create([
+            VentaServicio(cliente=self.cliente, manicurista=self.manicurista, total=Decimal('50000'),
+                          comision_manicurista=Decimal('5000'), estado='pagada',
+                          fecha_venta=timezone.make_aware(datetime.combine(dia_antiguo, time(12, 0))))
+        ])
+
+        call_command('conciliar_comisiones', '--corregir', stdout=StringIO())
+
+        historica = MovimientoComision.objects.get(base=Decimal('50000'))
+        self.assertEqual((historica.fecha, historica.saldo), (dia_antiguo, Decimal('5000')))
+        # La historia no se suma a lo causado hoy, y el saldo posterior la incluye
+        self.assertEqual(causado(self.manicurista.id, self.hoy, self.hoy)['venta'], Decimal('12000'))
+        self.assertEqual(causado(self.manicurista.id, dia_antiguo, dia_antiguo)['venta'], Decimal('5000'))
+        self.assertEqual(saldo(self.manicurista.id, 'venta'), Decimal('17000'))
+
+    def test_cita_de_otro_dia_causa_en_su_fecha(self):
+        cita = self._cita()
+        cita.fecha_cita = self.hoy - timedelta(days=3)
+        cita.estado = 'finalizada'
+        cita.save()
+
+        self.assertEqual(MovimientoComision.objects.get().fecha, self.hoy - timedelta(days=3))
+
+        cita.estado = 'cancelada'
+        cita.save()
+        reverso = MovimientoComision.objects.get(tipo='reverso')
+        self.assertEqual((reverso.fecha, reverso.saldo), (self.hoy, Decimal('0')))
+
+    def test_movimientos_solo_se_agregan(self):
+        self._venta(estado='pagada')
+        movimiento = MovimientoComision.objects.get()
+
+        with self.assertRaises(ValueError):
+            movimiento.save()
+        with self.assertRaises(ValueError):
+            movimiento.delete()
@@ -0,0 +1,204 @@
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.citas.models import Cita
+from api.clientes.models import Cliente
+from api.manicuristas.models import Manicurista
+from api.novedades.models import Novedad
+from api.servicios.models import Servicio
+from api.utils.models import CorreoPendiente
+
+
+class DatosNovedadMixin:
+    """Un cliente y un servicio de una hora, con fechas desde pasado mañana"""
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.fecha = timezone.localdate() + timedelta(days=2)
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='9001',
+            nombre='Cliente Novedad',
+            celular='+12345678901',
+            correo_electronico='novedad@prueba.com',
+            direccion='Calle 20'
+        )
+        self.servicio = Servicio.objects.create(nombre='Manicure', precio=30000, descripcion='Manicure', duracion=60)
+
+    def _citas(self, manicurista, horas, fecha=None, duracion=60):
+        Cita.objects.bulk_create([
+            Cita(cliente=self.cliente, manicurista=manicurista, servicio=self.servicio,
+                 fecha_cita=fecha or self.fecha, hora_cita=hora, precio_servicio=Decimal('30000'),
+                 precio_total=Decimal('30000'), duracion_total=duracion, duracion_estimada=duracion)
+            for hora in horas
+        ])
+
+    def _registrar(self, manicurista, **datos):
+        datos = {'manicurista': manicurista.id, 'fecha': self.fecha.isoformat(), **datos}
+        return self.client_api.post('/api/novedades/', datos, format='json')
+
+
+class CancelacionPorNovedadTestCase(DatosNovedadMixin, TestCase):
+
+    def test_ausencia_por_horas_cancela_solo_las_que_se_cruzan(self):
+        manicurista = Manicurista.objects.create(nombre='Eva Horas', correo='eva@prueba.com')
+        # 10:00-11:00 se cruza por el final, 12:30-13:30 por dentro, 14:00 empieza justo al terminar
+        self._citas(manicurista, [time(10, 0), time(12, 30), time(14, 0)])
+        self._citas(manicurista, [time(10, 30)], fecha=self.fecha + timedelta(days=1))
+
+        response = self._registrar(
+            manicurista, estado='ausente', tipo_ausencia='por_horas',
+            hora_inicio_ausencia='10:30', hora_fin_ausencia='14:00'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        novedad = Novedad.objects.get()
+        canceladas = Cita.objects.filter(estado='cancelada_por_novedad', novedad_relacionada=novedad)
+        self.assertEqual(sorted(canceladas.values_list('hora_cita', flat=True)), [time(10, 0), time(12, 30)])
+        self.assertEqual(Cita.objects.filter(estado='pendiente').count(), 2)
+        self.assertEqual(CorreoPendiente.objects.count(), 2)
+
+    def test_tardanza_cancela_las_anteriores_a_la_llegada(self):
+        manicurista = Manicurista.objects.create(nombre='Fer Tarde', correo='fer@prueba.com')
+        self._citas(manicurista, [time(10, 0), time(11, 0), time(12, 0)])
+
+        self._registrar(manicurista, estado='tardanza', hora_entrada='11:30')
+
+        self.assertEqual(Cita.objects.filter(estado='cancelada_por_novedad').count(), 2)
+
+    def test_cambiar_tardanza_a_ausencia_cancela_el_resto(self):
+        manicurista = Manicurista.objects.create(nombre='Iris Cambio', correo='iris@prueba.com')
+        self._citas(manicurista, [time(10, 0), time(15, 0)])
+        novedad = self._registrar(manicurista, estado='tardanza', hora_entrada='11:00').data
+
+        response = self.client_api.patch(
+            f"/api/novedades/{novedad['id']}/",
+            {'estado': 'ausente', 'tipo_ausencia': 'completa', 'hora_entrada': None}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cita.objects.filter(estado='cancelada_por_novedad').count(), 2)
+
+    def test_cancelacion_en_consultas_constantes(self):
+        pocas = Manicurista.objects.create(nombre='Gina Pocas', correo='gina@prueba.com')
+        muchas = Manicurista.objects.create(nombre='Hana Muchas', correo='hana@prueba.com')
+        self._citas(pocas, [time(10, 0)], duracion=30)
+        self._citas(muchas, [time(8 + i // 2, 30 * (i % 2)) for i in range(24)], duracion=30)
+
+        with CaptureQueriesContext(connection) as consultas_pocas:
+            self._registrar(pocas, estado='ausente', tipo_ausencia='completa')
+        with CaptureQueriesContext(connection) as consultas_muchas:
+            self._registrar(muchas, estado='ausente', tipo_ausencia='completa')
+
+        self.assertEqual(Cita.objects.filter(estado='cancelada_por_novedad').count(), 25)
+        self.assertEqual(CorreoPendiente.objects.count(), 25)
+        self.assertEqual(len(consultas_muchas), len(consultas_pocas))
+
+    def test_anular_reactiva_las_citas(self):
+        manicurista = Manicurista.objects.create(nombre='Ines Anula', correo='ines@prueba.com')
+        self._citas(manicurista, [time(10, 0), time(11, 0)])
+        self._registrar(manicurista, estado='ausente', tipo_ausencia='completa')
+        novedad = Novedad.objects.get()
+
+        response = self.client_api.patch(
+            f'/api/novedades/{novedad.id}/anular/', {'motivo_anulacion': 'Se recuperó'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Cita.objects.order_by().values_list('estado', 'novedad_relacionada', 'motivo_cancelacion').distinct()),
+            [('pendiente', None, None)]
+        )
+        self.assertEqual(CorreoPendiente.objects.filter(asunto='Tu cita ha sido reactivada').count(), 2)
+
+
+class NovedadPorRangoTestCase(DatosNovedadMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manicurista = Manicurista.objects.create(nombre='Julia Vacaciones', correo='julia@prueba.com')
+        self.fin = self.fecha + timedelta(days=13)
+
+    def _vacaciones(self):
+        return self._registrar(
+            self.manicurista, estado='ausente', tipo_ausencia='completa',
+            fecha_fin=self.fin.isoformat(), observaciones='Vacaciones'
+        )
+
+    def test_vacaciones_cancelan_las_citas_de_todo_el_rango(self):
+        for dia in (0, 6, 13, 14):
+            self._citas(self.manicurista, [time(10, 0), time(15, 0)], fecha=self.fecha + timedelta(days=dia))
+
+        response = self._vacaciones()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Novedad.objects.count(), 1)
+        self.assertEqual(Cita.objects.filter(estado='cancelada_por_novedad').count(), 6)
+        self.assertFalse(Cita.objects.filter(fecha_cita=self.fin + timedelta(days=1)).exclude(estado='pendiente').exists())
+
+    def test_disponibilidad_respeta_el_rango_y_la_cache(self):
+        medio = (self.fecha + timedelta(days=7)).isoformat()
+        url = '/api/citas/disponibilidad/'
+        antes = self.client_api.get(url, {'manicurista': self.manicurista.id, 'fecha': medio})
+        self.assertGreater(antes.data['total_disponibles'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._vacaciones()
+
+        durante = self.client_api.get(url, {'manicurista': self.manicurista.id, 'fecha': medio})
+        self.assertEqual(durante.data['total_disponibles'], 0)
+        slots = self.client_api.get(
+            '/api/novedades/disponibilidad_citas/', {'manicurista': self.manicurista.id, 'fecha': medio}
+        )
+        self.assertFalse(any(s['disponible'] for s in slots.data['slots_disponibilidad']))
+        despues = self.client_api.get(
+            url, {'manicurista': self.manicurista.id, 'fecha': (self.fin + timedelta(days=1)).isoformat()}
+        )
+        self.assertGreater(despues.data['total_disponibles'], 0)
+
+    def test_ampliar_el_rango_cancela_las_citas_nuevas(self):
+        self._citas(self.manicurista, [time(10, 0)], fecha=self.fin + timedelta(days=3))
+        novedad = self._vacaciones().data
+
+        response = self.client_api.patch(
+            f"/api/novedades/{novedad['id']}/", {'fecha_fin': (self.fin + timedelta(days=5)).isoformat()},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cita.objects.get().estado, 'cancelada_por_novedad')
+
+    def test_error_cancelando_revierte_la_novedad(self):
+        self._citas(self.manicurista, [time(10, 0)])
+
+        with mock.patch('api.novedades.views.encolar_correos', side_effect=RuntimeError('cola caída')):
+            with self.assertRaises(RuntimeError):
+                self._vacaciones()
+
+        self.assertFalse(Novedad.objects.exists())
+        self.assertEqual(Cita.objects.get().estado, 'pendiente')
+
+    def test_no_permite_novedades_que_se_cruzan(self):
+        self._vacaciones()
+
+        response = self._registrar(
+            self.manicurista, fecha=(self.fecha + timedelta(days=3)).isoformat(),
+            estado='tardanza', hora_entrada='11:00'
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_fecha_fin_anterior_al_inicio(self):
+        response = self._registrar(
+            self.manicurista, estado='ausente', tipo_ausencia='completa',
+            fecha_fin=(self.fecha - timedelta(days=1)).isoformat()
+        )
+
+        self.assertEqual(response.status_code, 400)
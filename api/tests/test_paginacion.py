@@ -0,0 +1,54 @@
+from datetime import date, time, timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from api.citas.models import Cita
+from api.clientes.models import Cliente
+from api.manicuristas.models import Manicurista
+from api.servicios.models import Servicio
+
+
+class PaginacionCursorTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='5001',
+            nombre='Cliente Paginado',
+            celular='+12345678901',
+            correo_electronico='paginado@prueba.com',
+            direccion='Calle 6'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Paula Rios', correo='paula@prueba.com')
+        self.servicio = Servicio.objects.create(
+            nombre='Manicure', precio=30000, descripcion='Manicure', duracion=30
+        )
+        inicio = date.today() + timedelta(days=1)
+        for dia in range(3):
+            for hora in (time(10, 0), time(11, 0)):
+                Cita.objects.create(
+                    cliente=self.cliente,
+                    manicurista=self.manicurista,
+                    servicio=self.servicio,
+                    fecha_cita=inicio + timedelta(days=dia),
+                    hora_cita=hora
+                )
+
+    def test_recorre_todas_las_citas_sin_repetir(self):
+        vistos = []
+        url = '/api/citas/?page_size=4'
+        while url:
+            response = self.client_api.get(url)
+            self.assertEqual(response.status_code, 200)
+            vistos.extend((c['fecha_cita'], c['hora_cita']) for c in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(vistos), 6)
+        self.assertEqual(vistos, sorted(vistos, reverse=True))
+
+    def test_catalogo_de_servicios_sin_paginar(self):
+        response = self.client_api.get('/api/servicios/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
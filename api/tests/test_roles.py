@@ -0,0 +1,170 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+from api.authentication.tokens import tokens_para_usuario
+from api.clientes.models import Cliente
+from api.roles.checks import cache_compartida
+from api.roles.models import Permiso, Rol, RolHasPermiso
+from api.roles.permisos import TienePermiso, permisos_rol, rol_tiene_permiso
+from api.usuarios.models import Usuario
+
+
+class VistaInsumos(APIView):
+    permission_classes = [TienePermiso]
+    permiso_requerido = 'insumos'
+
+    def get(self, request):
+        return Response({'usuario': request.user.id, 'cliente': request.user.cliente_id})
+
+
+class PermisosCacheadosTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client_api = APIClient()
+        self.factory = APIRequestFactory()
+        self.insumos = Permiso.objects.create(nombre='Insumos')
+        self.citas = Permiso.objects.create(nombre='Citas')
+        self.rol = Rol.objects.create(nombre='Recepcion')
+        RolHasPermiso.objects.create(rol=self.rol, permiso=self.citas)
+        self.usuario = Usuario.objects.create_user(
+            correo_electronico='recepcion@prueba.com', password='Clave123*', nombre='Recepción',
+            tipo_documento='CC', documento='7001', celular='+12345678901', rol=self.rol
+        )
+
+    def _pedir(self, usuario=None, access=None):
+        # El usuario se relee para que el token lleve la versión actual del rol
+        access = access or tokens_para_usuario(Usuario.objects.get(pk=usuario.pk)).access_token
+        request = self.factory.get('/insumos/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return VistaInsumos.as_view()(request)
+
+    def test_token_lleva_rol_y_perfiles(self):
+        cliente = Cliente.objects.create(
+            tipo_documento='CC', documento='7001', nombre='Recepción', celular='+12345678901',
+            correo_electronico='perfil@prueba.com', direccion='Calle 1', usuario=self.usuario
+        )
+
+        usuario = Usuario.objects.select_related('rol', 'cliente', 'manicurista').get(pk=self.usuario.pk)
+        access = AccessToken(str(tokens_para_usuario(usuario).access_token))
+
+        self.assertEqual(access['rol_id'], self.rol.id)
+        self.assertEqual(access['rol_version'], Rol.objects.get(pk=self.rol.pk).version_permisos)
+        self.assertEqual((access['cliente_id'], access['manicurista_id']), (cliente.id, None))
+
+    def test_login_entrega_los_claims(self):
+        response = self.client_api.post(
+            '/api/auth/login/', {'correo_electronico': 'recepcion@prueba.com', 'password': 'Clave123*'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['rol_id'], self.rol.id)
+
+    def test_peticion_autorizada_sin_consultas(self):
+        RolHasPermiso.objects.create(rol=self.rol, permiso=self.insumos)
+        access = str(tokens_para_usuario(Usuario.objects.get(pk=self.usuario.pk)).access_token)
+        self._pedir(access=access)  # calienta la cache
+
+        with self.assertNumQueries(0):
+            response = self._pedir(access=access)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['usuario'], self.usuario.id)
+
+    def test_sin_permiso_o_sin_token(self):
+        self.assertEqual(self._pedir(self.usuario).status_code, 403)
+        self.assertEqual(VistaInsumos.as_view()(self.factory.get('/insumos/')).status_code, 401)
+
+    def _autenticar(self, usuario):
+        access = tokens_para_usuario(Usuario.objects.get(pk=usuario.pk)).access_token
+        self.client_api.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def _administrador(self):
+        return Usuario.objects.create_user(
+            correo_electronico='admin@prueba.com', password='Clave123*', nombre='Admin',
+            tipo_documento='CC', documento='7002', celular='+12345678901',
+            rol=Rol.objects.create(nombre='Administrador')
+        )
+
+    def test_add_y_remove_permiso_invalidan_la_cache(self):
+        version = permisos_rol(self.rol.id)['version']
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'insumos'))
+        self._autenticar(self._administrador())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_api.post(
+                f'/api/roles/roles/{self.rol.id}/add_permiso/', {'permiso_id': self.insumos.id}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'insumos'))
+        self.assertEqual(permisos_rol(self.rol.id)['version'], version + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_api.post(
+                f'/api/roles/roles/{self.rol.id}/remove_permiso/', {'permiso_id': self.insumos.id}, format='json'
+            )
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'insumos'))
+        self.assertEqual(self._pedir(self.usuario).status_code, 403)
+
+    def test_endpoints_de_roles_exigen_el_permiso(self):
+        self.assertEqual(self.client_api.get('/api/roles/roles/').status_code, 401)
+
+        self._autenticar(self.usuario)
+        self.assertEqual(self.client_api.get('/api/roles/roles/').status_code, 403)
+
+        self._autenticar(self._administrador())
+        self.assertEqual(self.client_api.get('/api/roles/roles/').status_code, 200)
+
+    def test_token_con_version_vieja_se_rechaza_y_se_renueva(self):
+        refresh = tokens_para_usuario(self.usuario)
+        RolHasPermiso.objects.create(rol=self.rol, permiso=self.insumos)
+
+        self.assertEqual(self._pedir(access=refresh.access_token).status_code, 401)
+
+        response = self.client_api.post('/api/auth/token/refresh/', {'refresh': str(refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['rol_version'], permisos_rol(self.rol.id)['version'])
+        self.assertEqual(self._pedir(access=response.data['access']).status_code, 200)
+
+    def test_desactivar_permiso_o_rol(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RolHasPermiso.objects.create(rol=self.rol, permiso=self.insumos)
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'insumos'))
+
+        self.insumos.estado = 'inactivo'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.insumos.save()
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'insumos'))
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'citas'))
+
+        self.rol.estado = 'inactivo'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rol.save()
+        self.assertFalse(rol_tiene_permiso(self.rol.id, 'citas'))
+
+    def test_la_cache_se_descarta_al_confirmar(self):
+        version = permisos_rol(self.rol.id)['version']
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            RolHasPermiso.objects.create(rol=self.rol, permiso=self.insumos)
+            # Sin confirmar, las demás peticiones siguen viendo el conjunto anterior
+            self.assertEqual(permisos_rol(self.rol.id)['version'], version)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(permisos_rol(self.rol.id)['version'], version + 1)
+        self.assertTrue(rol_tiene_permiso(self.rol.id, 'insumos'))
+
+    def test_exige_una_cache_compartida(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([error.id for error in cache_compartida(None)], ['roles.E001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(cache_compartida(None), [])
+
+    def test_administrador_tiene_todos_los_permisos(self):
+        administrador = Rol.objects.create(nombre='Administrador')
+
+        self.assertTrue(rol_tiene_permiso(administrador.id, 'insumos'))
+        self.assertTrue(rol_tiene_permiso(administrador.id, 'citas'))
@@ -0,0 +1,144 @@
+import json
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from urllib.parse import parse_qs
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.servicios.imagenes import TAMANOS_MINIATURA, ruta_miniatura
+from api.servicios.models import Servicio
+
+
+class HostImagenesFalso(BaseHTTPRequestHandler):
+    """Imita la API de subida de ImgBB y registra el puerto de cada cliente"""
+    protocol_version = 'HTTP/1.1'
+    subidas = []
+    falla = False
+
+    def do_POST(self):
+        datos = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        HostImagenesFalso.subidas.append((self.client_address[1], datos['name'][0]))
+        if HostImagenesFalso.falla:
+            cuerpo, codigo = b'{"error": "caido"}', 400
+        else:
+            cuerpo = json.dumps({'data': {'url': f"https://i.falso/{datos['name'][0]}"}}).encode()
+            codigo = 200
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ImagenesServicioTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), HostImagenesFalso)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+        cls.media = tempfile.mkdtemp()
+        cls.ajustes = override_settings(
+            MEDIA_ROOT=cls.media,
+            IMGBB_API_KEY='clave-prueba',
+            IMGBB_UPLOAD_URL=f'http://127.0.0.1:{cls.servidor.server_port}/1/upload'
+        )
+        cls.ajustes.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        shutil.rmtree(cls.media, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client_api = APIClient()
+        HostImagenesFalso.subidas = []
+        HostImagenesFalso.falla = False
+
+    def _imagen(self, nombre='unas.png', tamano=(800, 600)):
+        contenido = BytesIO()
+        Image.new('RGB', tamano, (200, 30, 90)).save(contenido, 'PNG')
+        return SimpleUploadedFile(nombre, contenido.getvalue(), content_type='image/png')
+
+    def _crear(self, nombre='Manicure Gel', imagen=None):
+        return self.client_api.post('/api/servicios/', {
+            'nombre': nombre, 'precio': '45000', 'descripcion': 'Manicure con esmalte en gel',
+            'duracion': 60, 'imagen': imagen or self._imagen(f'{nombre}.png'),
+        }, format='multipart')
+
+    def test_crear_guarda_local_con_miniaturas_sin_llamar_al_host(self):
+        response = self._crear()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(HostImagenesFalso.subidas, [])
+        servicio = Servicio.objects.get()
+        self.assertEqual(servicio.imagen_estado, 'pendiente')
+        self.assertTrue(default_storage.exists(servicio.imagen_archivo.name))
+        self.assertTrue(response.data['imagen'].endswith(servicio.imagen_archivo.url))
+        self.assertEqual(set(response.data['miniaturas']), set(TAMANOS_MINIATURA))
+
+        with default_storage.open(ruta_miniatura(servicio.imagen_archivo.name, 'pequena')) as archivo:
+            miniatura = Image.open(archivo)
+            self.assertEqual((miniatura.format, max(miniatura.size)), ('WEBP', TAMANOS_MINIATURA['pequena']))
+
+    def test_archivo_que_no_es_imagen(self):
+        falso = SimpleUploadedFile('nota.png', b'no soy una imagen', content_type='image/png')
+
+        response = self._crear(imagen=falso)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Servicio.objects.exists())
+
+    def test_comando_sube_pendientes_por_una_conexion(self):
+        for nombre in ('Manicure Gel', 'Pedicure Spa', 'Uñas Acrílicas'):
+            self._crear(nombre)
+
+        salida = StringIO()
+        call_command('subir_imagenes_servicios', stdout=salida)
+
+        self.assertIn('Imágenes subidas: 3', salida.getvalue())
+        self.assertEqual(len(HostImagenesFalso.subidas), 3)
+        # Todas las subidas llegaron desde el mismo puerto: la conexión se reutilizó
+        self.assertEqual(len({puerto for puerto, _ in HostImagenesFalso.subidas}), 1)
+        self.assertFalse(Servicio.objects.exclude(imagen_estado='subida').exists())
+        self.assertTrue(all(s.imagen.startswith('https://i.falso/') for s in Servicio.objects.all()))
+
+    def test_host_caido_deja_la_imagen_local(self):
+        self._crear()
+        imagen_local = Servicio.objects.get().imagen
+        HostImagenesFalso.falla = True
+
+        call_command('subir_imagenes_servicios', '--max-intentos', '2', stdout=StringIO())
+        self.assertEqual(Servicio.objects.get().imagen_estado, 'pendiente')
+        call_command('subir_imagenes_servicios', '--max-intentos', '2', stdout=StringIO())
+
+        servicio = Servicio.objects.get()
+        self.assertEqual((servicio.imagen_estado, servicio.imagen_intentos), ('fallida', 2))
+        self.assertEqual(servicio.imagen, imagen_local)
+
+    def test_reemplazar_imagen_borra_la_anterior(self):
+        self._crear()
+        servicio = Servicio.objects.get()
+        anterior = servicio.imagen_archivo.name
+
+        response = self.client_api.patch(
+            f'/api/servicios/{servicio.id}/', {'imagen': self._imagen('nueva.png')}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        servicio.refresh_from_db()
+        self.assertNotEqual(servicio.imagen_archivo.name, anterior)
+        self.assertFalse(default_storage.exists(anterior))
+        self.assertFalse(default_storage.exists(ruta_miniatura(anterior, 'mediana')))
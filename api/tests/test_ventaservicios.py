@@ -0,0 +1,365 @@
+from datetime import time, timedelta
+from importlib import import_module
+from decimal import Decimal
+from django.apps import apps
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.citas.models import Cita
+from api.clientes.models import Cliente
+from api.manicuristas.models import Manicurista
+from api.servicios.models import Servicio
+from api.ventaservicios.models import VentaServicio, DetalleVentaServicio, VentaDiaria, totales_diferidos
+from api.ventaservicios.rollup import reconstruir_ventas_diarias
+
+
+class EstadisticasVentasTestCase(TestCase):
+
+    def setUp(self):
+        self.client_api = APIClient()
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='7001',
+            nombre='Cliente Ventas',
+            celular='+12345678901',
+            correo_electronico='ventas@prueba.com',
+            direccion='Calle 8'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Rosa Vega', correo='rosa@prueba.com')
+        self.servicio = Servicio.objects.create(
+            nombre='Manicure', precio=30000, descripcion='Manicure', duracion=30
+        )
+        ahora = timezone.now()
+        VentaServicio.objects.bulk_create([
+            VentaServicio(cliente=self.cliente, manicurista=self.manicurista, total=Decimal('100'),
+                          comision_manicurista=Decimal('10'), estado='pagada', metodo_pago='efectivo',
+                          fecha_venta=ahora),
+            VentaServicio(cliente=self.cliente, manicurista=self.manicurista, total=Decimal('50'),
+                          estado='pagada', metodo_pago='transferencia', fecha_venta=ahora),
+            VentaServicio(cliente=self.cliente, manicurista=self.manicurista, total=Decimal('70'),
+                          estado='pendiente', fecha_venta=ahora),
+            VentaServicio(cliente=self.cliente, manicurista=self.manicurista, total=Decimal('999'),
+                          estado='pagada', fecha_venta=ahora - timedelta(days=40)),
+        ])
+        # bulk_create no dispara señales: el resumen se arma con la reconstrucción
+        reconstruir_ventas_diarias()
+
+    def test_estadisticas_con_agregacion_condicional(self):
+        hoy = timezone.localdate().isoformat()
+        with self.assertNumQueries(3):
+            response = self.client_api.get('/api/venta-servicios/estadisticas/', {'desde': hoy, 'hasta': hoy})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_ventas'], 4)
+        self.assertEqual(response.data['ventas_hoy'], 3)
+        self.assertEqual(response.data['ventas_pendientes'], 1)
+        self.assertEqual(response.data['ingresos_hoy'], 150)
+        self.assertEqual(response.data['periodo']['ventas'], 3)
+        self.assertEqual(response.data['periodo']['comisiones'], 10)
+        self.assertEqual(
+            [(m['metodo_pago'], m['count']) for m in response.data['por_metodo_pago']],
+            [('efectivo', 2), ('transferencia', 1)]
+        )
+        self.assertEqual(response.data['manicuristas_top'][0]['total_ventas'], 3)
+
+    def test_reporte_comisiones_desde_resumen(self):
+        response = self.client_api.get('/api/venta-servicios/reporte_comisiones/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        fila = response.data[0]
+        self.assertEqual(fila['manicurista__nombre'], 'Rosa Vega')
+        self.assertEqual(fila['total_ventas'], 3)
+        self.assertEqual(fila['total_ingresos'], Decimal('1149'))
+        self.assertEqual(fila['promedio_venta'], Decimal('383'))
+
+    def test_filtros_del_listado(self):
+        hace_diez_dias = (timezone.localdate() - timedelta(days=10)).isoformat()
+        otro_cliente = Cliente.objects.create(
+            tipo_documento='CC', documento='7002', nombre='Otro Cliente', celular='+12345678902',
+            correo_electronico='otro.ventas@prueba.com', direccion='Calle 9'
+        )
+
+        def estadisticas(**params):
+            return self.client_api.get('/api/venta-servicios/estadisticas/', params).data
+
+        self.assertEqual(estadisticas(fecha_desde=hace_diez_dias)['total_ventas'], 3)
+        # El resumen no guarda el cliente: con ese filtro se agregan las ventas
+        en_vivo = estadisticas(fecha_desde=hace_diez_dias, cliente=self.cliente.id)
+        self.assertEqual((en_vivo['total_ventas'], en_vivo['periodo']['comisiones']), (3, 10))
+        self.assertEqual(estadisticas(cliente=otro_cliente.id)['total_ventas'], 0)
+
+        comisiones = self.client_api.get(
+            '/api/venta-servicios/reporte_comisiones/', {'fecha_desde': hace_diez_dias, 'cliente': self.cliente.id}
+        ).data
+        self.assertEqual((comisiones[0]['total_ventas'], comisiones[0]['total_ingresos']), (2, Decimal('150')))
+
+    def test_migracion_llena_el_resumen(self):
+        # La migración copia el cálculo del rollup: deben dar las mismas filas
+        columnas = (
+            'fecha', 'manicurista_id', 'servicio_id', 'estado', 'metodo_pago',
+            'cantidad_ventas', 'cantidad_servicios', 'total', 'comision'
+        )
+        esperado = sorted(VentaDiaria.objects.values_list(*columnas), key=str)
+        VentaDiaria.objects.all().delete()
+
+        import_module('api.ventaservicios.migrations.0007_llenar_ventadiaria').llenar_ventas_diarias(apps, None)
+
+        self.assertEqual(sorted(VentaDiaria.objects.values_list(*columnas), key=str), esperado)
+
+
+class VentaDiariaTestCase(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='7002',
+            nombre='Cliente Resumen',
+            celular='+12345678901',
+            correo_electronico='resumen@prueba.com',
+            direccion='Calle 9'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Lina Mora', correo='lina@prueba.com')
+        self.manicure = Servicio.objects.create(nombre='Manicure', precio=30000, descripcion='Manicure', duracion=30)
+        self.pedicure = Servicio.objects.create(nombre='Pedicure', precio=40000, descripcion='Pedicure', duracion=45)
+        self.hoy = timezone.localdate()
+
+    def _crear_venta(self, estado='pendiente'):
+        venta = VentaServicio.objects.bulk_create([
+            VentaServicio(cliente=self.cliente, manicurista=self.manicurista, total=Decimal('0'),
+                          estado=estado, porcentaje_comision=Decimal('10'), fecha_venta=timezone.now())
+        ])[0]
+        DetalleVentaServicio.objects.bulk_create([
+            DetalleVentaServicio(venta=venta, servicio=self.manicure, cantidad=2,
+                                 precio_unitario=Decimal('30000'), subtotal=Decimal('60000')),
+            DetalleVentaServicio(venta=venta, servicio=self.pedicure, cantidad=1,
+                                 precio_unitario=Decimal('40000'), subtotal=Decimal('40000')),
+        ])
+        VentaServicio.objects.filter(pk=venta.pk).update(total=Decimal('100000'), comision_manicurista=Decimal('10000'))
+        venta.refresh_from_db()
+        return venta
+
+    def test_reconstruccion_separa_resumen_y_servicios(self):
+        self._crear_venta(estado='pagada')
+        reconstruir_ventas_diarias()
+
+        resumen = VentaDiaria.objects.get(servicio__isnull=True)
+        self.assertEqual((resumen.fecha, resumen.estado), (self.hoy, 'pagada'))
+        self.assertEqual(resumen.cantidad_ventas, 1)
+        self.assertEqual(resumen.cantidad_servicios, 3)
+        self.assertEqual(resumen.total, Decimal('100000'))
+        self.assertEqual(resumen.comision, Decimal('10000'))
+
+        manicure = VentaDiaria.objects.get(servicio=self.manicure)
+        self.assertEqual(manicure.cantidad_servicios, 2)
+        self.assertEqual(manicure.total, Decimal('60000'))
+        self.assertEqual(manicure.comision, Decimal('6000'))
+
+    def test_cambio_de_estado_actualiza_resumen(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            venta = self._crear_venta()
+        reconstruir_ventas_diarias()
+        self.assertTrue(VentaDiaria.objects.filter(estado='pendiente').exists())
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            venta.estado = 'pagada'
+            venta.save()
+            venta.detalles.first().save()
+
+        # Varias señales del mismo día producen un solo recálculo
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(VentaDiaria.objects.filter(estado='pendiente').exists())
+        self.assertEqual(VentaDiaria.objects.filter(estado='pagada').count(), 3)
+
+    def test_transaccion_revertida_no_bloquea_el_siguiente_recalculo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            venta = self._crear_venta()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    venta.estado = 'cancelada'
+                    venta.save()
+                    raise ValueError('revertir')
+            except ValueError:
+                pass
+            venta.estado = 'pagada'
+            venta.save()
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(set(VentaDiaria.objects.values_list('estado', flat=True)), {'pagada'})
+
+    def test_eliminar_venta_limpia_resumen(self):
+        venta = self._crear_venta(estado='pagada')
+        reconstruir_ventas_diarias()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            venta.delete()
+
+        self.assertFalse(VentaDiaria.objects.exists())
+
+    def test_top_vendidos_usa_resumen(self):
+        self._crear_venta(estado='pagada')
+        reconstruir_ventas_diarias()
+
+        response = APIClient().get('/api/servicios/top_vendidos/', {'limit': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['nombre'] for s in response.data], ['Manicure', 'Pedicure'])
+
+
+class CrearVentaConDetallesTestCase(TestCase):
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='7003',
+            nombre='Cliente Lote',
+            celular='+12345678901',
+            correo_electronico='lote@prueba.com',
+            direccion='Calle 10'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Eva Ruiz', correo='eva@prueba.com')
+        self.servicios = [
+            Servicio.objects.create(nombre=f'Servicio {i}', precio=10000 + i * 1000, descripcion='Lote', duracion=30)
+            for i in range(10)
+        ]
+
+    def _detalles(self, cantidad=10):
+        return [
+            {
+                'servicio': servicio,
+                'cantidad': 1 + i % 3,
+                'precio_unitario': Decimal(servicio.precio),
+                'descuento_linea': Decimal('500') if i % 4 == 0 else Decimal('0'),
+            }
+            for i, servicio in enumerate(self.servicios[:cantidad])
+        ]
+
+    def _venta_por_filas(self, detalles, **datos):
+        """Camino anterior: un create por detalle, con la señal recalculando cada vez"""
+        venta = VentaServicio.objects.create(cliente=self.cliente, manicurista=self.manicurista, total=0, **datos)
+        for detalle in detalles:
+            DetalleVentaServicio.objects.create(venta=venta, **detalle)
+        venta.refresh_from_db()
+        return venta
+
+    def _venta_en_lote(self, detalles, **datos):
+        venta = VentaServicio.objects.create_with_detalles(
+            detalles, cliente=self.cliente, manicurista=self.manicurista, total=0, **datos
+        )
+        venta.refresh_from_db()
+        return venta
+
+    def test_equivalente_a_la_senal_por_fila(self):
+        casos = [
+            {},
+            {'porcentaje_comision': Decimal('12.5')},
+            {'porcentaje_comision': Decimal('40'), 'descuento': Decimal('3000'), 'estado': 'pagada'},
+        ]
+        for datos in casos:
+            with self.subTest(**datos):
+                por_filas = self._venta_por_filas(self._detalles(), **datos)
+                en_lote = self._venta_en_lote(self._detalles(), **datos)
+
+                subtotales = sum(
+                    d['precio_unitario'] * d['cantidad'] - d['descuento_linea'] for d in self._detalles()
+                )
+                total_esperado = subtotales - datos.get('descuento', 0)
+                comision_esperada = total_esperado * datos.get('porcentaje_comision', 0) / 100
+                self.assertEqual(por_filas.total, total_esperado)
+                self.assertEqual(por_filas.comision_manicurista, comision_esperada.quantize(Decimal('0.01')))
+                self.assertEqual(en_lote.total, por_filas.total)
+                self.assertEqual(en_lote.comision_manicurista, por_filas.comision_manicurista)
+                self.assertEqual(
+                    list(en_lote.detalles.order_by('servicio_id').values_list('servicio_id', 'cantidad', 'subtotal')),
+                    list(por_filas.detalles.order_by('servicio_id').values_list('servicio_id', 'cantidad', 'subtotal'))
+                )
+                self.assertEqual(en_lote.fecha_pago is None, por_filas.fecha_pago is None)
+
+    def test_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as una_linea:
+            VentaServicio.objects.create_with_detalles(
+                self._detalles(1), cliente=self.cliente, manicurista=self.manicurista, total=0
+            )
+        with CaptureQueriesContext(connection) as diez_lineas:
+            VentaServicio.objects.create_with_detalles(
+                self._detalles(10), cliente=self.cliente, manicurista=self.manicurista, total=0
+            )
+
+        self.assertEqual(len(diez_lineas), len(una_linea))
+
+    def test_totales_diferidos_recalcula_una_vez(self):
+        venta = self._venta_en_lote(self._detalles(2), porcentaje_comision=Decimal('10'))
+
+        with CaptureQueriesContext(connection) as consultas:
+            with totales_diferidos(venta):
+                for detalle in self._detalles(10)[2:]:
+                    DetalleVentaServicio.objects.create(venta=venta, **detalle)
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.total, self._venta_por_filas(self._detalles(10), porcentaje_comision=Decimal('10')).total)
+        # Un INSERT por detalle más el agregado y el UPDATE finales
+        self.assertEqual(len(consultas), 8 + 2)
+
+
+class ListadoVentasConsultasTestCase(TestCase):
+
+    def setUp(self):
+        self.client_api = APIClient()
+        self.cliente = Cliente.objects.create(
+            tipo_documento='CC',
+            documento='7004',
+            nombre='Cliente Listado',
+            celular='+12345678901',
+            correo_electronico='listado@prueba.com',
+            direccion='Calle 11'
+        )
+        self.manicurista = Manicurista.objects.create(nombre='Ana Paz', correo='ana@prueba.com')
+        self.servicio = Servicio.objects.create(nombre='Manicure', precio=30000, descripcion='Manicure', duracion=30)
+        self.dia = 0
+
+    def _crear_ventas(self, cantidad):
+        for _ in range(cantidad):
+            self.dia += 1
+            cita = Cita.objects.create(
+                cliente=self.cliente, manicurista=self.manicurista, servicio=self.servicio,
+                fecha_cita=timezone.localdate() - timedelta(days=self.dia), hora_cita=time(10, 0),
+                estado='finalizada'
+            )
+            cita.servicios.add(self.servicio)
+            venta = VentaServicio.objects.create_with_detalles(
+                [{'servicio': self.servicio, 'cantidad': 2, 'precio_unitario': Decimal('30000')}],
+                cliente=self.cliente, manicurista=self.manicurista, total=0
+            )
+            venta.citas.add(cita)
+
+    def _listar(self):
+        return self.client_api.get('/api/venta-servicios/')
+
+    def test_listado_con_consultas_constantes(self):
+        self._crear_ventas(2)
+        with CaptureQueriesContext(connection) as pocas:
+            self._listar()
+
+        self._crear_ventas(8)
+        # Ventas + citas + servicios de las citas + detalles + servicios de los detalles
+        with self.assertNumQueries(5):
+            response = self._listar()
+
+        self.assertEqual(len(pocas), 5)
+        self.assertEqual(len(response.data['results']), 10)
+        venta = response.data['results'][0]
+        self.assertEqual(venta['subtotal'], Decimal('60000'))
+        self.assertTrue(venta['es_desde_cita'])
+        self.assertEqual(len(venta['citas_ids']), 1)
+        self.assertEqual(venta['citas_info'][0]['servicios'], [self.servicio.id])
+
+    def test_propiedades_sin_queryset_anotado(self):
+        self._crear_ventas(1)
+        venta = VentaServicio.objects.get()
+
+        self.assertEqual(venta.subtotal, Decimal('60000'))
+        self.assertTrue(venta.es_desde_cita)
@@ -3,8 +3,8 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.contrib.auth.hashers import make_password
 from django.db import transaction
-from django.core.mail import send_mail
-from django.conf import settings
+from api.authentication.login import ErrorLogin, autenticar, datos_sesion
+from api.utils.email_utils import encolar_correo
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from .models import Usuario
@@ -209,13 +209,11 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         ¡Gracias y bienvenido al equipo!
         """
         
-        send_mail(
+        encolar_correo(
+            [usuario.correo_electronico],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [usuario.correo_electronico],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
 
     # --- Acciones Personalizadas ---
@@ -258,48 +256,21 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         """
         serializer = LoginUsuarioSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        
-        correo_electronico = serializer.validated_data['correo_electronico']
-        contraseña = serializer.validated_data['contraseña']
-        
+
         try:
-            usuario = Usuario.objects.get(correo_electronico=correo_electronico)
-            
-            # Verificar si debe usar contraseña temporal o contraseña normal
-            if usuario.debe_cambiar_contraseña and usuario.contraseña_temporal:
-                # Verificar contraseña temporal
-                if not usuario.verificar_contraseña_temporal(contraseña):
-                    return Response(
-                        {'error': 'Credenciales incorrectas'}, 
-                        status=status.HTTP_401_UNAUTHORIZED
-                    )
-            else:
-                # Verificar contraseña normal
-                if not usuario.check_password(contraseña):
-                    return Response(
-                        {'error': 'Credenciales incorrectas'}, 
-                        status=status.HTTP_401_UNAUTHORIZED
-                    )
-            
-            if not usuario.is_active:
-                return Response(
-                    {'error': 'Cuenta inactiva. Contacta al administrador'}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-            
-            response_data = {
-                'mensaje': 'Login exitoso',
-                'usuario': UsuarioDetailSerializer(usuario).data,
-                'debe_cambiar_contraseña': usuario.debe_cambiar_contraseña
-            }
-            
-            return Response(response_data)
-            
-        except Usuario.DoesNotExist:
-            return Response(
-                {'error': 'Credenciales incorrectas'}, 
-                status=status.HTTP_401_UNAUTHORIZED
+            usuario = autenticar(
+                serializer.validated_data['contraseña'],
+                correo_electronico=serializer.validated_data['correo_electronico']
             )
+        except ErrorLogin as e:
+            return Response({'error': e.mensaje}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response({
+            'mensaje': 'Login exitoso',
+            'usuario': UsuarioDetailSerializer(usuario).data,
+            'debe_cambiar_contraseña': usuario.debe_cambiar_contraseña,
+            **datos_sesion(usuario)
+        })
     
     @action(detail=True, methods=['post'], url_path='cambiar-contraseña')
     def cambiar_contraseña(self, request, pk=None):
@@ -388,13 +359,11 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         ¡Tu cuenta está segura!
         """
         
-        send_mail(
+        encolar_correo(
+            [usuario.correo_electronico],
             asunto,
             mensaje_texto,
-            settings.DEFAULT_FROM_EMAIL,
-            [usuario.correo_electronico],
-            html_message=mensaje_html,
-            fail_silently=False,
+            mensaje_html=mensaje_html,
         )
             
     @action(detail=True, methods=['post'], url_path='cambiar-password')
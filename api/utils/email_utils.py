@@ -1,17 +1,178 @@
-from django.core.mail import send_mail
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CorreoPendiente
+
+
+# Reintentos: 1, 2, 4, 8... minutos entre intentos, hasta MAX_INTENTOS
+MAX_INTENTOS = getattr(settings, 'CORREO_MAX_INTENTOS', 5)
+ESPERA_BASE = timedelta(minutes=1)
+ESPERA_MAXIMA = timedelta(hours=1)
+# Un correo tomado por un worker que no terminó (se cayó) vuelve a la cola después de este plazo
+PLAZO_ENVIO = timedelta(minutes=10)
+
+
+def _nuevo_correo(destinatarios, asunto, mensaje, mensaje_html=None, remitente=None):
+    if isinstance(destinatarios, str):
+        destinatarios = [destinatarios]
+    return CorreoPendiente(
+        asunto=asunto,
+        mensaje=mensaje,
+        mensaje_html=mensaje_html,
+        remitente=remitente or settings.DEFAULT_FROM_EMAIL or '',
+        destinatarios=[d for d in destinatarios if d],
+    )
+
+
+def encolar_correo(destinatarios, asunto, mensaje, mensaje_html=None, remitente=None):
+    """
+    Dejar un correo en la bandeja de salida para que lo envíe el worker.
+
+    Si se llama dentro de una transacción, el correo solo queda encolado si
+    la transacción se confirma.
+    """
+    correo = _nuevo_correo(destinatarios, asunto, mensaje, mensaje_html, remitente)
+    correo.save()
+    return correo
+
+
+def encolar_correos(correos):
+    """
+    Encolar varios correos con un solo INSERT.
+
+    `correos` es una lista de diccionarios con los mismos argumentos de
+    `encolar_correo` (destinatarios, asunto, mensaje, ...).
+    """
+    return CorreoPendiente.objects.bulk_create([_nuevo_correo(**datos) for datos in correos])
+
 
 def enviar_correo(destinatario, asunto, mensaje):
-    """Envía un correo electrónico"""
+    """Encola un correo electrónico"""
     try:
-        send_mail(
-            subject=asunto,
-            message=mensaje,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[destinatario],
-            fail_silently=False,
-        )
+        encolar_correo(destinatario, asunto, mensaje, remitente=settings.EMAIL_HOST_USER)
         return True
     except Exception as e:
-        print(f"Error al enviar correo: {e}")
-        return False
\ No newline at end of file
+        print(f"Error al encolar correo: {e}")
+        return False
+
+
+def _construir_mensaje(correo, conexion):
+    mensaje = EmailMultiAlternatives(
+        subject=correo.asunto,
+        body=correo.mensaje,
+        from_email=correo.remitente or None,
+        to=correo.destinatarios,
+        connection=conexion,
+    )
+    if correo.mensaje_html:
+        mensaje.attach_alternative(correo.mensaje_html, 'text/html')
+    return mensaje
+
+
+def espera_reintento(intentos):
+    """Tiempo de espera antes del siguiente intento (exponencial, con tope)"""
+    return min(ESPERA_BASE * (2 ** max(intentos - 1, 0)), ESPERA_MAXIMA)
+
+
+def _registrar_error(correo, error, ahora, max_intentos):
+    """Reprogramar un correo que falló, o marcarlo 'fallido' si agotó los intentos"""
+    correo.ultimo_error = str(error)
+    if correo.intentos >= max_intentos:
+        correo.estado = 'fallido'
+    else:
+        correo.estado = 'pendiente'
+        correo.proximo_intento = ahora + espera_reintento(correo.intentos)
+
+
+def _descartar_contenido(correo):
+    """
+    Borrar el cuerpo de un correo que ya no se va a enviar.
+
+    Los correos de bienvenida y recuperación llevan contraseñas temporales y
+    códigos; no se guardan después de enviados o de marcados como fallidos.
+    """
+    if correo.estado in ('enviado', 'fallido'):
+        correo.mensaje = ''
+        correo.mensaje_html = None
+
+
+def _tomar_lote(lote, ahora):
+    """
+    Marcar como 'enviando' un lote de correos listos para enviar.
+
+    Los correos se toman en una transacción corta: skip_locked permite varios
+    workers sin que tomen los mismos, y los bloqueos se liberan antes de
+    hablar con el servidor SMTP. `proximo_intento` pasa a ser el vencimiento
+    del plazo; si el worker se cae, el correo se vuelve a tomar al vencer.
+    """
+    with transaction.atomic():
+        correos = list(
+            CorreoPendiente.objects.select_for_update(skip_locked=True).filter(
+                estado__in=('pendiente', 'enviando'), proximo_intento__lte=ahora
+            ).order_by('proximo_intento', 'id')[:lote]
+        )
+        for correo in correos:
+            # El intento cuenta al tomarlo: un correo que tumba al worker no se reintenta sin fin
+            correo.intentos += 1
+            correo.estado = 'enviando'
+            correo.proximo_intento = ahora + PLAZO_ENVIO
+        CorreoPendiente.objects.bulk_update(correos, ['estado', 'intentos', 'proximo_intento'])
+    return correos
+
+
+def procesar_cola(lote=50, max_intentos=MAX_INTENTOS, conexion=None):
+    """
+    Enviar un lote de correos pendientes por una sola conexión.
+
+    Retorna (enviados, fallidos). Un correo que falla se reprograma con
+    espera creciente; al llegar a `max_intentos` queda como 'fallido'. Si no
+    se puede abrir la conexión (servidor SMTP caído) falla el lote completo
+    con la misma regla. El envío ocurre fuera de la transacción que toma el
+    lote (ver `_tomar_lote`).
+    """
+    ahora = timezone.now()
+    enviados = fallidos = 0
+
+    correos = _tomar_lote(lote, ahora)
+    if not correos:
+        return 0, 0
+
+    conexion = conexion or get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as e:
+        for correo in correos:
+            _registrar_error(correo, e, ahora, max_intentos)
+        fallidos = len(correos)
+        print(f"Error abriendo la conexión de correo ({fallidos} correos reprogramados): {e}")
+    else:
+        try:
+            for correo in correos:
+                try:
+                    if not correo.destinatarios:
+                        raise ValueError('El correo no tiene destinatarios')
+                    conexion.send_messages([_construir_mensaje(correo, conexion)])
+                except Exception as e:
+                    fallidos += 1
+                    _registrar_error(correo, e, ahora, max_intentos)
+                    print(f"Error enviando correo {correo.id} (intento {correo.intentos}): {e}")
+                else:
+                    enviados += 1
+                    correo.estado = 'enviado'
+                    correo.fecha_envio = timezone.now()
+                    correo.ultimo_error = None
+        finally:
+            conexion.close()
+
+    for correo in correos:
+        _descartar_contenido(correo)
+    CorreoPendiente.objects.bulk_update(
+        correos, ['estado', 'intentos', 'proximo_intento', 'ultimo_error', 'fecha_envio',
+                  'mensaje', 'mensaje_html']
+    )
+
+    return enviados, fallidos
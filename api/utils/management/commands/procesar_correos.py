@@ -0,0 +1,53 @@
+"""
+Enviar los correos de la bandeja de salida (CorreoPendiente).
+
+Uso:
+
+    python manage.py procesar_correos                 # procesa lo pendiente y termina
+    python manage.py procesar_correos --continuo      # worker: revisa la cola cada --intervalo segundos
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.utils.email_utils import MAX_INTENTOS, procesar_cola
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos pendientes por lotes, reutilizando una conexión SMTP por lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Correos por lote (una conexión por lote)')
+        parser.add_argument('--max-intentos', type=int, default=MAX_INTENTOS,
+                            help='Intentos antes de marcar un correo como fallido')
+        parser.add_argument('--continuo', action='store_true', help='Seguir revisando la cola indefinidamente')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre revisiones en modo continuo')
+
+    def handle(self, *args, **options):
+        total_enviados = total_fallidos = 0
+
+        while True:
+            try:
+                enviados, fallidos = procesar_cola(options['lote'], options['max_intentos'])
+            except Exception as e:
+                # En modo continuo un error (p. ej. la base de datos) no detiene el worker
+                if not options['continuo']:
+                    raise
+                self.stderr.write(f'Error procesando la cola de correos: {e}')
+                time.sleep(options['intervalo'])
+                continue
+            total_enviados += enviados
+            total_fallidos += fallidos
+            if enviados or fallidos:
+                self.stdout.write(f'Lote: {enviados} enviados, {fallidos} con error')
+
+            # Si el lote vino lleno puede haber más pendientes: seguir sin esperar
+            if enviados + fallidos >= options['lote']:
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Correos enviados: {total_enviados}, con error: {total_fallidos}'
+        ))
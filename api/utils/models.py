@@ -0,0 +1,50 @@
+from django.db import models
+from django.utils import timezone
+
+
+class CorreoPendiente(models.Model):
+    """
+    Bandeja de salida de correos.
+
+    Las vistas no envían correos directamente: los encolan con
+    `api.utils.email_utils.encolar_correo` y el comando
+    `python manage.py procesar_correos` los envía por lotes reutilizando una
+    sola conexión SMTP, con reintentos y espera creciente entre intentos.
+
+    El cuerpo (mensaje / mensaje_html) se borra cuando el correo queda
+    enviado o fallido: puede contener contraseñas temporales o códigos.
+
+    Mientras un worker lo envía, el correo está 'enviando' y `proximo_intento`
+    es el vencimiento de ese plazo.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    asunto = models.CharField(max_length=255)
+    mensaje = models.TextField()
+    mensaje_html = models.TextField(blank=True, null=True)
+    remitente = models.CharField(max_length=255, blank=True, default='')
+    destinatarios = models.JSONField(default=list)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True, null=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'correos_pendientes'
+        verbose_name = 'Correo pendiente'
+        verbose_name_plural = 'Correos pendientes'
+        ordering = ['id']
+        indexes = [
+            # Lo que consulta el worker: pendientes cuyo próximo intento ya llegó
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_estado_intento_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {', '.join(self.destinatarios)} ({self.estado})"
@@ -0,0 +1,31 @@
+"""
+Reconstruir el resumen diario de ventas (VentaDiaria) desde las ventas.
+
+Uso:
+
+    python manage.py reconstruir_ventas_diarias
+    python manage.py reconstruir_ventas_diarias --desde 2024-01-01 --hasta 2024-01-31
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ventaservicios.rollup import reconstruir_ventas_diarias
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla VentaDiaria a partir de las ventas de servicios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD), inclusive')
+        parser.add_argument('--hasta', help='Fecha final (YYYY-MM-DD), inclusive')
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else None
+            hasta = datetime.strptime(options['hasta'], '%Y-%m-%d').date() if options['hasta'] else None
+        except ValueError:
+            raise CommandError('Formato de fecha inválido. Use YYYY-MM-DD')
+
+        filas = reconstruir_ventas_diarias(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f'VentaDiaria reconstruida: {filas} filas'))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas', '0006_cita_cita_manic_fecha_estado_idx_and_more'),
+        ('clientes', '0004_remove_cliente_password_cliente_usuario_and_more'),
+        ('manicuristas', '0003_manicurista_especialidad'),
+        ('servicios', '0001_initial'),
+        ('ventaservicios', '0004_alter_detalleventaservicio_subtotal_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ventaservicio',
+            index=models.Index(fields=['manicurista', 'fecha_venta', 'estado'], name='venta_manic_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaservicio',
+            index=models.Index(fields=['estado', 'fecha_venta'], name='venta_estado_fecha_idx'),
+        ),
+    ]
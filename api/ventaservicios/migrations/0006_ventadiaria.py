@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 01:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manicuristas', '0003_manicurista_especialidad'),
+        ('servicios', '0001_initial'),
+        ('ventaservicios', '0005_ventaservicio_venta_manic_fecha_estado_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('transferencia', 'Transferencia')], max_length=20, verbose_name='Método de pago')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('pagada', 'Pagada'), ('cancelada', 'Cancelada')], max_length=20, verbose_name='Estado')),
+                ('cantidad_ventas', models.PositiveIntegerField(default=0, verbose_name='Cantidad de ventas')),
+                ('cantidad_servicios', models.PositiveIntegerField(default=0, verbose_name='Cantidad de servicios')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total')),
+                ('comision', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Comisión')),
+                ('manicurista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='manicuristas.manicurista', verbose_name='Manicurista')),
+                ('servicio', models.ForeignKey(blank=True, help_text='Vacío en las filas de resumen de ventas', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='servicios.servicio', verbose_name='Servicio')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'estado'], name='ventadiaria_fecha_estado_idx')],
+                'unique_together': {('fecha', 'manicurista', 'servicio', 'metodo_pago', 'estado')},
+            },
+        ),
+    ]
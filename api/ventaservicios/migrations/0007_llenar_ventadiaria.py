@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def _fecha_local(fecha_venta):
+    if timezone.is_aware(fecha_venta):
+        return timezone.localtime(fecha_venta).date()
+    return fecha_venta.date()
+
+
+def llenar_ventas_diarias(apps, schema_editor):
+    """
+    Calcular VentaDiaria para las ventas existentes.
+
+    Es una copia del cálculo de rollup.agregar_ventas en el estado de este
+    esquema; la migración no importa el módulo vivo, que puede cambiar.
+    """
+    VentaServicio = apps.get_model('ventaservicios', 'VentaServicio')
+    DetalleVentaServicio = apps.get_model('ventaservicios', 'DetalleVentaServicio')
+    VentaDiaria = apps.get_model('ventaservicios', 'VentaDiaria')
+
+    filas = {}
+
+    def fila(llave):
+        if llave not in filas:
+            fecha, manicurista_id, servicio_id, metodo_pago, estado = llave
+            filas[llave] = VentaDiaria(
+                fecha=fecha, manicurista_id=manicurista_id, servicio_id=servicio_id,
+                metodo_pago=metodo_pago, estado=estado, total=Decimal('0'), comision=Decimal('0'),
+            )
+        return filas[llave]
+
+    datos_ventas = {}
+    for (venta_id, fecha_venta, manicurista_id, servicio_id, metodo_pago, estado,
+         cantidad, total, comision, porcentaje) in VentaServicio.objects.values_list(
+        'id', 'fecha_venta', 'manicurista_id', 'servicio_id', 'metodo_pago', 'estado',
+        'cantidad', 'total', 'comision_manicurista', 'porcentaje_comision'
+    ).iterator():
+        fecha = _fecha_local(fecha_venta)
+        total = total or Decimal('0')
+        comision = comision or Decimal('0')
+
+        resumen = fila((fecha, manicurista_id, None, metodo_pago, estado))
+        resumen.cantidad_ventas += 1
+        resumen.total += total
+        resumen.comision += comision
+        datos_ventas[venta_id] = (
+            fecha, manicurista_id, metodo_pago, estado, porcentaje or Decimal('0'),
+            (servicio_id, cantidad, total, comision)
+        )
+
+    ventas_con_detalles = set()
+    for venta_id, servicio_id, cantidad, subtotal in DetalleVentaServicio.objects.values_list(
+        'venta_id', 'servicio_id', 'cantidad', 'subtotal'
+    ).iterator():
+        if venta_id not in datos_ventas:
+            continue
+        fecha, manicurista_id, metodo_pago, estado, porcentaje, _ = datos_ventas[venta_id]
+        ventas_con_detalles.add(venta_id)
+
+        linea = fila((fecha, manicurista_id, servicio_id, metodo_pago, estado))
+        linea.cantidad_servicios += cantidad
+        linea.total += subtotal
+        linea.comision += subtotal * porcentaje / 100
+
+    # Las ventas sin detalles usan el servicio principal
+    for venta_id, (fecha, manicurista_id, metodo_pago, estado, _, principal) in datos_ventas.items():
+        servicio_id, cantidad, total, comision = principal
+        if venta_id in ventas_con_detalles or not servicio_id:
+            continue
+        linea = fila((fecha, manicurista_id, servicio_id, metodo_pago, estado))
+        linea.cantidad_servicios += cantidad
+        linea.total += total
+        linea.comision += comision
+
+    for (fecha, manicurista_id, servicio_id, metodo_pago, estado), linea in list(filas.items()):
+        if servicio_id is not None:
+            fila((fecha, manicurista_id, None, metodo_pago, estado)).cantidad_servicios += linea.cantidad_servicios
+
+    for resultado in filas.values():
+        resultado.total = resultado.total.quantize(Decimal('0.01'))
+        resultado.comision = resultado.comision.quantize(Decimal('0.01'))
+
+    VentaDiaria.objects.all().delete()
+    VentaDiaria.objects.bulk_create(filas.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventaservicios', '0006_ventadiaria'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar_ventas_diarias, migrations.RunPython.noop),
+    ]
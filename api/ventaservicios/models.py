@@ -1,4 +1,8 @@
-from django.db import models
+import threading
+from contextlib import contextmanager
+
+from django.db import models, transaction
+from django.db.models import Sum
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
@@ -9,6 +13,65 @@ from api.manicuristas.models import Manicurista
 from decimal import Decimal
 
 
+# Ventas cuyos detalles se están escribiendo en lote: la señal por detalle no
+# recalcula el total y se hace una sola vez al terminar
+_totales_diferidos = threading.local()
+
+
+def _ventas_diferidas():
+    if not hasattr(_totales_diferidos, 'ventas'):
+        _totales_diferidos.ventas = set()
+    return _totales_diferidos.ventas
+
+
+@contextmanager
+def totales_diferidos(venta):
+    """
+    Escribir varios detalles de una venta sin recalcular el total por cada uno.
+
+        with totales_diferidos(venta):
+            for datos in detalles:
+                DetalleVentaServicio.objects.create(venta=venta, **datos)
+
+    Al salir se calculan total y comisión una sola vez con `actualizar_totales`.
+    """
+    ventas = _ventas_diferidas()
+    anidado = venta.pk in ventas
+    ventas.add(venta.pk)
+    try:
+        yield venta
+    finally:
+        if not anidado:
+            ventas.discard(venta.pk)
+    if not anidado:
+        venta.actualizar_totales()
+
+
+class VentaServicioManager(models.Manager):
+
+    def create_with_detalles(self, detalles, **datos):
+        """
+        Crear una venta con sus detalles en lote.
+
+        Los detalles se insertan con bulk_create (sin la señal por fila) y el
+        total y la comisión se calculan una sola vez con un agregado, con el
+        mismo resultado que crear cada detalle por separado.
+        """
+        with transaction.atomic():
+            venta = self.create(**datos)
+
+            objetos = []
+            for datos_detalle in detalles:
+                detalle = DetalleVentaServicio(venta=venta, **datos_detalle)
+                detalle.calcular_subtotal()
+                objetos.append(detalle)
+
+            if objetos:
+                DetalleVentaServicio.objects.bulk_create(objetos)
+                venta.actualizar_totales()
+        return venta
+
+
 class VentaServicio(BaseModel):
     # MÉTODOS DE PAGO LIMITADOS COMO SOLICITASTE
     METODO_PAGO_CHOICES = [
@@ -142,10 +205,18 @@ class VentaServicio(BaseModel):
         verbose_name="Porcentaje de comisión"
     )
 
+    objects = VentaServicioManager()
+
     class Meta:
         verbose_name = "Venta de Servicio"
         verbose_name_plural = "Ventas de Servicios"
         ordering = ['-fecha_venta']
+        indexes = [
+            # Ventas de una manicurista en un periodo (liquidaciones, comisiones)
+            models.Index(fields=['manicurista', 'fecha_venta', 'estado'], name='venta_manic_fecha_estado_idx'),
+            # Estadísticas por estado en un periodo
+            models.Index(fields=['estado', 'fecha_venta'], name='venta_estado_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Venta {self.id} - {self.cliente.nombre}" # Modificado para no depender de self.servicio
@@ -177,7 +248,8 @@ class VentaServicio(BaseModel):
 
     def save(self, *args, **kwargs):
         # Si no hay detalles, usar el servicio principal para calcular total y precio_unitario
-        if not self.detalles.exists():
+        # (una venta sin guardar todavía no puede tener detalles)
+        if not self.pk or not self.detalles.exists():
             if self.servicio:
                 if not self.precio_unitario:
                     self.precio_unitario = self.servicio.precio
@@ -189,10 +261,7 @@ class VentaServicio(BaseModel):
         else:
             # Si hay detalles, el total se recalcula en la señal post_save de DetalleVentaServicio
             # Aquí solo aseguramos que el total inicial sea la suma de los detalles si ya existen
-            if self.pk: # Solo si la instancia ya existe y tiene detalles
-                self.total = sum(detalle.subtotal for detalle in self.detalles.all()) - self.descuento
-            else: # Para nuevas ventas, el total se calculará después de guardar los detalles
-                self.total = Decimal('0.00') # Valor temporal
+            self.total = sum(detalle.subtotal for detalle in self.detalles.all()) - self.descuento
 
         # Calcular comisión si hay porcentaje definido
         if self.porcentaje_comision and self.total is not None:
@@ -204,6 +273,29 @@ class VentaServicio(BaseModel):
         
         super().save(*args, **kwargs)
 
+    def actualizar_totales(self):
+        """
+        Recalcular total y comisión desde los detalles con un solo agregado.
+
+        Equivale a lo que hace la señal de DetalleVentaServicio, pero en dos
+        consultas sin importar la cantidad de detalles.
+        """
+        total_detalles = self.detalles.aggregate(total=Sum('subtotal'))['total'] or Decimal('0.00')
+        self.total = total_detalles - self.descuento
+        self.comision_manicurista = (self.total * (self.porcentaje_comision or 0)) / 100
+        VentaServicio.objects.filter(pk=self.pk).update(
+            total=self.total,
+            comision_manicurista=self.comision_manicurista
+        )
+
+        from .rollup import programar_recalculo
+        programar_recalculo(self.fecha_venta, self.manicurista_id)
+
+        # El UPDATE no dispara post_save: si la venta ya está pagada, ajustar su comisión en el libro
+        if self.estado == 'pagada':
+            from api.liquidaciones.comisiones import sincronizar_venta
+            sincronizar_venta(self)
+
     def sincronizar_con_citas(self):
         """Sincronizar información con las citas asociadas"""
         citas_asociadas = self.citas.all()
@@ -236,11 +328,29 @@ class VentaServicio(BaseModel):
                 
                 self.save(update_fields=['fecha_venta', 'cita'])
 
+    def _subtotal_detalles(self):
+        """
+        Suma de los subtotales de los detalles, o None si la venta no tiene.
+
+        Usa la anotación `subtotal_calc` o los detalles precargados cuando el
+        queryset los trae (ver VentaServicioViewSet.get_queryset); si no, una
+        sola consulta agregada.
+        """
+        if hasattr(self, 'subtotal_calc'):
+            return self.subtotal_calc
+        if not self.pk:
+            return None
+        if 'detalles' in getattr(self, '_prefetched_objects_cache', {}):
+            detalles = self.detalles.all()
+            return sum(detalle.subtotal for detalle in detalles) if detalles else None
+        return self.detalles.aggregate(total=Sum('subtotal'))['total']
+
     @property
     def subtotal(self):
         """Calcula el subtotal sin descuento (para el servicio principal si no hay detalles)"""
-        if self.detalles.exists():
-            return sum(detalle.subtotal for detalle in self.detalles.all())
+        subtotal_detalles = self._subtotal_detalles()
+        if subtotal_detalles is not None:
+            return subtotal_detalles
         return self.precio_unitario * self.cantidad if self.precio_unitario and self.cantidad else Decimal('0.00')
 
     @property
@@ -261,7 +371,15 @@ class VentaServicio(BaseModel):
     @property
     def es_desde_cita(self):
         """Verifica si la venta fue creada desde una cita"""
-        return self.cita is not None or self.citas.exists()
+        if self.cita_id is not None:
+            return True
+        if hasattr(self, 'tiene_citas'):
+            return self.tiene_citas
+        if not self.pk:
+            return False
+        if 'citas' in getattr(self, '_prefetched_objects_cache', {}):
+            return bool(self.citas.all())
+        return self.citas.exists()
 
     @property
     def citas_info(self):
@@ -332,40 +450,136 @@ class DetalleVentaServicio(BaseModel):
     def __str__(self):
         return f"Detalle {self.venta.id} - {self.servicio.nombre}"
 
-    def save(self, *args, **kwargs):
-        # Calcular subtotal automáticamente
+    def calcular_subtotal(self):
+        """Calcular subtotal (también se usa antes de bulk_create, que no llama a save)"""
         if self.precio_unitario is None and self.servicio:
             self.precio_unitario = self.servicio.precio
-        
+
         if self.precio_unitario is not None and self.cantidad is not None:
             self.subtotal = (self.precio_unitario * self.cantidad) - self.descuento_linea
         else:
             self.subtotal = Decimal('0.00') # Asegurar un valor por defecto
-        
+
+    def save(self, *args, **kwargs):
+        # Calcular subtotal automáticamente
+        self.calcular_subtotal()
         super().save(*args, **kwargs)
 
 
+class VentaDiaria(models.Model):
+    """
+    Resumen diario de ventas para reportes y dashboards.
+
+    Hay dos tipos de fila por (fecha, manicurista, metodo_pago, estado):
+    - servicio NULL: resumen de las ventas (cantidad de ventas, total y comisión)
+    - servicio definido: lo vendido de ese servicio (cantidad, subtotal y comisión proporcional)
+
+    Se mantiene por día y manicurista desde las señales de VentaServicio y
+    DetalleVentaServicio (ver api/ventaservicios/rollup.py) y se puede
+    reconstruir con `python manage.py reconstruir_ventas_diarias`.
+    """
+    fecha = models.DateField(verbose_name="Fecha")
+
+    manicurista = models.ForeignKey(
+        Manicurista,
+        on_delete=models.CASCADE,
+        related_name='ventas_diarias',
+        verbose_name="Manicurista"
+    )
+
+    servicio = models.ForeignKey(
+        Servicio,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='ventas_diarias',
+        verbose_name="Servicio",
+        help_text="Vacío en las filas de resumen de ventas"
+    )
+
+    metodo_pago = models.CharField(
+        max_length=20,
+        choices=VentaServicio.METODO_PAGO_CHOICES,
+        verbose_name="Método de pago"
+    )
+
+    estado = models.CharField(
+        max_length=20,
+        choices=VentaServicio.ESTADO_CHOICES,
+        verbose_name="Estado"
+    )
+
+    cantidad_ventas = models.PositiveIntegerField(default=0, verbose_name="Cantidad de ventas")
+
+    cantidad_servicios = models.PositiveIntegerField(default=0, verbose_name="Cantidad de servicios")
+
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Total")
+
+    comision = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Comisión")
+
+    class Meta:
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        ordering = ['-fecha']
+        unique_together = [['fecha', 'manicurista', 'servicio', 'metodo_pago', 'estado']]
+        indexes = [
+            models.Index(fields=['fecha', 'estado'], name='ventadiaria_fecha_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.manicurista_id} - {self.servicio_id or 'resumen'} ({self.estado})"
+
+
 # Señales para actualizar totales automáticamente
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
 @receiver(post_save, sender=DetalleVentaServicio)
 @receiver(post_delete, sender=DetalleVentaServicio)
 def actualizar_total_venta(sender, instance, **kwargs):
     """Actualiza el total de la venta cuando se modifican los detalles"""
+    if instance.venta_id in _ventas_diferidas():
+        return
     if hasattr(instance, 'venta') and instance.venta:
-        venta = instance.venta
-        total_detalles = sum(detalle.subtotal for detalle in venta.detalles.all())
-        
-        # Actualizar el total de la venta principal y la comisión
-        venta.total = total_detalles - venta.descuento # Considerar el descuento general de la venta
-        if venta.porcentaje_comision is not None and venta.total is not None:
-            venta.comision_manicurista = (venta.total * venta.porcentaje_comision) / 100
-        
-        venta.save(update_fields=['total', 'comision_manicurista'])
+        # Total (menos el descuento general) y comisión con un solo agregado;
+        # también programa el recálculo del resumen diario
+        instance.venta.actualizar_totales()
 
 @receiver(m2m_changed, sender=VentaServicio.citas.through)
 def sincronizar_fecha_con_citas(sender, instance, action, **kwargs):
     """Sincronizar fecha de venta cuando se modifican las citas asociadas"""
     if action in ['post_add', 'post_remove', 'post_clear']:
         instance.sincronizar_con_citas()
+
+
+# ===== SEÑALES PARA MANTENER EL RESUMEN DIARIO (VentaDiaria) =====
+
+@receiver(pre_save, sender=VentaServicio)
+def recordar_dia_anterior_venta(sender, instance, **kwargs):
+    """
+    Guardar fecha y manicurista originales para recalcular también ese día,
+    y el estado original para el libro de comisiones
+    """
+    instance._dia_anterior = None
+    instance._estado_anterior = None
+    if instance.pk:
+        anterior = sender.objects.filter(pk=instance.pk).values_list(
+            'fecha_venta', 'manicurista_id', 'estado'
+        ).first()
+        if anterior:
+            instance._dia_anterior = anterior[:2]
+            instance._estado_anterior = anterior[2]
+
+
+@receiver(post_save, sender=VentaServicio)
+@receiver(post_delete, sender=VentaServicio)
+def actualizar_venta_diaria(sender, instance, **kwargs):
+    """Recalcular el resumen del día de la venta (y del día anterior si se movió)"""
+    from .rollup import programar_recalculo
+
+    programar_recalculo(instance.fecha_venta, instance.manicurista_id)
+
+    anterior = getattr(instance, '_dia_anterior', None)
+    if anterior:
+        programar_recalculo(*anterior)
+
@@ -0,0 +1,276 @@
+"""
+Mantenimiento del resumen diario de ventas (VentaDiaria).
+
+El resumen se recalcula por (día, manicurista): se borran las filas de ese
+día y se vuelven a crear a partir de sus ventas, con la manicurista
+bloqueada para que dos recálculos de la misma llave no se mezclen. Las señales de los modelos
+llaman a `programar_recalculo`, que ejecuta el recálculo una sola vez por
+día y manicurista al confirmar la transacción, así una venta con varios
+detalles no recalcula el día por cada línea.
+
+Para reconstruir todo el histórico (o un rango de fechas):
+
+    python manage.py reconstruir_ventas_diarias --desde 2024-01-01
+"""
+import threading
+import weakref
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.manicuristas.models import Manicurista
+from .models import VentaServicio, DetalleVentaServicio, VentaDiaria
+
+
+def inicio_dia(fecha):
+    """Medianoche local (aware) del día indicado"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def fecha_local(fecha_venta):
+    """Día local de una fecha de venta (aware o naive)"""
+    if timezone.is_aware(fecha_venta):
+        return timezone.localtime(fecha_venta).date()
+    return fecha_venta.date()
+
+
+def _nueva_fila(modelo, fecha, manicurista_id, servicio_id, metodo_pago, estado):
+    return modelo(
+        fecha=fecha,
+        manicurista_id=manicurista_id,
+        servicio_id=servicio_id,
+        metodo_pago=metodo_pago,
+        estado=estado,
+        total=Decimal('0'),
+        comision=Decimal('0'),
+    )
+
+
+def agregar_ventas(ventas, detalles=None, modelo_fila=VentaDiaria):
+    """
+    Calcular las filas de VentaDiaria para un queryset de ventas.
+
+    Se recorren las ventas y sus detalles una sola vez (dos consultas) y se
+    acumulan en memoria por llave. Las ventas sin detalles usan el servicio
+    principal de compatibilidad. `detalles` y `modelo_fila` permiten usar los
+    modelos históricos desde una migración.
+    """
+    filas = {}
+    detalles = DetalleVentaServicio.objects if detalles is None else detalles
+
+    def fila(llave):
+        if llave not in filas:
+            filas[llave] = _nueva_fila(modelo_fila, *llave)
+        return filas[llave]
+
+    datos_ventas = {}
+    for venta in ventas.values_list(
+        'id', 'fecha_venta', 'manicurista_id', 'servicio_id', 'metodo_pago', 'estado',
+        'cantidad', 'total', 'comision_manicurista', 'porcentaje_comision'
+    ).iterator():
+        (venta_id, fecha_venta, manicurista_id, servicio_id, metodo_pago, estado,
+         cantidad, total, comision, porcentaje) = venta
+        fecha = fecha_local(fecha_venta)
+        total = total or Decimal('0')
+        comision = comision or Decimal('0')
+
+        resumen = fila((fecha, manicurista_id, None, metodo_pago, estado))
+        resumen.cantidad_ventas += 1
+        resumen.total += total
+        resumen.comision += comision
+
+        # El servicio principal solo se usa si la venta no tiene detalles
+        datos_ventas[venta_id] = (
+            fecha, manicurista_id, metodo_pago, estado, porcentaje or Decimal('0'),
+            (servicio_id, cantidad, total, comision)
+        )
+
+    ventas_con_detalles = set()
+    detalles = detalles.filter(venta__in=ventas).values_list(
+        'venta_id', 'servicio_id', 'cantidad', 'subtotal'
+    )
+    for venta_id, servicio_id, cantidad, subtotal in detalles.iterator():
+        if venta_id not in datos_ventas:
+            continue
+        fecha, manicurista_id, metodo_pago, estado, porcentaje, _ = datos_ventas[venta_id]
+        ventas_con_detalles.add(venta_id)
+
+        linea = fila((fecha, manicurista_id, servicio_id, metodo_pago, estado))
+        linea.cantidad_servicios += cantidad
+        linea.total += subtotal
+        linea.comision += subtotal * porcentaje / 100
+
+    for venta_id, (fecha, manicurista_id, metodo_pago, estado, _, principal) in datos_ventas.items():
+        servicio_id, cantidad, total, comision = principal
+        if venta_id in ventas_con_detalles or not servicio_id:
+            continue
+        linea = fila((fecha, manicurista_id, servicio_id, metodo_pago, estado))
+        linea.cantidad_servicios += cantidad
+        linea.total += total
+        linea.comision += comision
+
+    # Las cantidades de servicios del resumen salen de las filas por servicio
+    for (fecha, manicurista_id, servicio_id, metodo_pago, estado), linea in list(filas.items()):
+        if servicio_id is not None:
+            fila((fecha, manicurista_id, None, metodo_pago, estado)).cantidad_servicios += linea.cantidad_servicios
+
+    for resultado in filas.values():
+        resultado.total = resultado.total.quantize(Decimal('0.01'))
+        resultado.comision = resultado.comision.quantize(Decimal('0.01'))
+    return list(filas.values())
+
+
+def recalcular_venta_diaria(fecha, manicurista_id):
+    """Rehacer las filas de VentaDiaria de un día y una manicurista"""
+    with transaction.atomic():
+        # Las ventas se leen con la llave bloqueada: un recálculo concurrente
+        # espera y vuelve a leer, en vez de crear sus filas junto a estas
+        Manicurista.objects.select_for_update().filter(pk=manicurista_id).values_list('pk').first()
+        filas = agregar_ventas(VentaServicio.objects.filter(
+            manicurista_id=manicurista_id,
+            fecha_venta__gte=inicio_dia(fecha),
+            fecha_venta__lt=inicio_dia(fecha + timedelta(days=1)),
+        ))
+        VentaDiaria.objects.filter(fecha=fecha, manicurista_id=manicurista_id).delete()
+        VentaDiaria.objects.bulk_create(filas)
+    return len(filas)
+
+
+def reconstruir_ventas_diarias(desde=None, hasta=None):
+    """Reconstruir VentaDiaria completa o para un rango de fechas (inclusive)"""
+    ventas = VentaServicio.objects.all()
+    resumenes = VentaDiaria.objects.all()
+    if desde:
+        ventas = ventas.filter(fecha_venta__gte=inicio_dia(desde))
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta:
+        ventas = ventas.filter(fecha_venta__lt=inicio_dia(hasta + timedelta(days=1)))
+        resumenes = resumenes.filter(fecha__lte=hasta)
+
+    filas = agregar_ventas(ventas)
+
+    with transaction.atomic():
+        resumenes.delete()
+        VentaDiaria.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+class ResumenVentas:
+    """
+    Agregados de los reportes de ventas sobre el resumen diario.
+
+    `filas` son filas de VentaDiaria ya filtradas por estado, manicurista o
+    método de pago; `desde`/`hasta` limitan sus fechas (inclusive).
+    """
+
+    def __init__(self, filas, desde=None, hasta=None):
+        self.filas = filas.filter(self.rango(desde, hasta)).order_by()
+
+    def rango(self, desde=None, hasta=None):
+        filtro = Q()
+        if desde:
+            filtro &= Q(fecha__gte=desde)
+        if hasta:
+            filtro &= Q(fecha__lte=hasta)
+        return filtro
+
+    def ventas(self, filtro=None):
+        return Coalesce(Sum('cantidad_ventas', filter=filtro), Value(0))
+
+    def comision(self, filtro=None):
+        return Sum('comision', filter=filtro)
+
+    def resumen(self):
+        """Una fila por venta agregada (sin las filas por servicio)"""
+        return self.filas.filter(servicio__isnull=True)
+
+    def servicios(self, filtro):
+        return self.filas.filter(filtro, servicio__isnull=False).values('servicio__nombre').annotate(
+            total_vendido=Sum('cantidad_servicios'),
+            ingresos=Sum('total')
+        )
+
+
+class VentasEnVivo(ResumenVentas):
+    """
+    Los mismos agregados sobre las ventas, para filtros que el resumen no
+    conoce (por ejemplo el cliente). `filas` es un queryset de VentaServicio.
+    """
+
+    def rango(self, desde=None, hasta=None):
+        filtro = Q()
+        if desde:
+            filtro &= Q(fecha_venta__gte=inicio_dia(desde))
+        if hasta:
+            filtro &= Q(fecha_venta__lt=inicio_dia(hasta + timedelta(days=1)))
+        return filtro
+
+    def ventas(self, filtro=None):
+        return Count('id', filter=filtro)
+
+    def comision(self, filtro=None):
+        return Sum('comision_manicurista', filter=filtro)
+
+    def resumen(self):
+        return self.filas
+
+    def servicios(self, filtro):
+        return DetalleVentaServicio.objects.filter(venta__in=self.filas.filter(filtro)).values(
+            'servicio__nombre'
+        ).annotate(
+            total_vendido=Sum('cantidad'),
+            ingresos=Sum('subtotal')
+        )
+
+
+class _Recalculo:
+    """Callback de on_commit con los (día, manicurista) por recalcular de una transacción"""
+
+    def __init__(self):
+        self.claves = set()
+        self.ejecutado = False
+
+    def __call__(self):
+        self.ejecutado = True
+        for clave in sorted(self.claves):
+            recalcular_venta_diaria(*clave)
+
+
+# Recálculo pendiente por conexión. Es una referencia débil: si la transacción
+# se revierte, Django descarta el callback y la referencia queda vacía.
+_pendientes = threading.local()
+
+
+def programar_recalculo(fecha_venta, manicurista_id):
+    """
+    Programar el recálculo del día de una venta al confirmar la transacción.
+
+    Todas las llamadas de una misma transacción se acumulan en un único
+    callback de on_commit, que recalcula cada día y manicurista una sola vez.
+    Si la transacción se revierte, Django descarta el callback junto con los
+    cambios.
+    """
+    if not fecha_venta or not manicurista_id:
+        return
+
+    clave = (fecha_local(fecha_venta), manicurista_id)
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        recalculo = _Recalculo()
+        recalculo.claves.add(clave)
+        recalculo()
+        return
+
+    referencias = getattr(_pendientes, 'por_conexion', None)
+    if referencias is None:
+        referencias = _pendientes.por_conexion = {}
+    recalculo = referencias[conexion.alias]() if conexion.alias in referencias else None
+    if recalculo is None or recalculo.ejecutado:
+        recalculo = _Recalculo()
+        referencias[conexion.alias] = weakref.ref(recalculo)
+        transaction.on_commit(recalculo, using=conexion.alias)
+    recalculo.claves.add(clave)
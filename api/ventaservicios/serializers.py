@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import VentaServicio, DetalleVentaServicio
+from .models import VentaServicio, DetalleVentaServicio, totales_diferidos
 from api.clientes.serializers import ClienteSerializer
 from api.servicios.serializers import ServicioSerializer
 from api.manicuristas.serializers import ManicuristaSerializer
@@ -71,7 +71,8 @@ class VentaServicioSerializer(serializers.ModelSerializer):
 
     def get_citas_ids(self, obj):
         """Obtener IDs de las citas asociadas"""
-        return list(obj.citas.values_list('id', flat=True))
+        # Usa las citas precargadas en lugar de una consulta por venta
+        return [cita.id for cita in obj.citas.all()]
 
     def get_fecha_para_mostrar(self, obj):
         """Obtener fecha formateada"""
@@ -192,12 +193,8 @@ class VentaServicioCreateSerializer(serializers.ModelSerializer):
         detalles_data = validated_data.pop('detalles')
         citas_ids = validated_data.pop('citas', [])
         
-        # Crear la venta principal
-        venta = VentaServicio.objects.create(**validated_data)
-        
-        # Crear los detalles de la venta
-        for detalle_data in detalles_data:
-            DetalleVentaServicio.objects.create(venta=venta, **detalle_data)
+        # Crear la venta principal con sus detalles en lote (total y comisión en un solo agregado)
+        venta = VentaServicio.objects.create_with_detalles(detalles_data, **validated_data)
         
         # Asignar citas si se proporcionaron
         if citas_ids:
@@ -216,7 +213,6 @@ class VentaServicioCreateSerializer(serializers.ModelSerializer):
             except ImportError:
                 pass
         
-        # La señal post_save de DetalleVentaServicio se encargará de actualizar el total de la venta
         return venta
 
     def update(self, instance, validated_data):
@@ -228,28 +224,29 @@ class VentaServicioCreateSerializer(serializers.ModelSerializer):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         
-        # Actualizar detalles de la venta
+        # Actualizar detalles de la venta (el total se recalcula una sola vez al final)
         if detalles_data is not None:
-            # Eliminar detalles existentes que no estén en los nuevos datos
-            detalle_ids_existentes = [d.id for d in instance.detalles.all()]
-            detalle_ids_enviados = [d.get('id') for d in detalles_data if d.get('id')]
+            with totales_diferidos(instance):
+                # Eliminar detalles existentes que no estén en los nuevos datos
+                detalle_ids_existentes = [d.id for d in instance.detalles.all()]
+                detalle_ids_enviados = [d.get('id') for d in detalles_data if d.get('id')]
 
-            # Eliminar detalles que ya no están en la lista enviada
-            for detalle_id in set(detalle_ids_existentes) - set(detalle_ids_enviados):
-                instance.detalles.filter(id=detalle_id).delete()
+                # Eliminar detalles que ya no están en la lista enviada
+                for detalle_id in set(detalle_ids_existentes) - set(detalle_ids_enviados):
+                    instance.detalles.filter(id=detalle_id).delete()
 
-            # Crear o actualizar detalles
-            for detalle_data in detalles_data:
-                detalle_id = detalle_data.get('id')
-                if detalle_id:
-                    # Actualizar detalle existente
-                    detalle_instance = instance.detalles.get(id=detalle_id)
-                    for attr, value in detalle_data.items():
-                        setattr(detalle_instance, attr, value)
-                    detalle_instance.save()
-                else:
-                    # Crear nuevo detalle
-                    DetalleVentaServicio.objects.create(venta=instance, **detalle_data)
+                # Crear o actualizar detalles
+                for detalle_data in detalles_data:
+                    detalle_id = detalle_data.get('id')
+                    if detalle_id:
+                        # Actualizar detalle existente
+                        detalle_instance = instance.detalles.get(id=detalle_id)
+                        for attr, value in detalle_data.items():
+                            setattr(detalle_instance, attr, value)
+                        detalle_instance.save()
+                    else:
+                        # Crear nuevo detalle
+                        DetalleVentaServicio.objects.create(venta=instance, **detalle_data)
         
         # Actualizar citas si se proporcionaron
         if citas_ids is not None:
@@ -1,10 +1,12 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from django.db.models import Q, Count, Sum, Avg
+from django.db.models import Q, Sum, Exists, OuterRef, Prefetch, Subquery
 from django.utils import timezone
-from datetime import datetime, timedelta
-from .models import VentaServicio, DetalleVentaServicio
+from datetime import datetime
+from api.citas.models import Cita
+from .models import VentaServicio, DetalleVentaServicio, VentaDiaria
+from .rollup import ResumenVentas, VentasEnVivo
 from .serializers import (
     VentaServicioSerializer,
     VentaServicioCreateSerializer,
@@ -27,45 +29,75 @@ class VentaServicioViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Filtrar ventas según parámetros de consulta"""
+        # Todo lo que usa VentaServicioSerializer sale de aquí: relaciones
+        # precargadas (incluidas las de CitaSerializer para citas_info) y
+        # subtotal/citas anotados, así el listado no hace consultas por fila
+        citas = Cita.objects.select_related(
+            'cliente__usuario', 'manicurista__usuario', 'servicio'
+        ).prefetch_related('servicios')
+        subtotal_detalles = DetalleVentaServicio.objects.filter(
+            venta=OuterRef('pk')
+        ).order_by().values('venta').annotate(total=Sum('subtotal')).values('total')
+
         queryset = VentaServicio.objects.select_related(
-            'cliente', 'manicurista', 'cita' # 'servicio' ya no es el principal
-        ).prefetch_related('citas', 'detalles__servicio').all() # Cargar detalles y sus servicios
-        
-        # Filtros
-        estado = self.request.query_params.get('estado')
-        fecha_desde = self.request.query_params.get('fecha_desde')
-        fecha_hasta = self.request.query_params.get('fecha_hasta')
-        manicurista_id = self.request.query_params.get('manicurista')
-        cliente_id = self.request.query_params.get('cliente')
-        metodo_pago = self.request.query_params.get('metodo_pago')
-        
-        if estado:
-            queryset = queryset.filter(estado=estado)
+            'cliente__usuario', 'manicurista__usuario', 'servicio', 'cita'
+        ).prefetch_related(
+            Prefetch('citas', queryset=citas), 'detalles__servicio'
+        ).annotate(
+            subtotal_calc=Subquery(subtotal_detalles),
+            tiene_citas=Exists(VentaServicio.citas.through.objects.filter(ventaservicio_id=OuterRef('pk')))
+        )
         
-        if fecha_desde:
+        queryset = self._filtrar_ventas(queryset)
+        return queryset.order_by('-fecha_venta')
+
+    def _fechas_consulta(self):
+        """fecha_desde y fecha_hasta de la consulta como date (None si faltan o son inválidas)"""
+        fechas = []
+        for nombre in ('fecha_desde', 'fecha_hasta'):
             try:
-                fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_venta__date__gte=fecha_desde)
+                fechas.append(datetime.strptime(self.request.query_params.get(nombre, ''), '%Y-%m-%d').date())
             except ValueError:
-                pass
-        
+                fechas.append(None)
+        return fechas
+
+    def _filtrar_ventas(self, queryset):
+        """Filtros del listado (estado, fechas, manicurista, cliente y método de pago)"""
+        params = self.request.query_params
+        fecha_desde, fecha_hasta = self._fechas_consulta()
+
+        if params.get('estado'):
+            queryset = queryset.filter(estado=params['estado'])
+        if fecha_desde:
+            queryset = queryset.filter(fecha_venta__date__gte=fecha_desde)
         if fecha_hasta:
-            try:
-                fecha_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_venta__date__lte=fecha_hasta)
-            except ValueError:
-                pass
-        
-        if manicurista_id:
-            queryset = queryset.filter(manicurista_id=manicurista_id)
-        
-        if cliente_id:
-            queryset = queryset.filter(cliente_id=cliente_id)
-        
-        if metodo_pago:
-            queryset = queryset.filter(metodo_pago=metodo_pago)
-        
-        return queryset.order_by('-fecha_venta')
+            queryset = queryset.filter(fecha_venta__date__lte=fecha_hasta)
+        if params.get('manicurista'):
+            queryset = queryset.filter(manicurista_id=params['manicurista'])
+        if params.get('cliente'):
+            queryset = queryset.filter(cliente_id=params['cliente'])
+        if params.get('metodo_pago'):
+            queryset = queryset.filter(metodo_pago=params['metodo_pago'])
+        return queryset
+
+    def _resumen_ventas(self):
+        """
+        Fuente de estadisticas y reporte_comisiones con los mismos filtros que
+        el listado: el resumen diario (VentaDiaria), o las ventas en vivo si
+        hay un filtro que el resumen no guarda (cliente).
+        """
+        params = self.request.query_params
+        if params.get('cliente'):
+            return VentasEnVivo(self._filtrar_ventas(VentaServicio.objects.all()))
+
+        filas = VentaDiaria.objects.all()
+        if params.get('estado'):
+            filas = filas.filter(estado=params['estado'])
+        if params.get('manicurista'):
+            filas = filas.filter(manicurista_id=params['manicurista'])
+        if params.get('metodo_pago'):
+            filas = filas.filter(metodo_pago=params['metodo_pago'])
+        return ResumenVentas(filas, *self._fechas_consulta())
 
     def create(self, request, *args, **kwargs):
         """Crear nueva venta con múltiples citas y detalles de servicio"""
@@ -117,7 +149,9 @@ class VentaServicioViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         venta = serializer.save()
         
-        # Retornar con información completa
+        # Retornar con información completa (se recarga para no usar el subtotal
+        # anotado ni los detalles precargados antes de la actualización)
+        venta = self.get_queryset().get(pk=venta.pk)
         response_serializer = VentaServicioSerializer(venta)
         return Response(response_serializer.data)
 
@@ -154,107 +188,136 @@ class VentaServicioViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
-        """Obtener estadísticas de ventas"""
-        hoy = timezone.now().date()
+        """
+        Obtener estadísticas de ventas
+        URL: /api/venta-servicios/estadisticas/?desde=2024-01-01&hasta=2024-01-31
+
+        El periodo (desde/hasta) es opcional; por defecto va desde el inicio
+        del mes actual. Acepta los filtros del listado. Se calcula sobre el
+        resumen diario (VentaDiaria), así el costo depende de la cantidad de
+        días y no de ventas; con filtro de cliente se agregan las ventas.
+        """
+        hoy = timezone.localdate()
         inicio_mes = hoy.replace(day=1)
-        
-        # Estadísticas generales
-        total_ventas = self.get_queryset().count()
-        ventas_hoy = self.get_queryset().filter(fecha_venta__date=hoy).count()
-        ventas_pendientes = self.get_queryset().filter(estado='pendiente').count()
-        ventas_mes = self.get_queryset().filter(fecha_venta__date__gte=inicio_mes).count()
-        
-        # Ingresos
-        ingresos_hoy = self.get_queryset().filter(
-            fecha_venta__date=hoy,
-            estado='pagada'
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        ingresos_mes = self.get_queryset().filter(
-            fecha_venta__date__gte=inicio_mes,
-            estado='pagada'
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        # Ventas por estado
-        por_estado = self.get_queryset().values('estado').annotate(
-            count=Count('id'),
-            total_ingresos=Sum('total')
-        ).order_by('estado')
-        
+
+        try:
+            desde = request.query_params.get('desde')
+            hasta = request.query_params.get('hasta')
+            desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else inicio_mes
+            hasta = datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None
+        except ValueError:
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fuente = self._resumen_ventas()
+        filtro_hoy = fuente.rango(hoy, hoy)
+        filtro_mes = fuente.rango(inicio_mes)
+        filtro_periodo = fuente.rango(desde, hasta)
+        pagada = Q(estado='pagada')
+        ventas = fuente.ventas
+
+        estados = [estado for estado, _ in VentaServicio.ESTADO_CHOICES]
+        metodos = [metodo for metodo, _ in VentaServicio.METODO_PAGO_CHOICES]
+        agregados = {
+            'total_ventas': ventas(),
+            'ventas_hoy': ventas(filtro_hoy),
+            'ventas_pendientes': ventas(Q(estado='pendiente')),
+            'ventas_mes': ventas(filtro_mes),
+            'ingresos_hoy': Sum('total', filter=filtro_hoy & pagada),
+            'ingresos_mes': Sum('total', filter=filtro_mes & pagada),
+            'ventas_periodo': ventas(filtro_periodo),
+            'ingresos_periodo': Sum('total', filter=filtro_periodo & pagada),
+            'comisiones_periodo': fuente.comision(filtro_periodo & pagada),
+        }
+        for estado in estados:
+            agregados[f'estado_{estado}_count'] = ventas(Q(estado=estado))
+            agregados[f'estado_{estado}_total'] = Sum('total', filter=Q(estado=estado))
+        for metodo in metodos:
+            agregados[f'metodo_{metodo}_count'] = ventas(pagada & Q(metodo_pago=metodo))
+            agregados[f'metodo_{metodo}_total'] = Sum('total', filter=pagada & Q(metodo_pago=metodo))
+
+        resumen = fuente.resumen()
+        resultado = resumen.aggregate(**agregados)
+
+        por_estado = [
+            {
+                'estado': estado,
+                'count': resultado[f'estado_{estado}_count'],
+                'total_ingresos': resultado[f'estado_{estado}_total']
+            }
+            for estado in sorted(estados)
+            if resultado[f'estado_{estado}_count']
+        ]
+
         # Ventas por método de pago (solo efectivo y transferencia)
-        por_metodo_pago = self.get_queryset().filter(
-            estado='pagada'
-        ).values('metodo_pago').annotate(
-            count=Count('id'),
-            total=Sum('total')
-        ).order_by('-total')
-        
-        # Servicios más vendidos (a través de detalles)
-        servicios_top = DetalleVentaServicio.objects.filter(
-            venta__estado='pagada'
-        ).values(
-            'servicio__nombre'
-        ).annotate(
-            total_vendido=Sum('cantidad'),
-            ingresos=Sum('subtotal')
-        ).order_by('-total_vendido')[:10]
-        
-        # Manicuristas con más ventas
-        manicuristas_top = self.get_queryset().values(
-            'manicurista__nombres', 'manicurista__apellidos'
+        por_metodo_pago = sorted(
+            (
+                {
+                    'metodo_pago': metodo,
+                    'count': resultado[f'metodo_{metodo}_count'],
+                    'total': resultado[f'metodo_{metodo}_total']
+                }
+                for metodo in metodos
+                if resultado[f'metodo_{metodo}_count']
+            ),
+            key=lambda fila: fila['total'] or 0,
+            reverse=True
+        )
+
+        # Servicios más vendidos en el periodo
+        servicios_top = fuente.servicios(filtro_periodo & pagada).order_by('-total_vendido')[:10]
+
+        # Manicuristas con más ventas en el periodo
+        manicuristas_top = resumen.filter(filtro_periodo).values(
+            'manicurista__id', 'manicurista__nombre'
         ).annotate(
-            total_ventas=Count('id'),
+            total_ventas=ventas(),
             total_ingresos=Sum('total'),
-            total_comisiones=Sum('comision_manicurista')
+            total_comisiones=fuente.comision()
         ).order_by('-total_ventas')[:10]
-        
+
         return Response({
-            'total_ventas': total_ventas,
-            'ventas_hoy': ventas_hoy,
-            'ventas_pendientes': ventas_pendientes,
-            'ventas_mes': ventas_mes,
-            'ingresos_hoy': float(ingresos_hoy),
-            'ingresos_mes': float(ingresos_mes),
-            'por_estado': list(por_estado),
-            'por_metodo_pago': list(por_metodo_pago),
+            'total_ventas': resultado['total_ventas'],
+            'ventas_hoy': resultado['ventas_hoy'],
+            'ventas_pendientes': resultado['ventas_pendientes'],
+            'ventas_mes': resultado['ventas_mes'],
+            'ingresos_hoy': float(resultado['ingresos_hoy'] or 0),
+            'ingresos_mes': float(resultado['ingresos_mes'] or 0),
+            'periodo': {
+                'desde': desde.isoformat(),
+                'hasta': hasta.isoformat() if hasta else None,
+                'ventas': resultado['ventas_periodo'],
+                'ingresos': float(resultado['ingresos_periodo'] or 0),
+                'comisiones': float(resultado['comisiones_periodo'] or 0),
+            },
+            'por_estado': por_estado,
+            'por_metodo_pago': por_metodo_pago,
             'servicios_top': list(servicios_top),
             'manicuristas_top': list(manicuristas_top)
         })
 
     @action(detail=False, methods=['get'])
     def reporte_comisiones(self, request):
-        """Reporte de comisiones por manicurista"""
-        fecha_desde = request.query_params.get('fecha_desde')
-        fecha_hasta = request.query_params.get('fecha_hasta')
-        
-        queryset = self.get_queryset().filter(estado='pagada')
-        
-        if fecha_desde:
-            try:
-                fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_venta__date__gte=fecha_desde)
-            except ValueError:
-                pass
-        
-        if fecha_hasta:
-            try:
-                fecha_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_venta__date__lte=fecha_hasta)
-            except ValueError:
-                pass
-        
+        """Reporte de comisiones por manicurista (desde el resumen diario)"""
+        fuente = self._resumen_ventas()
+        queryset = fuente.resumen().filter(estado='pagada')
+
         comisiones = queryset.values(
             'manicurista__id',
-            'manicurista__nombres',
-            'manicurista__apellidos'
+            'manicurista__nombre'
         ).annotate(
-            total_ventas=Count('id'),
+            total_ventas=fuente.ventas(),
             total_ingresos=Sum('total'),
-            total_comisiones=Sum('comision_manicurista'),
-            promedio_venta=Avg('total')
+            total_comisiones=fuente.comision()
         ).order_by('-total_comisiones')
-        
-        return Response(list(comisiones))
+
+        reporte = []
+        for fila in comisiones:
+            fila['promedio_venta'] = fila['total_ingresos'] / fila['total_ventas'] if fila['total_ventas'] else 0
+            reporte.append(fila)
+        return Response(reporte)
 
     @action(detail=False, methods=['get'])
     def ventas_desde_citas(self, request):
@@ -142,6 +142,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Imágenes de servicios: se guardan en MEDIA_ROOT y el comando
+# `subir_imagenes_servicios` las sube a ImgBB. Sin API key quedan solo locales.
+IMGBB_API_KEY = os.getenv('IMGBB_API_KEY', '')
+IMGBB_UPLOAD_URL = os.getenv('IMGBB_UPLOAD_URL', 'https://api.imgbb.com/1/upload')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -151,15 +156,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # https://www.django-rest-framework.org/
 
 REST_FRAMEWORK = {
+    # El usuario se arma con los claims del token, sin consultar la base de datos;
+    # los tokens con una versión de permisos del rol vieja se rechazan
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.tokens.JWTRolAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'api.base.pagination.OrdenCursorPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 50)),
 }
 
+# Máximo de resultados por página que un cliente puede pedir con ?page_size=
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 200))
+
 # JWT Configuration
 # https://django-rest-framework-simplejwt.readthedocs.io/en/latest/
 
@@ -174,6 +186,9 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.tokens.TokenUsuarioSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.tokens.TokenRenovarSerializer',
+    'TOKEN_USER_CLASS': 'api.authentication.tokens.UsuarioToken',
 }
 
 AUTH_USER_MODEL = 'usuarios.Usuario'
@@ -207,13 +222,13 @@ CORS_ALLOW_METHODS = [
 # Cache Configuration
 # https://docs.djangoproject.com/en/5.2/topics/cache/
 
+# Cache compartida por todos los workers: la invalidación de agendas y de
+# permisos debe llegar a todos. Las pruebas usan memoria local
+# (winespa/settings_test.py).
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
         'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
-        'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-        },
         'KEY_PREFIX': 'winespa',
     }
 }
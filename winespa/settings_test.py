@@ -0,0 +1,17 @@
+"""
+Configuración para las pruebas: la de winespa/settings.py con la cache en
+memoria local, para no depender de un Redis.
+"""
+from .settings import *  # noqa: F401,F403
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'winespa',
+        'KEY_PREFIX': 'winespa',
+    }
+}
+
+# La cache local es de un solo proceso, suficiente para las pruebas
+SILENCED_SYSTEM_CHECKS = ['roles.E001']